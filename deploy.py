@@ -15,16 +15,23 @@ import signal
 import logging
 import subprocess # nosec - security considered
 import shutil
-import time
+from concurrent import futures
 from datetime import datetime
 
-import sh # pylint: disable=import-error
-
+from deployment_handlers import ansible_config
+from deployment_handlers import checkpoint
+from deployment_handlers import galaxy_cache
 from deployment_handlers import inventory_handlers
+from deployment_handlers import inventory_sync
+from deployment_handlers import ledger
+from deployment_handlers import log_tee
+from deployment_handlers import resolved_vars
+from deployment_handlers import scheduler
+from deployment_handlers import supervisor
+from deployment_handlers import timing_report
 from scripts import log_all
 
 
-DEPLOYMENT_INTERVAL = 5
 ERROR_EXIT_CODE = 1
 DIR_PATH = 0
 FILENAMES = 2
@@ -42,16 +49,46 @@ ALT_INVENTORIES_PATH = os.path.join(SCRIPT_PARENT_DIR, "inventory", "automated")
 DEPLOYMENTS_PATH = os.path.join(SCRIPT_PARENT_DIR, "deployments")
 DEPLOYMENT_LINK_PREFIX = "30_"
 DEPLOYMENT_LINK_POSTFIX = "_deployment.yml"
-DEPLOYMENT_LINK_PATTERN = f"{DEPLOYMENT_LINK_PREFIX}.*{DEPLOYMENT_LINK_POSTFIX}"
 PLATFORM_PROFILE_PATH = os.path.join(SCRIPT_PARENT_DIR, "platform_profiles")
 PLATFORM_PROFILE_LINK_PREFIX = "40_"
 PLATFORM_PROFILE_LINK_POSTFIX = "_platform_profile.yml"
-PLATFORM_PROFILE_LINK_PATTERN = f"{PLATFORM_PROFILE_LINK_PREFIX}.*{PLATFORM_PROFILE_LINK_POSTFIX}"
 DEFAULT_CLUSTER_NAME = "single_cluster"
 MULTI_INVENTORY_FILE = os.path.join(SCRIPT_PARENT_DIR, "inventory.yml")
-
-
-class DeploymentWrapper:
+COLLECTIONS_REQUIREMENTS_FILE = os.path.join(SCRIPT_PARENT_DIR, "requirements.yml")
+COLLECTIONS_STAMP_FILE = os.path.join(TEMP_DIR_PATH, "ansible_collections.stamp")
+INVENTORY_CACHE_FILE = os.path.join(TEMP_DIR_PATH, "inventory_cache.json")
+ANSIBLE_CONFIG_FILE = os.path.join(SCRIPT_PARENT_DIR, "ansible.cfg")
+CLUSTER_ANSIBLE_CONFIGS_PATH = os.path.join(TEMP_DIR_PATH, "ansible_config")
+FACT_CACHE_PATH = os.path.join(TEMP_DIR_PATH, "ansible_facts")
+# Kept short, unix socket paths are limited to ~100 characters
+SSH_CONTROL_PATH = os.path.join(os.path.expanduser("~"), ".ansible", "cp")
+DEFAULT_COLLECTIONS_CACHE_PATH = os.path.join(SCRIPT_PARENT_DIR, "collections_cache")
+DEPLOYMENT_LEDGER_FILE = os.path.join(ANSIBLE_LOGS_PATH, "deployment_ledger.json")
+CHECKPOINTS_PATH = os.path.join(ANSIBLE_LOGS_PATH, "checkpoints")
+DEFAULT_TIMING_REPORT_RUNS = 5
+DEFAULT_TIMING_THRESHOLD = 20
+DEFAULT_LOG_PULL_WORKERS = 8
+DEFAULT_LOG_PULL_TIMEOUT = 300
+BIOSFW_SYSCFG_PACKAGE = os.path.join(SCRIPT_PARENT_DIR, "biosfw", "syscfg_package.zip")
+# Playbooks running the settings check which precheck_cluster_settings anticipates, and their settings playbooks
+# run alone before a resumed deployment because --start-at-task skips the settings check
+SETTINGS_CHECK_PLAYBOOKS = {
+    "network_edge.yml": "network_edge_settings.yml",
+    "single_node_network_edge.yml": "single_node_network_edge_settings.yml",
+}
+SETTINGS_PHASE = "settings"
+# Paths which content, besides the inventory itself, affects every deployment
+PLAYBOOK_TREE_PATHS = ("roles", "playbooks", "tasks", "library", "ansible.cfg", "requirements.yml")
+# Playbook which can be run as separate phases pipelined across clusters, and its phase playbooks in order
+PIPELINED_PLAYBOOK = "network_edge.yml"
+DEPLOYMENT_PHASES = (
+    ("infrastructure", "network_edge_infrastructure.yml"),
+    ("kubernetes", "network_edge_kubernetes.yml"),
+    ("telemetry", "network_edge_telemetry.yml"),
+)
+
+
+class DeploymentWrapper: # pylint: disable=too-many-instance-attributes
     """DeploymentWrapper is an object that contains information about Network Edge deployment"""
     def __init__(self, process, inventory, playbook_file_name, log_file):
         self.process = process
@@ -59,6 +96,10 @@ class DeploymentWrapper:
         self.cluster_name = inventory.cluster_name
         self.playbook_file_name = playbook_file_name
         self.log_file = log_file
+        self.output_stream = None
+        self.fingerprint = None
+        self.timing_file = None
+        self.is_final_phase = True
         self.has_ended = False
         self.ended_successfully = False
 
@@ -66,21 +107,44 @@ class DeploymentWrapper:
         """kill deployment"""
 
 
-    def pull_logs(self):
-        """pull_logs pulls .tar.gz package with deployment logs"""
+    def close_log_file(self):
+        """Reads the rest of deployment output and closes the log file"""
+        if self.output_stream is not None:
+            self.output_stream.drain()
+        self.log_file.close()
+
+    def pull_logs(self, archive=None, timeout=None):
+        """pull_logs sends .tar.gz snapshot of the experience kit to the controller, archive is created if not given"""
         log_all.collect_logs(self.inventory.controller_ansible_user,
-                             self.inventory.controller_ansible_host)
+                             self.inventory.controller_ansible_host,
+                             archive, timeout)
 
 
 # Global variable to be shared between main and signal handler.
 deployment_wrappers = []
 
 
-def install_ansible_collections():
-    """Install ansible collections by ansible-galaxy tool"""
-     # pylint disable - temporary solution
-    in_cmd = "ansible-galaxy install -r requirements.yml".split()
-    subprocess.run(in_cmd, check=True)# pylint: disable=bad-option-value,consider-using-with # nosec - bandit: security considered
+def install_ansible_collections(cache_path=None, force=False):
+    """Install ansible collections by ansible-galaxy tool unless requirements and installed versions are unchanged.
+    Collections are installed from local tarball cache if cache_path is given or the default cache is populated."""
+    if not force and galaxy_cache.is_up_to_date(COLLECTIONS_REQUIREMENTS_FILE, COLLECTIONS_STAMP_FILE):
+        logging.info("Ansible collections are up to date, skipping installation")
+        return
+
+    if cache_path is None and galaxy_cache.is_cache_populated(DEFAULT_COLLECTIONS_CACHE_PATH,
+                                                              COLLECTIONS_REQUIREMENTS_FILE):
+        cache_path = DEFAULT_COLLECTIONS_CACHE_PATH
+
+    if cache_path is not None:
+        if not galaxy_cache.is_cache_populated(cache_path, COLLECTIONS_REQUIREMENTS_FILE):
+            galaxy_cache.populate_cache(cache_path, COLLECTIONS_REQUIREMENTS_FILE)
+        galaxy_cache.install_from_cache(cache_path)
+    else:
+        # pylint disable - temporary solution
+        in_cmd = "ansible-galaxy install -r requirements.yml".split()
+        subprocess.run(in_cmd, check=True)# pylint: disable=bad-option-value,consider-using-with # nosec - bandit: security considered
+
+    galaxy_cache.write_stamp(COLLECTIONS_REQUIREMENTS_FILE, COLLECTIONS_STAMP_FILE)
 
 def create_log_dir_if_not_exists():
     """Creates ANSIBLE_LOGS_PATH directory if it does not exists"""
@@ -96,64 +160,11 @@ def get_log_file_path(deployment, cluster_name, playbook_basename):
     return os.path.join(ANSIBLE_LOGS_PATH, filename)
 
 
-def remove_files_recurse_by_pattern(path, pattern):
-    """Iterates recursively over files in given path and removes which match pattern"""
-    for root, _, files in os.walk(path):
-        for filename in files:
-            if match(pattern, filename):
-                os.remove(os.path.join(root, filename))
-
-
-def remove_any_deployment_symlinks(group_vars_path):
-    """Removes any deployment symlinks files in group_vars folders"""
-    remove_files_recurse_by_pattern(group_vars_path, DEPLOYMENT_LINK_PATTERN)
-
-
 def verify_deployment(deployment, deployment_path):
     """Checks if given deployment is valid for deployment"""
     return os.path.exists(os.path.join(deployment_path, deployment))
 
 
-def create_sym_links_for_deployment(deployment, deployment_path, group_vars_path=DEFAULT_GROUP_VARS_PATH):
-    """Creates symlinks from deployment files for ansible"""
-    deployment_path_content = next(os.walk(deployment_path))
-    for deployment_file in deployment_path_content[FILENAMES]:
-        if match(r"^[a-z]\w*\.ya?ml$", deployment_file, IGNORECASE|ASCII):
-
-            file_path = os.path.join(deployment_path_content[DIR_PATH], deployment_file)
-            basename_path = os.path.splitext(file_path)[ROOT_PART]
-            # Deployment filename without extension (e.g. `controller_group`)
-            fname = os.path.basename(basename_path)
-            dirname = os.path.join(group_vars_path, fname)
-
-            # Check if directory exists in group_vars regarding to deployment filename (e.g. `all`)
-            if not os.path.exists(dirname):
-                logging.error('Deployment "%s" does not match a directory in /group_vars:', dirname)
-                list_dir = ', '.join(os.listdir(group_vars_path))
-                logging.info(list_dir)
-                sys.exit(ERROR_EXIT_CODE)
-
-            deployment_link_name = f"{DEPLOYMENT_LINK_PREFIX}{deployment}{DEPLOYMENT_LINK_POSTFIX}"
-            link_path = os.path.join(dirname, deployment_link_name)
-            os.symlink(file_path, link_path)
-        else:
-            logging.warning("Unrecognised file %s in %s. Will not be used in deployment!",
-                         deployment_file, deployment_path)
-
-
-def handle_deployment_type(deployment, group_vars_path):
-    """Handles deployment for deployment"""
-    remove_any_deployment_symlinks(group_vars_path)
-    deployment_path = os.path.join(DEPLOYMENTS_PATH, deployment)
-    verify_deployment(deployment, deployment_path)
-    create_sym_links_for_deployment(deployment, deployment_path, group_vars_path)
-
-
-def remove_any_platform_profile_symlinks(group_vars_path):
-    """Removes any platform profile symlinks files in group_vars folders"""
-    remove_files_recurse_by_pattern(group_vars_path, PLATFORM_PROFILE_LINK_PATTERN)
-
-
 def verify_platform_profile(platform_profile, platform_profile_path):
     """Checks if given platform profile is valid for platform_profile"""
     if platform_profile:
@@ -162,43 +173,36 @@ def verify_platform_profile(platform_profile, platform_profile_path):
     return True
 
 
-def create_sym_links_for_platform_profile(platform_profile,
-                                          platform_profile_path,
-                                          group_vars_path=DEFAULT_GROUP_VARS_PATH):
-    """Creates symlinks from platform profile files for ansible"""
-    platform_profile_path_content = next(os.walk(platform_profile_path))
-    for platform_profile_file in platform_profile_path_content[FILENAMES]:
-        if match(r"^[a-z]\w*\.ya?ml$", platform_profile_file, IGNORECASE|ASCII):
-
-            file_path = os.path.join(platform_profile_path_content[DIR_PATH], platform_profile_file)
-            basename_path = os.path.splitext(file_path)[ROOT_PART]
-            # Platform Profile filename without extension (e.g. `controller_group`)
-            fname = os.path.basename(basename_path)
-            dirname = os.path.join(group_vars_path, fname)
-
-            # Check if directory exists in group_vars regarding to platform profile filename (e.g. `all`)
-            if not os.path.exists(dirname):
-                logging.error('Platform Profile "%s" does not match a directory in /group_vars:', dirname)
-                list_dir = ', '.join(os.listdir(group_vars_path))
-                logging.info(list_dir)
+def add_profile_links(manifest, name, profile_path, link_prefix, link_postfix, kind):
+    """Adds symlinks to deployment or platform profile files to group_vars manifest"""
+    profile_path_content = next(os.walk(profile_path))
+    for profile_file in profile_path_content[FILENAMES]:
+        if match(r"^[a-z]\w*\.ya?ml$", profile_file, IGNORECASE|ASCII):
+            file_path = os.path.join(profile_path_content[DIR_PATH], profile_file)
+            # Profile filename without extension (e.g. `controller_group`)
+            group = os.path.splitext(profile_file)[ROOT_PART]
+
+            # Check if directory exists in group_vars regarding to profile filename (e.g. `all`)
+            if group not in manifest.dirs:
+                logging.error('%s "%s" does not match a directory in /group_vars:', kind, group)
+                logging.info(', '.join(sorted(manifest.dirs)))
                 sys.exit(ERROR_EXIT_CODE)
 
-            link_name = f"{PLATFORM_PROFILE_LINK_PREFIX}{platform_profile}{PLATFORM_PROFILE_LINK_POSTFIX}"
-            link_path = os.path.join(dirname, link_name)
-            os.symlink(file_path, link_path)
+            manifest.add_link(os.path.join(group, f"{link_prefix}{name}{link_postfix}"), file_path)
         else:
-            logging.warning("Unrecognised file %s in %s. Will not be used in platform_profile!",
-                         platform_profile_file, platform_profile_path)
-
+            logging.warning("Unrecognised file %s in %s. Will not be used in %s!",
+                            profile_file, profile_path, kind)
 
-def handle_platform_profile_type(platform_profile, group_vars_path):
-    """Handles platform_profile for platform profile"""
-    remove_any_platform_profile_symlinks(group_vars_path)
 
+def get_group_vars_manifest(deployment, platform_profile):
+    """Returns desired symlinks of cluster group_vars directory"""
+    manifest = inventory_sync.collect_tree_links(DEFAULT_GROUP_VARS_PATH)
+    add_profile_links(manifest, deployment, os.path.join(DEPLOYMENTS_PATH, deployment),
+                      DEPLOYMENT_LINK_PREFIX, DEPLOYMENT_LINK_POSTFIX, "Deployment")
     if platform_profile:
-        platform_profile_path = os.path.join(PLATFORM_PROFILE_PATH, platform_profile)
-        verify_platform_profile(platform_profile, platform_profile_path)
-        create_sym_links_for_platform_profile(platform_profile, platform_profile_path, group_vars_path)
+        add_profile_links(manifest, platform_profile, os.path.join(PLATFORM_PROFILE_PATH, platform_profile),
+                          PLATFORM_PROFILE_LINK_PREFIX, PLATFORM_PROFILE_LINK_POSTFIX, "Platform Profile")
+    return manifest
 
 
 def prepare_alt_dir_layout():
@@ -207,66 +211,27 @@ def prepare_alt_dir_layout():
         os.makedirs(ALT_INVENTORIES_PATH)
 
 
-def create_symlinks_for_inventory(src_vars_path, dest_vars_path):
-    """Creates symlinks for alternative directory layout"""
-    for root, dirs, files in os.walk(src_vars_path):
-        for dir_name in dirs:
-            group_vars_group_dir = os.path.join(dest_vars_path, dir_name)
-            if not os.path.exists(group_vars_group_dir):
-                os.makedirs(group_vars_group_dir)
-        for file in files:
-            # Get last directory of file
-            orig_host_vars_yaml = os.path.join(root, file)
-            dirname = os.path.basename(os.path.dirname(orig_host_vars_yaml))
-            inventory_group_vars = os.path.join(dest_vars_path, dirname, file)
-            if not os.path.exists(inventory_group_vars):
-                os.symlink(orig_host_vars_yaml, inventory_group_vars)
-
-
-def handle_cluster_inventory_dir(cluster_inventory_path, group_vars_path, host_vars_path):
-    """Prepares inventory directory for specific cluster"""
-    if os.path.exists(cluster_inventory_path):
-        # Clear old host and group vars
-        if os.path.exists(group_vars_path):
-            try:
-                shutil.rmtree(group_vars_path)
-            except OSError as os_exception:
-                logging.error("Failed to remove group vars: %s %s. Remove it manualy to continue.",
-                              os_exception.filename, os_exception.strerror)
-                sys.exit(ERROR_EXIT_CODE)
-
-        if os.path.exists(host_vars_path):
-            try:
-                shutil.rmtree(host_vars_path)
-            except OSError as os_exception:
-                logging.error("Failed to remove host vars: %s %s. Remove it manualy to continue.",
-                              os_exception.filename, os_exception.strerror)
-                sys.exit(ERROR_EXIT_CODE)
-    else:
-        os.mkdir(cluster_inventory_path)
-
-    create_symlinks_for_inventory(DEFAULT_GROUP_VARS_PATH, group_vars_path)
-    create_symlinks_for_inventory(DEFAULT_HOST_VARS_PATH, host_vars_path)
-
-
-def run_deployment(inventory, cleanup, redeploy, reconfig, skip_inventory_generation):
-    """Deploys Smart Edge with given settings, returns Popen object"""
-
-    inventory_dir = os.path.join(ALT_INVENTORIES_PATH, inventory.cluster_name)
-
-    if skip_inventory_generation:
-        inventory_location = os.path.join(inventory_dir, "inventory.yaml")
-    else:
-        inventory_location = inventory.dump_to_yaml(inventory_dir)
+def handle_cluster_inventory_dir(cluster_inventory_path, deployment, platform_profile):
+    """Prepares inventory directory for specific cluster, group and host vars are swapped in only when changed"""
+    os.makedirs(cluster_inventory_path, exist_ok=True)
 
-    group_vars_path = os.path.join(inventory_dir, GROUP_VARS_DIR)
-    host_vars_path = os.path.join(inventory_dir, HOST_VARS_DIR)
+    vars_manifests = {
+        GROUP_VARS_DIR: get_group_vars_manifest(deployment, platform_profile),
+        HOST_VARS_DIR: inventory_sync.collect_tree_links(DEFAULT_HOST_VARS_PATH),
+    }
+    for vars_dir, manifest in vars_manifests.items():
+        vars_path = os.path.join(cluster_inventory_path, vars_dir)
+        try:
+            changes = inventory_sync.sync_directory(vars_path, manifest)
+        except OSError as os_exception:
+            logging.error("Failed to update %s: %s %s. Remove it manualy to continue.",
+                          vars_dir, os_exception.filename, os_exception.strerror)
+            sys.exit(ERROR_EXIT_CODE)
+        logging.debug('%s: %d entries updated', vars_path, changes)
 
-    if not skip_inventory_generation:
-        handle_cluster_inventory_dir(inventory_dir, group_vars_path, host_vars_path)
-        handle_deployment_type(inventory.deployment, group_vars_path)
-        handle_platform_profile_type(inventory.platform_profile, group_vars_path)
 
+def get_playbook(inventory, cleanup, redeploy, reconfig):
+    """Returns path of the playbook deploying given inventory"""
     # DEK do not support extra arguments like "clean" or "redeploy"
     extra_options_supported = inventory.deployment in ["pwek-all-in-one"]
 
@@ -282,15 +247,141 @@ def run_deployment(inventory, cleanup, redeploy, reconfig, skip_inventory_genera
         else:
             playbook = "network_edge.yml"
 
-    playbook = os.path.join(SCRIPT_PARENT_DIR, playbook)
+    return os.path.join(SCRIPT_PARENT_DIR, playbook)
+
+
+def get_cluster_vars_files(inventory, skip_inventory_generation):
+    """Returns {relative path: resolved path} of group and host vars files used by the cluster"""
+    vars_files = {}
+    if skip_inventory_generation:
+        inventory_dir = os.path.join(ALT_INVENTORIES_PATH, inventory.cluster_name)
+        for vars_dir in (GROUP_VARS_DIR, HOST_VARS_DIR):
+            for rel_path, path in ledger.list_tree_files(os.path.join(inventory_dir, vars_dir)).items():
+                vars_files[os.path.join(vars_dir, rel_path)] = path
+        return vars_files
+
+    vars_manifests = {
+        GROUP_VARS_DIR: get_group_vars_manifest(inventory.deployment, inventory.platform_profile),
+        HOST_VARS_DIR: inventory_sync.collect_tree_links(DEFAULT_HOST_VARS_PATH),
+    }
+    for vars_dir, manifest in vars_manifests.items():
+        for rel_path, target in manifest.links.items():
+            vars_files[os.path.join(vars_dir, rel_path)] = target
+    return vars_files
+
+
+def get_cluster_vars(inventory, skip_inventory_generation):
+    """Returns group variables of the cluster resolved in ansible precedence order"""
+    return resolved_vars.ResolvedVars(get_cluster_vars_files(inventory, skip_inventory_generation),
+                                      inventory.group_vars, inventory.host_vars)
+
+
+def precheck_cluster_settings(inventory, skip_inventory_generation):
+    """Returns list of errors in settings of the cluster which would fail the deployment in its settings check.
+    Variables are resolved for every edge node, with its host vars applied over group vars."""
+    cluster_vars = get_cluster_vars(inventory, skip_inventory_generation)
+    errors = []
+    if not os.path.isfile(BIOSFW_SYSCFG_PACKAGE):
+        for host in inventory.get_group_hosts("edgenode_group"):
+            if cluster_vars.evaluate("ne_biosfw_enable | default(False)", group="edgenode_group", host=host):
+                layer = cluster_vars.get_layer("ne_biosfw_enable", "edgenode_group", host)
+                errors.append(f"BIOSFW feature enabled for {host} in {layer}, but the SYSCFG package is missing. "
+                              f"It is expected in: {BIOSFW_SYSCFG_PACKAGE}")
+    return errors
+
+
+def compute_deployment_fingerprint(inventory, playbook, skip_inventory_generation):
+    """Returns fingerprint of everything the cluster deployment depends on"""
+    trees = [os.path.join(SCRIPT_PARENT_DIR, path) for path in PLAYBOOK_TREE_PATHS]
+    trees.append(os.path.join(DEPLOYMENTS_PATH, inventory.deployment))
+    if inventory.platform_profile:
+        trees.append(os.path.join(PLATFORM_PROFILE_PATH, inventory.platform_profile))
+    phase_playbooks = []
+    if os.path.basename(playbook) == PIPELINED_PLAYBOOK:
+        phase_playbooks = [os.path.join(SCRIPT_PARENT_DIR, phase_playbook) for _, phase_playbook in DEPLOYMENT_PHASES]
+    return ledger.compute_fingerprint(inventory.inventory,
+                                      get_cluster_vars_files(inventory, skip_inventory_generation),
+                                      tuple(trees), playbook, phase_playbooks)
+
+
+def get_resume_task(inventory, playbook, fingerprint):
+    """Returns task the cluster deployment should be resumed at, None to deploy from the beginning"""
+    checkpoint_path = checkpoint.get_checkpoint_file_path(CHECKPOINTS_PATH, inventory.cluster_name)
+    resume_task, segment = checkpoint.find_resume_point(checkpoint_path, fingerprint, os.path.basename(playbook))
+    if resume_task is None:
+        logging.info('%s: no checkpoint to resume from, deploying from the beginning.', inventory.cluster_name)
+    else:
+        logging.info('%s: resuming play "%s" role "%s" at task "%s".', inventory.cluster_name,
+                     segment["play"], segment["role"], resume_task)
+    return resume_task
+
+
+def select_changed_inventories(inventories, fingerprints):
+    """Returns inventories which have not been deployed successfully with their current fingerprint"""
+    deployment_ledger = ledger.DeploymentLedger(DEPLOYMENT_LEDGER_FILE)
+    changed = []
+    for inventory in inventories:
+        if deployment_ledger.is_unchanged(inventory.cluster_name, fingerprints[inventory.cluster_name]):
+            logging.info('%s: unchanged since the deployment at %s, skipping.', inventory.cluster_name,
+                         deployment_ledger.get_entry(inventory.cluster_name)["deployed_at"])
+        else:
+            changed.append(inventory)
+    return changed
+
+
+def get_deployment_phases(inventory, playbook, pipeline_phases, resume=False):
+    """Returns list of ScheduledPhase units deploying the cluster.
+    Resumed deployment is preceded by the settings check of its playbook, if it has one."""
+    if resume and os.path.basename(playbook) in SETTINGS_CHECK_PLAYBOOKS:
+        settings_playbook = os.path.join(SCRIPT_PARENT_DIR, SETTINGS_CHECK_PLAYBOOKS[os.path.basename(playbook)])
+        return [scheduler.ScheduledPhase(inventory, SETTINGS_PHASE, settings_playbook, False),
+                scheduler.ScheduledPhase(inventory, None, None, True)]
+    if not pipeline_phases or os.path.basename(playbook) != PIPELINED_PLAYBOOK:
+        return [scheduler.ScheduledPhase(inventory, None, None, True)]
+    return [scheduler.ScheduledPhase(inventory, phase, os.path.join(SCRIPT_PARENT_DIR, phase_playbook),
+                                     index == len(DEPLOYMENT_PHASES) - 1)
+            for index, (phase, phase_playbook) in enumerate(DEPLOYMENT_PHASES)]
+
+
+def generate_cluster_ansible_config(inventory, fact_cache_ttl):
+    """Writes ansible config of the cluster with forks, SSH multiplexing and fact cache settings, returns its path"""
+    overrides = ansible_config.get_cluster_overrides(
+        host_count=len(inventory.hosts),
+        fact_cache_path=os.path.join(FACT_CACHE_PATH, inventory.cluster_name),
+        control_path_dir=os.path.join(SSH_CONTROL_PATH, inventory.cluster_name),
+        fact_cache_ttl=fact_cache_ttl)
+    return ansible_config.write_cluster_config(
+        ANSIBLE_CONFIG_FILE, os.path.join(CLUSTER_ANSIBLE_CONFIGS_PATH, f"{inventory.cluster_name}.cfg"), overrides)
+
+
+def run_deployment(inventory, cleanup, redeploy, reconfig, skip_inventory_generation, # pylint: disable=too-many-arguments,too-many-locals
+                   fingerprint=None, start_at_task=None, playbook=None, timing_file=None,
+                   fact_cache_ttl=ansible_config.DEFAULT_FACT_CACHE_TTL, record_checkpoint=True):
+    """Deploys Smart Edge with given settings, returns Popen object.
+    playbook overrides the default playbook of the inventory, timing_file the task timing records file.
+    Without record_checkpoint the checkpoint of the cluster is left untouched."""
+
+    inventory_dir = os.path.join(ALT_INVENTORIES_PATH, inventory.cluster_name)
+
+    if skip_inventory_generation:
+        inventory_location = os.path.join(inventory_dir, "inventory.yaml")
+    else:
+        inventory_location = inventory.dump_to_yaml(inventory_dir)
+
+    if not skip_inventory_generation:
+        handle_cluster_inventory_dir(inventory_dir, inventory.deployment, inventory.platform_profile)
+
+    if playbook is None:
+        playbook = get_playbook(inventory, cleanup, redeploy, reconfig)
 
     ansible_playbook_path = shutil.which("ansible-playbook")
-    ansible_playbook_command = f"{ansible_playbook_path} " \
-                               f"-vv {playbook} " \
-                               f"--inventory {inventory_location}"
+    ansible_playbook_command = [ansible_playbook_path, "-vv", playbook, "--inventory", inventory_location]
 
     if inventory.limit:
-        ansible_playbook_command = f"{ansible_playbook_command} --limit {inventory.limit}"
+        ansible_playbook_command.extend(["--limit", inventory.limit])
+
+    if start_at_task:
+        ansible_playbook_command.extend(["--start-at-task", start_at_task])
 
     playbook_basename = os.path.basename(playbook)
     deployment_log_file_path = get_log_file_path(
@@ -298,22 +389,41 @@ def run_deployment(inventory, cleanup, redeploy, reconfig, skip_inventory_genera
         inventory.cluster_name,
         playbook_basename)
     # pylint disable because log_file is a long living object.
-    log_file = open(deployment_log_file_path, "a+", encoding="utf-8") # pylint: disable=bad-option-value,consider-using-with
+    log_file = open(deployment_log_file_path, "ab") # pylint: disable=bad-option-value,consider-using-with
 
     logging.info('%s %s: command: "%s"',
-                 inventory.cluster_name, playbook_basename, ansible_playbook_command)
+                 inventory.cluster_name, playbook_basename, subprocess.list2cmdline(ansible_playbook_command))
     logging.info('%s %s: log file: "%s"',
                  inventory.cluster_name, playbook_basename, os.path.realpath(log_file.name))
 
+    # Generated config is kept so other playbooks (e.g. readiness_check.yml) can be run with it
+    cluster_ansible_config = generate_cluster_ansible_config(inventory, fact_cache_ttl)
+    logging.info('%s %s: ansible config: "%s"', inventory.cluster_name, playbook_basename, cluster_ansible_config)
+
+    # Per task timing records and checkpoints written by the task_timing and deployment_checkpoint callback plugins
+    os.makedirs(CHECKPOINTS_PATH, exist_ok=True)
+    if timing_file is None:
+        timing_file = timing_report.get_timing_file_path(deployment_log_file_path)
+    env = dict(os.environ,
+               ANSIBLE_CONFIG=cluster_ansible_config,
+               TASK_TIMING_OUTPUT_FILE=timing_file,
+               TASK_TIMING_CLUSTER_NAME=inventory.cluster_name,
+               DEPLOYMENT_CHECKPOINT_FILE=(checkpoint.get_checkpoint_file_path(CHECKPOINTS_PATH, inventory.cluster_name)
+                                           if record_checkpoint else ""),
+               DEPLOYMENT_CHECKPOINT_FINGERPRINT=fingerprint or "",
+               DEPLOYMENT_CHECKPOINT_RESUME="true" if start_at_task else "false")
+
     # pylint disable because deployment_process is a long living object.
-    deployment_process = subprocess.Popen(ansible_playbook_command.split(), # pylint: disable=bad-option-value,consider-using-with # nosec - bandit: security considered
-                                          stdout=log_file, stderr=subprocess.STDOUT)
+    deployment_process = subprocess.Popen(ansible_playbook_command, # pylint: disable=bad-option-value,consider-using-with # nosec - bandit: security considered
+                                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
 
-    return DeploymentWrapper(process=deployment_process,
-                             inventory=inventory,
-                             playbook_file_name=playbook_basename,
-                             log_file=log_file,
-                             )
+    deployment = DeploymentWrapper(process=deployment_process,
+                                   inventory=inventory,
+                                   playbook_file_name=playbook_basename,
+                                   log_file=log_file,
+                                   )
+    deployment.timing_file = timing_file
+    return deployment
 
 
 def kill_deployments(deployments):
@@ -324,78 +434,153 @@ def kill_deployments(deployments):
                 os.kill(deployment.process.pid, signal.SIGTERM)
             except ProcessLookupError:
                 logging.info('Playbook "%s" | cluster "%s" already terminated.',
-                             deployment.playbook_file_name, deployment.name)
+                             deployment.playbook_file_name, deployment.cluster_name)
                 continue
             deployment.process.terminate()
+            # Output pipe is closed before waiting so terminating process cannot block on writing to it
+            if deployment.log_file is not None:
+                deployment.close_log_file()
             deployment.process.wait()
             deployment.has_ended = True
             deployment.ended_successfully = False
-            if deployment.log_file is not None:
-                deployment.log_file.close()
             logging.info('Playbook "%s" | cluster "%s" terminated.',
                          deployment.playbook_file_name, deployment.cluster_name)
 
 
-def print_log_line(line):
-    """Print ansible deployment log line callback"""
-    print(line, end='')
-    sys.stdout.flush()
+def get_cluster_results(deployments):
+    """Returns {cluster name: True if successful} in order of deployment start.
+    Cluster deployed in phases is successful only if all its phases, including the final one, succeeded."""
+    results = {}
+    final_phase_ran = set()
+    for deployment in deployments:
+        results[deployment.cluster_name] = (results.get(deployment.cluster_name, True) and
+                                            deployment.ended_successfully)
+        if deployment.is_final_phase:
+            final_phase_ran.add(deployment.cluster_name)
+    return {cluster_name: successful and cluster_name in final_phase_ran
+            for cluster_name, successful in results.items()}
 
 
 def has_deployments_successful(deployments):
     """Check if whole deployment was successful"""
-    for deployment in deployments:
-        if not deployment.ended_successfully:
-            return False
-    return True
-
-
-def has_deployments_ended(deployments):
-    """Check if deployments has ended"""
-    for deployment in deployments:
-        if not deployment.has_ended:
-            return False
+    return all(get_cluster_results(deployments).values())
+
+
+def handle_deployment_exit(deployment, deployments, exit_on_error=False):
+    """Records result of ended deployment, returns False if other deployments should not be continued"""
+    deployment.has_ended = True
+    deployment.ended_successfully = deployment.process.returncode == 0
+    deployment.close_log_file()
+
+    if deployment.ended_successfully:
+        logging.info('%s %s: succeed.',
+                     deployment.cluster_name,
+                     deployment.playbook_file_name)
+        if not deployment.is_final_phase:
+            return True
+        if deployment.fingerprint is not None:
+            ledger.DeploymentLedger(DEPLOYMENT_LEDGER_FILE).record(
+                deployment.cluster_name, deployment.fingerprint, deployment.playbook_file_name)
+        checkpoint.remove_checkpoint(checkpoint.get_checkpoint_file_path(CHECKPOINTS_PATH, deployment.cluster_name))
+        return True
+
+    logging.error('%s %s: failed. Please check the logs: %s',
+                  deployment.cluster_name,
+                  deployment.playbook_file_name,
+                  os.path.realpath(deployment.log_file.name))
+    if exit_on_error is True:
+        logging.info("--any-errors-fatal flag raised, terminating other deployments...")
+        kill_deployments(deployments)
+        return False
     return True
 
 
-def check_deployments_status(deployments, exit_on_error=False):
-    """Simple asynchronous checks if some deployment is finished"""
+def create_log_tee(inventories, follow=None):
+    """Creates tee stage streaming deployments output to the console"""
+    cluster_names = [inventory.cluster_name for inventory in inventories]
+    if follow:
+        for cluster_name in set(follow) - set(cluster_names):
+            logging.warning('Cluster "%s" passed to --follow is not deployed.', cluster_name)
+        followed = [name for name in cluster_names if name in follow]
+    else:
+        followed = cluster_names
 
-    # In single cluster deployment, logs are forwarded to stdout.
-    if len(deployments) == 1:
+    if len(cluster_names) == 1:
         logging.info("Only one cluster is being deployed. Redirecting logs to stdout.")
-        sh.tail("-n", "100000", "-f", # pylint: disable=no-member
-                deployments[0].log_file.name,
-                _out=print_log_line,
-                _bg=True,
-                _new_session=False)
+    elif len(followed) == len(cluster_names):
+        logging.info("More than one deployment is running, showing merged logs of all clusters. "
+                     "Use --follow to select clusters, detailed logs are in the log files.")
     else:
-        logging.info("More than one deployment is running, "
-                     "please check the log files for detailed deployment logs.")
-
-    while not has_deployments_ended(deployments):
-        for _, deployment in enumerate(deployments):
-            if deployment.process.poll() is None or deployment.has_ended:
-                pass
-            elif deployment.process.poll() == 0:
-                logging.info('%s %s: succeed.',
-                             deployment.cluster_name,
-                             deployment.playbook_file_name)
-                deployment.log_file.close()
-                deployment.has_ended = True
-                deployment.ended_successfully = True
-            elif deployment.process.poll() != 0:
-                logging.error('%s %s: failed. Please check the logs: %s',
-                              deployment.cluster_name,
-                              deployment.playbook_file_name,
-                              os.path.realpath(deployment.log_file.name))
-                deployment.log_file.close()
-                deployment.has_ended = True
-                deployment.ended_successfully = False
-                if exit_on_error is True:
-                    logging.info("--any-errors-fatal flag raised, terminating other deployments...")
-                    kill_deployments(deployments)
-        time.sleep(1)
+        logging.info("Showing logs of clusters: %s. Detailed logs of all clusters are in the log files.",
+                     ", ".join(followed))
+
+    return log_tee.LogTee(follow=followed,
+                          prefix=len(cluster_names) > 1,
+                          rate_limit=log_tee.DEFAULT_RATE_LIMIT if len(followed) > 1 else 0)
+
+
+def supervise_deployments(inventories, deployment_scheduler, launch, deployments, exit_on_error=False, # pylint: disable=too-many-arguments
+                          follow=None):
+    """Launches deployments of given inventories picked by the scheduler and waits until all of them end.
+    Started deployments are appended to deployments list."""
+    tee = create_log_tee(inventories, follow)
+
+    def launch_and_stream(unit):
+        deployment = launch(unit)
+        deployment.output_stream = tee.attach(deployment.cluster_name, deployment.process.stdout,
+                                              deployment.log_file, deployment_supervisor)
+        return deployment
+
+    deployment_supervisor = supervisor.DeploymentSupervisor(
+        launch=launch_and_stream,
+        on_exit=lambda deployment: handle_deployment_exit(deployment, deployments, exit_on_error))
+    not_started = deployment_supervisor.run(deployment_scheduler, deployments)
+    tee.flush()
+
+    for unit in not_started:
+        if unit.phase is None:
+            logging.info('%s: not started because of previous failure.', unit.inventory.cluster_name)
+        else:
+            logging.info('%s: %s phase not started because of previous failure.',
+                         unit.inventory.cluster_name, unit.phase)
+
+
+def pull_deployment_logs(deployments, max_workers, timeout):
+    """Pulls logs of every deployed cluster concurrently, sharing one archive of the experience kit"""
+    archive = log_all.create_archive()
+    if archive is None:
+        logging.error("Creating experience kit archive failed, logs are not pulled")
+        return
+
+    cluster_deployments = {}
+    for deployment in deployments:
+        cluster_deployments.setdefault(deployment.cluster_name, deployment)
+
+    try:
+        with futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pulls = {executor.submit(deployment.pull_logs, archive, timeout): cluster_name
+                     for cluster_name, deployment in cluster_deployments.items()}
+            for pull in futures.as_completed(pulls):
+                try:
+                    pull.result()
+                except OSError as os_error:
+                    logging.error("%s: pulling logs failed: %s", pulls[pull], os_error)
+    finally:
+        archive.close()
+
+
+def print_timing_report(last_runs, threshold):
+    """Prints role duration regressions of the last runs on stdout, returns True if any role regressed"""
+    deployments = os.listdir(DEPLOYMENTS_PATH) if os.path.isdir(DEPLOYMENTS_PATH) else []
+    report_lines, regressed_count = timing_report.build_report(ANSIBLE_LOGS_PATH, last_runs, threshold / 100,
+                                                               deployments=deployments)
+    logging.info("====================")
+    logging.info("TIMING REPORT:")
+    logging.info("====================")
+    for line in report_lines:
+        logging.info(line)
+    logging.info("====================")
+    return regressed_count > 0
 
 
 def exit_gracefully(signum, _):
@@ -410,11 +595,12 @@ def exit_gracefully(signum, _):
 
 def print_deployment_recap(deployments):
     """Prints deployment recap on stdout"""
-    deployment_count = len(deployments)
+    cluster_results = get_cluster_results(deployments)
+    deployment_count = len(cluster_results)
     successful_count = 0
     failure_count = 0
-    for deployment in deployments:
-        if deployment.ended_successfully:
+    for ended_successfully in cluster_results.values():
+        if ended_successfully:
             successful_count = successful_count + 1
         else:
             failure_count = failure_count + 1
@@ -424,12 +610,45 @@ def print_deployment_recap(deployments):
     logging.info("DEPLOYMENT COUNT: %d", deployment_count)
     logging.info("SUCCESSFUL DEPLOYMENTS: %d", successful_count)
     logging.info("FAILED DEPLOYMENTS: %d", failure_count)
-    for deployment in deployments:
-        deployment_status = "SUCCESSFUL" if deployment.ended_successfully else "FAILED"
-        logging.info('DEPLOYMENT "%s": %s', deployment.cluster_name, deployment_status)
+    for cluster_name, ended_successfully in cluster_results.items():
+        deployment_status = "SUCCESSFUL" if ended_successfully else "FAILED"
+        logging.info('DEPLOYMENT "%s": %s', cluster_name, deployment_status)
     logging.info("====================")
 
 
+def non_negative_int(value):
+    """argparse type accepting integers greater or equal to 0"""
+    try:
+        number = int(value)
+    except ValueError as value_error:
+        raise argparse.ArgumentTypeError(f"invalid integer value: '{value}'") from value_error
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"value must not be negative: '{value}'")
+    return number
+
+
+def positive_int(value):
+    """argparse type accepting integers greater than 0"""
+    number = non_negative_int(value)
+    if number == 0:
+        raise argparse.ArgumentTypeError(f"value must be positive: '{value}'")
+    return number
+
+
+def phase_limit(value):
+    """argparse type parsing PHASE=N limit of clusters running the deployment phase at once"""
+    phase, _, limit = value.partition("=")
+    phase_names = [name for name, _ in DEPLOYMENT_PHASES]
+    if phase not in phase_names:
+        raise argparse.ArgumentTypeError(f"unknown phase '{phase}', expected one of: {', '.join(phase_names)}")
+    return phase, positive_int(limit)
+
+
+def cluster_name_list(value):
+    """argparse type splitting comma separated list of cluster names"""
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
 def parse_arguments():
     """Parse argument passed to function"""
     script_description = ("Script for deploying Smart Edge using inventory.yml file. "
@@ -455,7 +674,62 @@ def parse_arguments():
                         action="store_true",
                         help="Skip automated inventories generation, this is used when external tool like Smart Edge"
                         " Platrom generates automated inventory")
-    return parser.parse_args()
+    parser.add_argument("-p", "--max-parallel", dest="max_parallel", type=non_negative_int, default=0,
+                        metavar="N",
+                        help="Maximum number of clusters deployed at the same time, 0 means no limit (default: 0)")
+    parser.add_argument("--collections-cache", dest="collections_cache", metavar="DIR", type=os.path.abspath,
+                        help="Directory with ansible collection tarballs used instead of Ansible Galaxy, "
+                             "populated on first use (default: collections_cache if populated)")
+    parser.add_argument("--force-collections-install", dest="force_collections_install", action="store_true",
+                        help="Install ansible collections even if requirements.yml and installed versions "
+                             "are unchanged since the last run")
+    parser.add_argument("--changed-only", dest="changed_only", action="store_true",
+                        help="Deploy only clusters whose inventory, vars, deployment, platform profile or playbooks "
+                             "changed since their last successful deployment recorded in logs/")
+    parser.add_argument("--resume", dest="resume", action="store_true",
+                        help="Restart failed deployments at the first incomplete role recorded in logs/checkpoints. "
+                             "Checkpoints are discarded when inventory, vars or playbooks changed. Tasks before the "
+                             "resume point are not run, facts set by them are restored from the checkpoint and the "
+                             "settings check is run alone before the resumed deployment")
+    parser.add_argument("--timing-report", dest="timing_report", nargs="?", type=positive_int, metavar="N",
+                        const=DEFAULT_TIMING_REPORT_RUNS,
+                        help="Compare role durations of the last N runs of every cluster (default: "
+                             f"{DEFAULT_TIMING_REPORT_RUNS}) and exit without deploying")
+    parser.add_argument("--timing-threshold", dest="timing_threshold", type=non_negative_int, metavar="PERCENT",
+                        default=DEFAULT_TIMING_THRESHOLD,
+                        help="Flag roles of the latest run slower than median of previous runs by more than PERCENT "
+                             f"(default: {DEFAULT_TIMING_THRESHOLD})")
+    parser.add_argument("--fact-cache-ttl", dest="fact_cache_ttl", type=non_negative_int, metavar="SECONDS",
+                        default=ansible_config.DEFAULT_FACT_CACHE_TTL,
+                        help="Cache host facts in tmp/ansible_facts between playbook runs for SECONDS, so facts are "
+                             "gathered only once e.g. for pipelined phases. Cached facts are not refreshed when hosts "
+                             "are reprovisioned or rebooted into a new kernel within that time, 0 disables fact "
+                             f"caching (default: {ansible_config.DEFAULT_FACT_CACHE_TTL})")
+    parser.add_argument("--cluster", dest="clusters", action="append", type=cluster_name_list, metavar="NAME",
+                        help="Deploy only the given cluster(s), only their inventory documents are parsed. "
+                             "May be repeated or given as a comma separated list")
+    parser.add_argument("--follow", dest="follow", action="append", type=cluster_name_list, metavar="CLUSTER",
+                        help="Show live logs only of the given cluster(s) on the console, "
+                             "may be repeated or given as a comma separated list")
+    parser.add_argument("--pipeline-phases", dest="pipeline_phases", action="store_true",
+                        help=f"Run {PIPELINED_PLAYBOOK} as separate infrastructure, kubernetes and telemetry phases "
+                             "so clusters can be in different phases at the same time")
+    parser.add_argument("--phase-limit", dest="phase_limits", action="append", type=phase_limit,
+                        metavar="PHASE=N",
+                        help="Maximum number of clusters running the phase at once, e.g. infrastructure=2 to limit "
+                             "load on a shared package mirror. May be repeated, implies --pipeline-phases")
+    parser.add_argument("--log-pull-workers", dest="log_pull_workers", type=positive_int,
+                        default=DEFAULT_LOG_PULL_WORKERS, metavar="N",
+                        help="Number of clusters logs are pulled from at once after a failed deployment "
+                             f"(default: {DEFAULT_LOG_PULL_WORKERS})")
+    parser.add_argument("--log-pull-timeout", dest="log_pull_timeout", type=positive_int,
+                        default=DEFAULT_LOG_PULL_TIMEOUT, metavar="SECONDS",
+                        help="Maximum time of pulling logs from a single cluster "
+                             f"(default: {DEFAULT_LOG_PULL_TIMEOUT})")
+    args = parser.parse_args()
+    if args.resume and (args.pipeline_phases or args.phase_limits):
+        parser.error("--resume cannot be used together with --pipeline-phases or --phase-limit")
+    return args
 
 
 def main(args):
@@ -478,10 +752,24 @@ def main(args):
                             logging.StreamHandler()
                             ]
                         )
+    if args.timing_report:
+        regressed = print_timing_report(args.timing_report, args.timing_threshold)
+        sys.exit(ERROR_EXIT_CODE if regressed else 0)
+
     logging.info('Install collections')
-    install_ansible_collections()
+    install_ansible_collections(args.collections_cache, args.force_collections_install)
+    clusters = [name for names in args.clusters for name in names] if args.clusters else None
+    try:
+        if not args.skip_inventory_generation:
+            inventory_handler = inventory_handlers.InventoryHandler(MULTI_INVENTORY_FILE, clusters,
+                                                                    INVENTORY_CACHE_FILE)
+        else:
+            inventory_handler = inventory_handlers.load_inventories(ALT_INVENTORIES_PATH, clusters)
+    except ValueError as value_error:
+        logging.fatal('Parsing inventory failed: %s', value_error)
+        sys.exit(ERROR_EXIT_CODE)
+
     if not args.skip_inventory_generation:
-        inventory_handler = inventory_handlers.InventoryHandler(MULTI_INVENTORY_FILE)
         for inventory in inventory_handler.get_inventories:
             if not verify_deployment(inventory.deployment, DEPLOYMENTS_PATH):
                 logging.fatal('Parsing inventory failed: deployment "%s" does not exists in "%s"',
@@ -494,25 +782,71 @@ def main(args):
                 sys.exit(ERROR_EXIT_CODE)
 
         prepare_alt_dir_layout()
-    else:
-        inventory_handler = inventory_handlers.load_inventories(ALT_INVENTORIES_PATH)
-
-    for inventory in inventory_handler.get_inventories:
-        deploy_wrapper = run_deployment(inventory, args.clean,
-            args.redeploy, args.reconfig, args.skip_inventory_generation)
 
-        deployment_wrappers.append(deploy_wrapper)
-        time.sleep(DEPLOYMENT_INTERVAL)
+    inventories = inventory_handler.get_inventories
+    fingerprints = {}
+    resume_tasks = {}
+    for inventory in inventories:
+        playbook = get_playbook(inventory, args.clean, args.redeploy, args.reconfig)
+        fingerprints[inventory.cluster_name] = compute_deployment_fingerprint(
+            inventory, playbook, args.skip_inventory_generation)
+        if args.resume:
+            resume_tasks[inventory.cluster_name] = get_resume_task(
+                inventory, playbook, fingerprints[inventory.cluster_name])
+
+    if args.changed_only:
+        inventories = select_changed_inventories(inventories, fingerprints)
+        if not inventories:
+            logging.info("All clusters are unchanged since their last successful deployment, nothing to do")
+            sys.exit(0)
+
+    settings_errors = False
+    for inventory in inventories:
+        playbook = get_playbook(inventory, args.clean, args.redeploy, args.reconfig)
+        if os.path.basename(playbook) not in SETTINGS_CHECK_PLAYBOOKS:
+            continue
+        for error in precheck_cluster_settings(inventory, args.skip_inventory_generation):
+            logging.fatal('%s: %s', inventory.cluster_name, error)
+            settings_errors = True
+    if settings_errors:
+        sys.exit(ERROR_EXIT_CODE)
 
-    check_deployments_status(deployment_wrappers, args.any_errors_fatal)
+    pipeline_phases = args.pipeline_phases or bool(args.phase_limits)
+    deployment_scheduler = scheduler.PhaseScheduler(
+        [get_deployment_phases(inventory, get_playbook(inventory, args.clean, args.redeploy, args.reconfig),
+                               pipeline_phases, resume=bool(resume_tasks.get(inventory.cluster_name)))
+         for inventory in inventories],
+        max_parallel=args.max_parallel,
+        phase_limits=dict(args.phase_limits or []))
+    # Phases of a cluster share one task timing file so the timing report sees a single run
+    timing_files = {}
+
+    def launch(unit):
+        cluster_name = unit.inventory.cluster_name
+        is_settings_check = unit.phase == SETTINGS_PHASE
+        deploy_wrapper = run_deployment(unit.inventory, args.clean,
+            args.redeploy, args.reconfig, args.skip_inventory_generation,
+            fingerprint=fingerprints[cluster_name],
+            start_at_task=None if is_settings_check else resume_tasks.get(cluster_name),
+            playbook=unit.playbook,
+            timing_file=timing_files.get(cluster_name),
+            fact_cache_ttl=args.fact_cache_ttl,
+            record_checkpoint=not is_settings_check)
+        deploy_wrapper.fingerprint = fingerprints[cluster_name]
+        deploy_wrapper.is_final_phase = unit.is_final
+        timing_files.setdefault(cluster_name, deploy_wrapper.timing_file)
+        return deploy_wrapper
+
+    follow = [name for names in args.follow for name in names] if args.follow else None
+    supervise_deployments(inventories, deployment_scheduler, launch, deployment_wrappers,
+                          args.any_errors_fatal, follow)
 
     print_deployment_recap(deployment_wrappers)
     if has_deployments_successful(deployment_wrappers):
         sys.exit(0)
     else:
         logging.info("Deployment failed, pulling logs")
-        for deployment in deployment_wrappers:
-            deployment.pull_logs()
+        pull_deployment_logs(deployment_wrappers, args.log_pull_workers, args.log_pull_timeout)
         sys.exit(ERROR_EXIT_CODE)
 
 
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Per-cluster ansible configuration generated on top of the experience kit ansible.cfg
+"""
+
+import configparser
+import os
+import tempfile
+
+DEFAULT_FORKS = 5
+MAX_FORKS = 50
+# Fact caching is opt-in, cached facts of a host reprovisioned or rebooted into a new kernel are stale
+DEFAULT_FACT_CACHE_TTL = 0
+CONTROL_PERSIST = "60s"
+# Options holding colon separated lists of paths, relative ones are resolved against the base config directory
+PATH_OPTIONS = ("roles_path", "action_plugins", "callback_plugins", "connection_plugins", "filter_plugins",
+                "library", "lookup_plugins", "module_utils", "strategy_plugins", "test_plugins",
+                "vars_plugins", "collections_paths", "collections_path")
+
+
+def get_forks(host_count):
+    """Returns number of forks running tasks on all hosts of the cluster at once, within sane limits"""
+    return max(DEFAULT_FORKS, min(host_count, MAX_FORKS))
+
+
+def get_cluster_overrides(host_count, fact_cache_path, control_path_dir, fact_cache_ttl=DEFAULT_FACT_CACHE_TTL):
+    """
+    Returns {section: {option: value}} of the cluster specific settings.
+
+    fact_cache_path - directory of the jsonfile fact cache of the cluster
+    control_path_dir - directory of SSH ControlPersist sockets of the cluster
+    fact_cache_ttl - validity of cached facts in seconds, 0 disables fact caching
+    """
+    overrides = {
+        "defaults": {
+            "forks": str(get_forks(host_count)),
+        },
+        "ssh_connection": {
+            "ssh_args": f"-C -o ControlMaster=auto -o ControlPersist={CONTROL_PERSIST}",
+            "control_path_dir": control_path_dir,
+        },
+    }
+    if fact_cache_ttl > 0:
+        # Facts are gathered only for hosts without valid cached facts,
+        # roles rebooting hosts refresh facts with the setup module
+        overrides["defaults"].update({
+            "gathering": "smart",
+            "fact_caching": "jsonfile",
+            "fact_caching_connection": fact_cache_path,
+            "fact_caching_timeout": str(fact_cache_ttl),
+        })
+    return overrides
+
+
+def resolve_paths(value, base_dir):
+    """Makes relative entries of colon separated list of paths absolute"""
+    paths = []
+    for path in value.split(os.pathsep):
+        path = path.strip()
+        if path and not os.path.isabs(path) and not path.startswith("~"):
+            path = os.path.normpath(os.path.join(base_dir, path))
+        paths.append(path)
+    return os.pathsep.join(paths)
+
+
+def write_cluster_config(base_config_path, output_path, overrides):
+    """Writes base config merged with overrides to output_path, usable as ANSIBLE_CONFIG from any directory"""
+    config = configparser.ConfigParser(interpolation=None)
+    config.read(base_config_path, encoding="utf-8")
+
+    base_dir = os.path.dirname(os.path.abspath(base_config_path))
+    for section in config.sections():
+        for option in PATH_OPTIONS:
+            if config.has_option(section, option):
+                config.set(section, option, resolve_paths(config.get(section, option), base_dir))
+
+    for section, options in overrides.items():
+        if not config.has_section(section):
+            config.add_section(section)
+        for option, value in options.items():
+            config.set(section, option, value)
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+    with tempfile.NamedTemporaryFile("w", dir=output_dir, prefix=".ansible_cfg.", encoding="utf-8",
+                                     delete=False) as tmp_file:
+        config.write(tmp_file)
+    os.replace(tmp_file.name, output_path)
+    return output_path
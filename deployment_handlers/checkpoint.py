@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Resuming deployments from checkpoints written by the deployment_checkpoint callback plugin
+"""
+
+import fnmatch
+import json
+import logging
+import os
+
+
+def get_checkpoint_file_path(checkpoints_path, cluster_name):
+    """Returns checkpoint file path of the cluster"""
+    return os.path.join(checkpoints_path, f"{cluster_name}.json")
+
+
+def load_checkpoint(path):
+    """Returns checkpoint contents, None if there is no valid checkpoint"""
+    try:
+        with open(path, "r", encoding="utf-8") as checkpoint_file:
+            return json.load(checkpoint_file)
+    except (OSError, ValueError):
+        return None
+
+
+def remove_checkpoint(path):
+    """Removes checkpoint file if it exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def matches_start_at_task(pattern, task):
+    """Checks if --start-at-task pattern matches the recorded task name like ansible does: as is or as a glob,
+    with or without the role name prefix"""
+    names = (task, task.split(" : ", 1)[-1])
+    return any(name == pattern or fnmatch.fnmatch(name, pattern) for name in names)
+
+
+def get_resume_task(checkpoint):
+    """Returns name of the task the deployment should be restarted at, None to run it from the beginning.
+
+    The first incomplete role is resumed at its first task which name does not match any task earlier in the
+    playbook run, because --start-at-task starts at the first task matching the name."""
+    if checkpoint.get("finished"):
+        return None
+
+    seen_tasks = []
+    for segment in checkpoint.get("segments", []):
+        if not segment.get("completed"):
+            for task in segment.get("tasks", []):
+                if not any(matches_start_at_task(task, seen_task) for seen_task in seen_tasks):
+                    return task
+            return None
+        seen_tasks.extend(segment.get("tasks", []))
+    return None
+
+
+def find_resume_point(path, fingerprint, playbook):
+    """Returns (task name, segment) to resume cluster deployment at, (None, None) if it has to start over.
+    Checkpoints of a different playbook or of changed deployment inputs are removed."""
+    checkpoint = load_checkpoint(path)
+    if checkpoint is None:
+        return None, None
+
+    if checkpoint.get("fingerprint") != fingerprint or checkpoint.get("playbook") != playbook:
+        logging.info('Checkpoint "%s" is outdated - inventory, vars or playbooks changed since, removing it.', path)
+        remove_checkpoint(path)
+        return None, None
+
+    resume_task = get_resume_task(checkpoint)
+    if resume_task is None:
+        return None, None
+
+    segment = next(segment for segment in checkpoint["segments"] if not segment.get("completed"))
+    return resume_task, segment
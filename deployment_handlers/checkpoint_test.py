@@ -0,0 +1,166 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+# pylint: disable=bad-option-value,useless-option-value # (no-self-use was removed in pylint 2.14)
+# pylint: disable=no-self-use # (pytest stylistic convention)
+
+""" Unittests for checkpoint.py file and the deployment_checkpoint callback plugin """
+
+import os
+import shutil
+import subprocess # nosec - security considered
+import pytest
+import checkpoint
+
+CALLBACK_PLUGINS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir,
+                                     "roles", "baseline_ansible", "callback_plugins")
+
+PLAYBOOK = '''
+- hosts: all
+  gather_facts: false
+  pre_tasks:
+    - name: set node name
+      set_fact: node_name={{ inventory_hostname | upper }}
+  roles:
+    - role: node
+'''
+
+ROLE_TASKS = '''
+- name: prepare node
+  debug: msg=prepare
+- name: fail first run
+  fail: msg=failed
+  when: lookup('env', 'FAIL_FIRST_RUN') == 'yes'
+- name: use node name
+  assert:
+    that: node_name == 'HOST1'
+'''
+
+
+def _segment(role, tasks, completed):
+    return {'play_index': 0, 'play': 'all', 'role': role, 'hosts': ['host1'], 'tasks': tasks,
+            'completed': completed, 'completed_hosts': ['host1'] if completed else [],
+            'failed_hosts': [] if completed else ['host1']}
+
+
+def _run_playbook(path, fail, start_at_task=None):
+    command = [shutil.which('ansible-playbook'), '--inventory', 'inventory', 'site.yml']
+    if start_at_task:
+        command.extend(['--start-at-task', start_at_task])
+    env = dict(os.environ,
+               ANSIBLE_CONFIG=os.path.join(path, 'ansible.cfg'),
+               ANSIBLE_CALLBACK_PLUGINS=CALLBACK_PLUGINS_PATH,
+               ANSIBLE_CALLBACKS_ENABLED='deployment_checkpoint',
+               DEPLOYMENT_CHECKPOINT_FILE=os.path.join(path, 'checkpoint.json'),
+               DEPLOYMENT_CHECKPOINT_FINGERPRINT='fingerprint',
+               DEPLOYMENT_CHECKPOINT_RESUME='true' if start_at_task else 'false',
+               FAIL_FIRST_RUN='yes' if fail else 'no')
+    return subprocess.run(command, cwd=path, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, # nosec - B603
+                          stderr=subprocess.STDOUT, check=False)
+
+
+class TestGetResumeTask:
+    ''' Tests for get_resume_task function '''
+
+    def test_first_incomplete_role_is_resumed(self):
+        ''' Test if completed roles are skipped and the first incomplete one resumed at its first task '''
+
+        saved = {'segments': [_segment(None, ['set node name'], True),
+                              _segment('a', ['a : install', 'a : configure'], True),
+                              _segment('b', ['b : install', 'b : fail'], False),
+                              _segment('c', ['c : install'], False)]}
+
+        assert checkpoint.get_resume_task(saved) == 'b : install'
+
+    def test_repeated_task_names_are_skipped(self):
+        ''' Test if tasks named like tasks run earlier, e.g. of a role run in two plays, are not resumed at '''
+
+        saved = {'segments': [_segment('a', ['a : install', 'a : configure'], True),
+                              _segment('b', ['b : setup'], True),
+                              _segment('a', ['a : install', 'a : configure', 'a : restart'], False)]}
+
+        assert checkpoint.get_resume_task(saved) == 'a : restart'
+
+    def test_names_matching_earlier_tasks_are_skipped(self):
+        ''' Test if names matching an earlier task as a glob or without the role prefix are not resumed at '''
+
+        saved = {'segments': [_segment('a', ['a : restart', 'a : copy a'], True),
+                              _segment(None, ['restart', 'copy [ab]', 'verify'], False)]}
+
+        assert checkpoint.get_resume_task(saved) == 'verify'
+
+    def test_only_repeated_names_start_over(self):
+        ''' Test if the deployment starts over when every task of the incomplete role ran earlier '''
+
+        saved = {'segments': [_segment('a', ['a : install'], True),
+                              _segment('a', ['a : install'], False)]}
+
+        assert checkpoint.get_resume_task(saved) is None
+
+    def test_finished_or_completed_checkpoint_starts_over(self):
+        ''' Test if finished checkpoint or checkpoint without incomplete role is not resumed '''
+
+        segments = [_segment('a', ['a : install'], False)]
+
+        assert checkpoint.get_resume_task({'finished': True, 'segments': segments}) is None
+        assert checkpoint.get_resume_task({'segments': [_segment('a', ['a : install'], True)]}) is None
+        assert checkpoint.get_resume_task({}) is None
+
+
+class TestFindResumePoint:
+    ''' Tests for find_resume_point function '''
+
+    def test_failure_after_pre_tasks_resumes_role(self, tmp_path):
+        ''' Test if a failure after the pre_tasks resumes the failed role at its first task '''
+
+        path = str(tmp_path / 'c1.json')
+        with open(path, 'w', encoding='utf-8') as checkpoint_file:
+            checkpoint_file.write('{"playbook": "site.yml", "fingerprint": "f", "finished": false, "segments": [' +
+                                  '{"role": null, "tasks": ["set node name"], "completed": true},' +
+                                  '{"role": "node", "play": "all", "tasks": ["node : prepare node", ' +
+                                  '"node : fail first run"], "completed": false}]}')
+
+        task, segment = checkpoint.find_resume_point(path, 'f', 'site.yml')
+
+        assert task == 'node : prepare node'
+        assert segment['role'] == 'node'
+
+    def test_outdated_checkpoint_is_removed(self, tmp_path):
+        ''' Test if checkpoint of a different fingerprint is removed and the deployment starts over '''
+
+        path = str(tmp_path / 'c1.json')
+        with open(path, 'w', encoding='utf-8') as checkpoint_file:
+            checkpoint_file.write('{"playbook": "site.yml", "fingerprint": "old", "segments": []}')
+
+        assert checkpoint.find_resume_point(path, 'f', 'site.yml') == (None, None)
+        assert not os.path.exists(path)
+
+
+@pytest.mark.skipif(shutil.which('ansible-playbook') is None, reason='ansible-playbook is not installed')
+class TestDeploymentCheckpointPlugin:
+    ''' Tests for the deployment_checkpoint callback plugin '''
+
+    def test_resume_after_pre_tasks_restores_facts(self, tmp_path):
+        ''' Test if the run resumed after the pre_tasks sees facts they set in the failed run '''
+
+        os.makedirs(tmp_path / 'roles' / 'node' / 'tasks')
+        (tmp_path / 'roles' / 'node' / 'tasks' / 'main.yml').write_text(ROLE_TASKS)
+        (tmp_path / 'site.yml').write_text(PLAYBOOK)
+        (tmp_path / 'ansible.cfg').write_text('[defaults]\nstdout_callback = default\n')
+        (tmp_path / 'inventory').write_text('host1 ansible_connection=local\n')
+        checkpoint_path = str(tmp_path / 'checkpoint.json')
+
+        assert _run_playbook(str(tmp_path), fail=True).returncode != 0
+        saved = checkpoint.load_checkpoint(checkpoint_path)
+        assert saved['facts'] == {'host1': {'node_name': 'HOST1'}}
+        assert [(segment['role'], segment['completed']) for segment in saved['segments']] == \
+            [(None, True), ('node', False)]
+
+        task, _ = checkpoint.find_resume_point(checkpoint_path, 'fingerprint', 'site.yml')
+        assert task == 'node : prepare node'
+
+        result = _run_playbook(str(tmp_path), fail=False, start_at_task=task)
+        assert result.returncode == 0, result.stdout.decode(errors='replace')
+        resumed = checkpoint.load_checkpoint(checkpoint_path)
+        assert resumed['finished']
+        assert [(segment['role'], segment['completed']) for segment in resumed['segments']] == \
+            [(None, True), ('node', True)]
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Stamp and local tarball cache for ansible collections installed by ansible-galaxy
+"""
+
+import hashlib
+import json
+import logging
+import os
+import subprocess # nosec - security considered
+
+import yaml
+
+# Both files are written to the cache directory, the se_build offline package build creates the same layout
+CACHE_REQUIREMENTS_FILENAME = "requirements.yml"
+CACHE_SOURCE_DIGEST_FILENAME = "source_requirements.sha256"
+DEFAULT_COLLECTIONS_PATHS = ["~/.ansible/collections", "/usr/share/ansible/collections"]
+
+
+def get_collections_paths():
+    """Returns directories ansible looks for installed collections in"""
+    paths = os.environ.get("ANSIBLE_COLLECTIONS_PATH") or os.environ.get("ANSIBLE_COLLECTIONS_PATHS")
+    paths = paths.split(os.pathsep) if paths else DEFAULT_COLLECTIONS_PATHS
+    return [os.path.expanduser(path) for path in paths]
+
+
+def load_required_collections(requirements_path):
+    """Returns names of collections listed in requirements file"""
+    with open(requirements_path, "r", encoding="utf-8") as requirements_file:
+        requirements = yaml.safe_load(requirements_file) or {}
+
+    names = []
+    for collection in requirements.get("collections") or []:
+        names.append(collection if isinstance(collection, str) else collection["name"])
+    return names
+
+
+def get_installed_version(name, collections_paths):
+    """Returns version of installed collection, None if it is not installed"""
+    namespace, collection = name.split(".", 1)
+    for path in collections_paths:
+        manifest_path = os.path.join(path, "ansible_collections", namespace, collection, "MANIFEST.json")
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+                return json.load(manifest_file)["collection_info"]["version"]
+        except (OSError, ValueError, KeyError):
+            continue
+    return None
+
+
+def file_digest(path):
+    """Returns sha256 hex digest of file contents"""
+    with open(path, "rb") as digested_file:
+        return hashlib.sha256(digested_file.read()).hexdigest()
+
+
+def compute_stamp(requirements_path):
+    """Returns stamp of requirements file contents and currently installed collection versions"""
+    collections_paths = get_collections_paths()
+    digest = hashlib.sha256(file_digest(requirements_path).encode())
+    for name in sorted(load_required_collections(requirements_path)):
+        digest.update(f"\n{name}={get_installed_version(name, collections_paths)}".encode())
+    return digest.hexdigest()
+
+
+def is_up_to_date(requirements_path, stamp_path):
+    """Checks if collections were installed from unchanged requirements and are still in place"""
+    try:
+        with open(stamp_path, "r", encoding="utf-8") as stamp_file:
+            stamp = stamp_file.read().strip()
+    except OSError:
+        return False
+    return stamp == compute_stamp(requirements_path)
+
+
+def write_stamp(requirements_path, stamp_path):
+    """Records stamp of successfully installed collections"""
+    os.makedirs(os.path.dirname(stamp_path), exist_ok=True)
+    with open(stamp_path, "w", encoding="utf-8") as stamp_file:
+        stamp_file.write(compute_stamp(requirements_path))
+
+
+def is_cache_populated(cache_path, requirements_path):
+    """Checks if cache directory holds tarballs downloaded for unchanged requirements file"""
+    try:
+        with open(os.path.join(cache_path, CACHE_SOURCE_DIGEST_FILENAME), "r", encoding="utf-8") as digest_file:
+            source_digest = digest_file.read().strip()
+    except OSError:
+        return False
+    return (os.path.exists(os.path.join(cache_path, CACHE_REQUIREMENTS_FILENAME))
+            and source_digest == file_digest(requirements_path))
+
+
+def populate_cache(cache_path, requirements_path):
+    """Downloads collection tarballs listed in requirements file to the cache directory"""
+    logging.info('Downloading ansible collections to "%s"', cache_path)
+    os.makedirs(cache_path, exist_ok=True)
+    download_cmd = ["ansible-galaxy", "collection", "download",
+                    "-r", requirements_path, "-p", cache_path]
+    subprocess.run(download_cmd, check=True) # nosec - B603, B607
+    with open(os.path.join(cache_path, CACHE_SOURCE_DIGEST_FILENAME), "w", encoding="utf-8") as digest_file:
+        digest_file.write(file_digest(requirements_path))
+
+
+def install_from_cache(cache_path):
+    """Installs collections from tarballs in the cache directory without network access"""
+    logging.info('Installing ansible collections from "%s"', cache_path)
+    # Requirements file generated by `ansible-galaxy collection download` refers tarballs relatively
+    install_cmd = ["ansible-galaxy", "collection", "install", "-r", CACHE_REQUIREMENTS_FILENAME]
+    subprocess.run(install_cmd, check=True, cwd=cache_path) # nosec - B603, B607
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Indexed loading of multi-document inventory.yml with a cache of parsed documents
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+import yaml
+
+# C accelerated loader is used when PyYAML is built with libyaml
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader) # pylint: disable=invalid-name
+
+DOCUMENT_START_RE = re.compile(r"^---(?=[ \t]|$)", re.MULTILINE)
+# Cheap lookup of the cluster name without parsing the document. Only plain or simply quoted names are
+# accepted, documents using anchors, aliases or other YAML features for the name are always parsed.
+CLUSTER_NAME_RE = re.compile(r"^[ \t]+cluster_name:[ \t]*([\"']?)([\w.-]+)\1[ \t]*(?:#.*)?$", re.MULTILINE)
+
+
+def split_documents(text):
+    """Returns list of YAML documents text of the multi-document stream"""
+    starts = [match.start() for match in DOCUMENT_START_RE.finditer(text)]
+    bounds = [0] + starts + [len(text)]
+    return [text[start:end] for start, end in zip(bounds, bounds[1:]) if text[start:end].strip()]
+
+
+def find_cluster_name(document):
+    """Returns cluster name found in document text, None if it cannot be found without parsing"""
+    names = [name for _, name in CLUSTER_NAME_RE.findall(document)]
+    return names[0] if len(names) == 1 else None
+
+
+def parse_document(document):
+    """Parses single YAML document"""
+    return yaml.load(document, Loader=YAML_LOADER) # nosec - YAML_LOADER is a safe loader
+
+
+def get_doc_cluster_name(doc):
+    """Returns cluster name of parsed inventory document, None if it is not defined"""
+    try:
+        return doc["all"]["vars"]["cluster_name"]
+    except (KeyError, TypeError):
+        return None
+
+
+def is_json_serializable(value):
+    """Checks if value survives JSON round trip unchanged, e.g. has no dates or non-string keys"""
+    try:
+        return json.loads(json.dumps(value)) == value
+    except (TypeError, ValueError):
+        return False
+
+
+class InventoryCache:
+    """
+    JSON file with parsed documents of an inventory file.
+
+    Documents are keyed by SHA-256 of their text, so after editing the inventory only changed documents are
+    parsed again. Index of documents and their cluster names is reused without reading the inventory file
+    as long as its modification time and size do not change.
+    """
+
+    def __init__(self, path):
+        self.__path = path
+        self.__entries = self.__read() if path else {}
+        self.__changed = False
+
+    def __read(self):
+        try:
+            with open(self.__path, "r", encoding="utf-8") as cache_file:
+                entries = json.load(cache_file)
+            return entries if isinstance(entries, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def get_index(self, inventory_path, stat):
+        """Returns cached list of {"sha256", "cluster_name"} of the inventory documents, None if outdated"""
+        entry = self.__entries.get(os.path.realpath(inventory_path))
+        if entry is None or entry.get("mtime_ns") != stat.st_mtime_ns or entry.get("size") != stat.st_size:
+            return None
+        return entry.get("documents")
+
+    def get_parsed(self, inventory_path, digest):
+        """Returns (True, document) of cached parsed document, (False, None) if it is not cached"""
+        parsed = self.__entries.get(os.path.realpath(inventory_path), {}).get("parsed", {})
+        if digest in parsed:
+            return True, parsed[digest]
+        return False, None
+
+    def update(self, inventory_path, stat, documents, parsed):
+        """Stores index of the inventory documents and their parsed contents, {digest: document}"""
+        key = os.path.realpath(inventory_path)
+        old_entry = self.__entries.get(key, {})
+        digests = {document["sha256"] for document in documents}
+        cached = {digest: doc for digest, doc in old_entry.get("parsed", {}).items() if digest in digests}
+        cached.update({digest: doc for digest, doc in parsed.items() if is_json_serializable(doc)})
+
+        entry = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "documents": documents, "parsed": cached}
+        if entry != old_entry:
+            self.__entries[key] = entry
+            self.__changed = True
+
+    def save(self):
+        """Writes cache file if it has changed"""
+        if not self.__path or not self.__changed:
+            return
+        cache_dir = os.path.dirname(os.path.abspath(self.__path))
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=cache_dir, prefix=".inventory_cache.", encoding="utf-8",
+                                         delete=False) as tmp_file:
+            json.dump(self.__entries, tmp_file)
+        os.replace(tmp_file.name, self.__path)
+        self.__changed = False
+
+
+def index_documents(text):
+    """Returns (documents index, {digest: document text}) of inventory file contents"""
+    documents = []
+    texts = {}
+    for document in split_documents(text):
+        digest = hashlib.sha256(document.encode()).hexdigest()
+        documents.append({"sha256": digest, "cluster_name": find_cluster_name(document)})
+        texts[digest] = document
+    return documents, texts
+
+
+def load_inventory_docs(inventory_path, cluster_names=None, cache_path=None):
+    """
+    Returns parsed inventory documents in order of the file.
+
+    cluster_names - parse only documents of these clusters, None parses all of them
+    cache_path - path of the InventoryCache file, None disables caching
+    """
+    cache = InventoryCache(cache_path)
+    docs = _load_docs(inventory_path, cluster_names, cache, use_index=True)
+    if docs is None:
+        logging.debug("Cluster names indexed in %s do not match parsed documents, parsing all of them",
+                      inventory_path)
+        docs = _load_docs(inventory_path, cluster_names, cache, use_index=False)
+    cache.save()
+    return docs
+
+
+def _load_docs(inventory_path, cluster_names, cache, use_index):
+    """Returns parsed documents, None if the index turned out to be wrong.
+    Without use_index the index is rebuilt and all documents are parsed to correct their cluster names."""
+    stat = os.stat(inventory_path)
+    documents = cache.get_index(inventory_path, stat) if use_index else None
+    texts = None
+    if documents is None:
+        with open(inventory_path, "r", encoding="utf-8") as inventory_file:
+            documents, texts = index_documents(inventory_file.read())
+
+    selected = set(cluster_names) if cluster_names is not None else None
+    parsed = {}
+    docs = []
+    for document in documents:
+        hint = document["cluster_name"] if use_index else None
+        if selected is not None and hint is not None and hint not in selected:
+            continue
+
+        found, doc = cache.get_parsed(inventory_path, document["sha256"])
+        if not found:
+            if texts is None:
+                with open(inventory_path, "r", encoding="utf-8") as inventory_file:
+                    _, texts = index_documents(inventory_file.read())
+            if document["sha256"] not in texts:
+                # Inventory changed without changing its modification time and size
+                return None
+            doc = parse_document(texts[document["sha256"]])
+            parsed[document["sha256"]] = doc
+
+        name = get_doc_cluster_name(doc)
+        if hint is not None and name != hint:
+            return None
+        if not use_index:
+            document["cluster_name"] = name if isinstance(name, str) else None
+        if doc is not None and (selected is None or name in selected):
+            docs.append(doc)
+
+    cache.update(inventory_path, stat, documents, parsed)
+    return docs
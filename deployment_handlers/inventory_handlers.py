@@ -12,6 +12,8 @@ import logging
 import os
 import yaml
 
+from deployment_handlers import inventory_cache
+
 class Inventory: # pylint: disable=too-many-instance-attributes
     """Single inventory for deployment"""
     def __init__(self, inventory_doc):
@@ -58,6 +60,38 @@ class Inventory: # pylint: disable=too-many-instance-attributes
         """Returns controller ansible_user for controller"""
         return self.__controller_ansible_user
 
+    @property
+    def hosts(self):
+        """Returns sorted list of names of all hosts of the inventory"""
+        hosts = set()
+        for group in self.__inventory_doc.values():
+            if isinstance(group, dict) and isinstance(group.get("hosts"), dict):
+                hosts.update(group["hosts"])
+        return sorted(hosts)
+
+    @property
+    def host_vars(self):
+        """Returns {host: {variable: value}} of variables of hosts defined in the inventory"""
+        host_vars = {}
+        for group in self.__inventory_doc.values():
+            if isinstance(group, dict) and isinstance(group.get("hosts"), dict):
+                for host, variables in group["hosts"].items():
+                    host_vars.setdefault(host, {}).update(variables if isinstance(variables, dict) else {})
+        return host_vars
+
+    def get_group_hosts(self, group):
+        """Returns sorted list of names of hosts of the group"""
+        group_doc = self.__inventory_doc.get(group)
+        if isinstance(group_doc, dict) and isinstance(group_doc.get("hosts"), dict):
+            return sorted(group_doc["hosts"])
+        return []
+
+    @property
+    def group_vars(self):
+        """Returns {group: {variable: value}} of variables defined in the inventory"""
+        return {group: group_doc["vars"] for group, group_doc in self.__inventory_doc.items()
+                if isinstance(group_doc, dict) and isinstance(group_doc.get("vars"), dict)}
+
     @property
     def inventory(self):
         """Returns inventory contents"""
@@ -91,11 +125,17 @@ class Inventory: # pylint: disable=too-many-instance-attributes
 class InventoryHandler:
     """Simple inventory.yml handler"""
 
-    def __init__(self, inventory_path = None):
+    def __init__(self, inventory_path = None, cluster_names = None, cache_path = None):
+        """
+        cluster_names - load only inventories of these clusters, None loads all of them
+        cache_path - path of the parsed inventory cache file, None disables caching
+        """
         self.__inventories = []
+        self.__index = {}
         if inventory_path:
-            self.__load_inventory(inventory_path)
-            self.__verify_cluster_names()
+            self.__load_inventory(inventory_path, cluster_names, cache_path)
+            if cluster_names is not None:
+                self.select_clusters(cluster_names)
 
 
     @property
@@ -107,34 +147,52 @@ class InventoryHandler:
         """Returns amount of loaded inventories"""
         return len(self.__inventories)
 
-    def __load_inventory(self, inventory_path):
-        with open(inventory_path, 'r', encoding="utf-8") as inventory_stream:
-            doc_iterator = yaml.load_all(inventory_stream, Loader=yaml.SafeLoader)
-            self.__inventories = []
-            for doc in doc_iterator:
-                self.__inventories.append(Inventory(doc))
-
-    def __verify_cluster_names(self):
-        cluster_names = []
-        for i, _ in enumerate(self.__inventories):
-            cluster_name = self.__inventories[i].cluster_name
-            if cluster_name in cluster_names:
-                raise ValueError("Cluster names must be different")
-            cluster_names.append(cluster_name)
+    def get_inventory(self, cluster_name):
+        """Returns Inventory of the cluster, None if it is not loaded"""
+        return self.__index.get(cluster_name)
+
+    def __load_inventory(self, inventory_path, cluster_names, cache_path):
+        self.__inventories = []
+        self.__index = {}
+        for doc in inventory_cache.load_inventory_docs(inventory_path, cluster_names, cache_path):
+            self.__append(Inventory(doc))
+
+    def __append(self, inventory):
+        if inventory.cluster_name in self.__index:
+            raise ValueError("Cluster names must be different")
+        self.__index[inventory.cluster_name] = inventory
+        self.__inventories.append(inventory)
+
+    def select_clusters(self, cluster_names):
+        """Keeps only inventories of given clusters, raises ValueError if any of them is not loaded"""
+        missing = [name for name in cluster_names if name not in self.__index]
+        if missing:
+            raise ValueError(f"Clusters not found in inventory: {', '.join(missing)}")
+        self.__inventories = [inventory for inventory in self.__inventories if inventory.cluster_name in cluster_names]
+        self.__index = {inventory.cluster_name: inventory for inventory in self.__inventories}
 
     def add_inventory(self, file_path):
         """Adds a single inventory tho this handler from file_path file"""
         logging.info("Adding new inventory from %s", file_path)
 
-        with open(file_path, "r") as f:
-            inventory = Inventory(yaml.safe_load(f))
-            self.__inventories.append(inventory)
+        with open(file_path, "r", encoding="utf-8") as f:
+            self.__append(Inventory(inventory_cache.parse_document(f.read())))
 
-def load_inventories(path):
-    """Loads all inventories it finds recursively under a given path and returns InventoryHandles"""
+def load_inventories(path, cluster_names = None):
+    """Loads all inventories it finds recursively under a given path and returns InventoryHandles.
+    With cluster_names only inventories of these clusters are loaded, looked up in <path>/<cluster name> first."""
+
+    files = None
+    if cluster_names is not None:
+        files = [os.path.join(path, name, "inventory.yaml") for name in cluster_names]
+        if not all(os.path.isfile(file) for file in files):
+            files = None
+    if files is None:
+        files = glob.glob(path + "/**/inventory.yaml", recursive=True)
 
     inventories = InventoryHandler()
-    for file in glob.glob(path + "/**/inventory.yaml", recursive=True):
+    for file in files:
         inventories.add_inventory(file)
-
+    if cluster_names is not None:
+        inventories.select_clusters(cluster_names)
     return inventories
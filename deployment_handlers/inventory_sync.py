@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Incremental, manifest driven synchronization of symlinks in cluster inventory directories
+"""
+
+import functools
+import os
+import shutil
+import tempfile
+
+
+class LinkManifest:
+    """Desired directories and symlinks of a vars directory, paths are relative to the directory"""
+
+    def __init__(self, links=None, dirs=None):
+        self.links = dict(links or {})
+        self.dirs = set(dirs or ())
+
+    def copy(self):
+        """Returns independent copy of the manifest"""
+        return LinkManifest(self.links, self.dirs)
+
+    def add_link(self, link_path, target):
+        """Adds symlink at relative link_path pointing to target"""
+        self.links[link_path] = target
+        parent = os.path.dirname(link_path)
+        while parent:
+            self.dirs.add(parent)
+            parent = os.path.dirname(parent)
+
+
+@functools.lru_cache(maxsize=None)
+def _collect_tree_links(src_path):
+    manifest = LinkManifest()
+    for root, dirs, files in os.walk(src_path):
+        # Files are linked in the directory named as their parent directory, like e.g. all/10-default.yml
+        group = "" if root == src_path else os.path.basename(root)
+        for dir_name in dirs:
+            manifest.dirs.add(dir_name)
+        for file in files:
+            manifest.links.setdefault(os.path.join(group, file), os.path.join(root, file))
+    return manifest
+
+
+def collect_tree_links(src_path):
+    """Returns manifest linking all files of src_path tree, the tree is walked only once per process"""
+    return _collect_tree_links(os.path.abspath(src_path)).copy()
+
+
+def scan_directory(path):
+    """Returns manifest describing current contents of path, regular files are reported with None target"""
+    manifest = LinkManifest()
+    for root, dirs, files in os.walk(path):
+        rel_root = os.path.relpath(root, path)
+        rel_root = "" if rel_root == os.curdir else rel_root
+        for dir_name in list(dirs):
+            dir_path = os.path.join(root, dir_name)
+            if os.path.islink(dir_path):
+                # Symlinks to directories are treated as links, they are never followed
+                dirs.remove(dir_name)
+                manifest.links[os.path.join(rel_root, dir_name)] = os.readlink(dir_path)
+            else:
+                manifest.dirs.add(os.path.join(rel_root, dir_name))
+        for file in files:
+            file_path = os.path.join(root, file)
+            target = os.readlink(file_path) if os.path.islink(file_path) else None
+            manifest.links[os.path.join(rel_root, file)] = target
+    return manifest
+
+
+def replace_with_symlink(target, link_path):
+    """Atomically (re)places link_path with symlink pointing to target.
+    Plain directory at link_path can not be replaced atomically, it is removed first."""
+    if os.path.isdir(link_path) and not os.path.islink(link_path):
+        shutil.rmtree(link_path)
+    tmp_link_path = f"{link_path}.{os.getpid()}.tmp"
+    os.symlink(target, tmp_link_path)
+    os.replace(tmp_link_path, link_path)
+
+
+def remove_entry(path):
+    """Removes file, symlink or directory tree"""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+
+
+def get_version_prefix(path):
+    """Returns name prefix of versioned directories of path, they are hidden siblings of path"""
+    return f".{os.path.basename(path)}."
+
+
+def build_directory(path, manifest):
+    """Creates new versioned directory next to path with contents described by manifest, returns its name"""
+    parent = os.path.dirname(os.path.abspath(path))
+    version_path = tempfile.mkdtemp(dir=parent, prefix=get_version_prefix(path))
+    try:
+        for dir_name in sorted(manifest.dirs):
+            os.makedirs(os.path.join(version_path, dir_name), exist_ok=True)
+        for link_path, target in manifest.links.items():
+            os.symlink(target, os.path.join(version_path, link_path))
+        os.chmod(version_path, 0o755)
+    except OSError:
+        shutil.rmtree(version_path, ignore_errors=True)
+        raise
+    return os.path.basename(version_path)
+
+
+def count_changes(actual, manifest):
+    """Returns number of entries which differ between actual and desired manifest"""
+    changes = len(actual.dirs ^ manifest.dirs)
+    changes += sum(1 for link_path, target in manifest.links.items() if actual.links.get(link_path) != target)
+    for link_path in set(actual.links) - set(manifest.links):
+        parent = os.path.dirname(link_path)
+        # Entries of removed directories go away together with the directory
+        if not parent or parent in manifest.dirs:
+            changes += 1
+    return changes
+
+
+def sync_directory(path, manifest):
+    """Makes path contain exactly the directories and symlinks described by manifest.
+    path is a symlink to a versioned directory next to it. When anything differs, the complete updated
+    tree is built in a new versioned directory and swapped in by atomic replacement of the symlink,
+    so readers see either the old or the new tree. Only migration of a plain directory left by older
+    versions is not atomic, the directory is removed right before the symlink is created.
+    Returns number of changed entries."""
+    if os.path.lexists(path) and not os.path.isdir(path):
+        remove_entry(path)
+
+    actual = scan_directory(path) if os.path.isdir(path) else LinkManifest()
+    changes = count_changes(actual, manifest)
+    if not changes and os.path.islink(path):
+        return 0
+
+    previous_version = os.readlink(path) if os.path.islink(path) else None
+    replace_with_symlink(build_directory(path, manifest), path)
+
+    if previous_version and os.path.basename(previous_version) == previous_version and \
+            previous_version.startswith(get_version_prefix(path)):
+        # Old tree may be already removed by concurrent run for the same cluster
+        shutil.rmtree(os.path.join(os.path.dirname(os.path.abspath(path)), previous_version), ignore_errors=True)
+    return changes
@@ -0,0 +1,72 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+# pylint: disable=bad-option-value,useless-option-value # (no-self-use was removed in pylint 2.14)
+# pylint: disable=no-self-use # (pytest stylistic convention)
+
+""" Unittests for inventory_sync.py file """
+
+import os
+import inventory_sync
+
+
+def _manifest(links):
+    manifest = inventory_sync.LinkManifest()
+    for link_path, target in links.items():
+        manifest.add_link(link_path, target)
+    return manifest
+
+
+def _versions(path):
+    prefix = inventory_sync.get_version_prefix(path)
+    return [name for name in os.listdir(os.path.dirname(path)) if name.startswith(prefix)]
+
+
+class TestSyncDirectory:
+    ''' Tests for sync_directory function '''
+
+    def test_new_directory_is_symlink_to_version(self, tmp_path):
+        ''' Test if the synchronized directory is a symlink to a versioned directory with all links '''
+
+        path = str(tmp_path / 'group_vars')
+        changes = inventory_sync.sync_directory(path, _manifest({'all/10-default.yml': '/ek/all/10-default.yml'}))
+
+        assert changes == 2
+        assert os.path.islink(path)
+        assert os.readlink(os.path.join(path, 'all', '10-default.yml')) == '/ek/all/10-default.yml'
+        assert _versions(path) == [os.readlink(path)]
+
+    def test_changed_manifest_swaps_version(self, tmp_path):
+        ''' Test if a change builds a new version, swaps it in and removes the previous one '''
+
+        path = str(tmp_path / 'group_vars')
+        inventory_sync.sync_directory(path, _manifest({'all/10-default.yml': '/ek/a', 'all/20-old.yml': '/ek/b'}))
+        previous_version = os.readlink(path)
+
+        changes = inventory_sync.sync_directory(path, _manifest({'all/10-default.yml': '/ek/c'}))
+
+        assert changes == 2
+        assert os.readlink(path) != previous_version
+        assert _versions(path) == [os.readlink(path)]
+        assert sorted(os.listdir(os.path.join(path, 'all'))) == ['10-default.yml']
+        assert os.readlink(os.path.join(path, 'all', '10-default.yml')) == '/ek/c'
+
+    def test_unchanged_manifest_keeps_version(self, tmp_path):
+        ''' Test if nothing is rebuilt when the directory is up to date '''
+
+        path = str(tmp_path / 'group_vars')
+        inventory_sync.sync_directory(path, _manifest({'all/10-default.yml': '/ek/a'}))
+        version = os.readlink(path)
+
+        assert inventory_sync.sync_directory(path, _manifest({'all/10-default.yml': '/ek/a'})) == 0
+        assert os.readlink(path) == version
+
+    def test_plain_directory_is_migrated(self, tmp_path):
+        ''' Test if a plain directory of older versions is replaced by a symlink '''
+
+        path = str(tmp_path / 'group_vars')
+        os.makedirs(os.path.join(path, 'all'))
+        os.symlink('/ek/a', os.path.join(path, 'all', '10-default.yml'))
+
+        assert inventory_sync.sync_directory(path, _manifest({'all/10-default.yml': '/ek/a'})) == 0
+        assert os.path.islink(path)
+        assert os.readlink(os.path.join(path, 'all', '10-default.yml')) == '/ek/a'
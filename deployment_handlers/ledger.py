@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Ledger of per-cluster deployment fingerprints
+"""
+
+import functools
+import hashlib
+import json
+import os
+import re
+import subprocess # nosec - security considered
+import tempfile
+from datetime import datetime
+
+READ_CHUNK_SIZE = 1024 * 1024
+IMPORT_PLAYBOOK_RE = re.compile(r"^[ \t-]*(?:ansible\.builtin\.)?import_playbook:[ \t]*[\"']?([^\"'#\s{}]+)",
+                                re.MULTILINE)
+# Files written by python and ansible when loading plugins and modules, they never affect the deployment
+GENERATED_FILE_RE = re.compile(r"(?:^|/)__pycache__/|\.py[cod]$")
+
+
+def update_with_file(digest, path):
+    """Feeds contents of the file to digest"""
+    with open(path, "rb") as hashed_file:
+        for chunk in iter(functools.partial(hashed_file.read, READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+
+def update_with_files(digest, files):
+    """Feeds names and contents of files given as {name: path} to digest, missing files are hashed as such"""
+    for name in sorted(files):
+        digest.update(f"\0{name}\0".encode())
+        path = files[name]
+        if path is not None and os.path.isfile(path):
+            update_with_file(digest, path)
+        else:
+            digest.update(b"\0missing\0")
+
+
+def list_tree_files(path):
+    """Returns {relative path: path} of all files under path, path can also be a single file"""
+    if os.path.isfile(path):
+        return {os.path.basename(path): path}
+
+    files = {}
+    for root, dirs, filenames in os.walk(path):
+        dirs.sort()
+        for filename in filenames:
+            file_path = os.path.join(root, filename)
+            files[os.path.relpath(file_path, path)] = file_path
+    return files
+
+
+def list_git_files(path):
+    """Returns relative paths of files under path tracked by git and of untracked ones which are not ignored,
+    None if path is not in a git working tree"""
+    try:
+        output = subprocess.run(["git", "-C", path, "ls-files", "-z", "--cached", "--others", # nosec - B603, B607
+                                 "--exclude-standard"],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return [name for name in output.decode("utf-8", "surrogateescape").split("\0") if name]
+
+
+def list_source_files(path):
+    """Returns {relative path: path} of files under path which affect the deployment. Files are selected by git
+    where possible, so generated and ignored files are left out, the whole tree is listed otherwise.
+    Python bytecode is left out always."""
+    if os.path.isfile(path):
+        return {os.path.basename(path): path}
+
+    names = list_git_files(path)
+    if names is None:
+        names = list_tree_files(path)
+    return {name: os.path.join(path, name) for name in names if not GENERATED_FILE_RE.search(name)}
+
+
+def list_playbook_files(playbooks):
+    """Returns {path: path} of given playbooks and of all playbooks they import, missing ones included"""
+    files = {}
+    pending = [os.path.abspath(playbook) for playbook in playbooks]
+    while pending:
+        path = pending.pop()
+        if path in files:
+            continue
+        files[path] = path
+        try:
+            with open(path, "r", encoding="utf-8") as playbook_file:
+                imports = IMPORT_PLAYBOOK_RE.findall(playbook_file.read())
+        except OSError:
+            continue
+        pending.extend(os.path.normpath(os.path.join(os.path.dirname(path), name)) for name in imports)
+    return files
+
+
+@functools.lru_cache(maxsize=None)
+def hash_tree(paths):
+    """Returns hash of names and contents of all files in given tuple of paths, computed once per process"""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(f"\0{path}\0".encode())
+        update_with_files(digest, list_source_files(path))
+    return digest.hexdigest()
+
+
+def compute_fingerprint(inventory_doc, vars_files, trees, playbook, phase_playbooks=()):
+    """
+    Returns fingerprint of a cluster deployment.
+
+    inventory_doc - inventory contents as text
+    vars_files - {relative path: resolved path} of group_vars and host_vars files used by the cluster
+    trees - tuple of paths (e.g. deployment, platform profile, roles) whose contents affect the deployment
+    playbook - path of the playbook being run, its contents and contents of playbooks it imports are hashed
+    phase_playbooks - paths of playbooks run instead of the playbook when it is run in phases
+    """
+    digest = hashlib.sha256()
+    digest.update(inventory_doc.encode())
+    update_with_files(digest, vars_files)
+    digest.update(hash_tree(tuple(trees)).encode())
+    digest.update(f"\0{playbook}\0".encode())
+    update_with_files(digest, list_playbook_files([playbook, *phase_playbooks]))
+    return digest.hexdigest()
+
+
+class DeploymentLedger:
+    """JSON file recording fingerprints of successfully deployed clusters"""
+
+    def __init__(self, path):
+        self.__path = path
+
+    def load(self):
+        """Returns ledger entries keyed by cluster name"""
+        try:
+            with open(self.__path, "r", encoding="utf-8") as ledger_file:
+                return json.load(ledger_file)
+        except (OSError, ValueError):
+            return {}
+
+    def get_entry(self, cluster_name):
+        """Returns ledger entry of the cluster, None if it has never been recorded"""
+        return self.load().get(cluster_name)
+
+    def is_unchanged(self, cluster_name, fingerprint):
+        """Checks if cluster has already been deployed successfully with given fingerprint"""
+        entry = self.get_entry(cluster_name)
+        return entry is not None and entry.get("fingerprint") == fingerprint
+
+    def record(self, cluster_name, fingerprint, playbook):
+        """Records successful deployment of the cluster"""
+        entries = self.load()
+        entries[cluster_name] = {
+            "fingerprint": fingerprint,
+            "playbook": playbook,
+            "deployed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+
+        ledger_dir = os.path.dirname(os.path.abspath(self.__path))
+        with tempfile.NamedTemporaryFile("w", dir=ledger_dir, prefix=".ledger.", encoding="utf-8",
+                                         delete=False) as tmp_file:
+            json.dump(entries, tmp_file, indent=4, sort_keys=True)
+        os.replace(tmp_file.name, self.__path)
@@ -0,0 +1,150 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+# pylint: disable=bad-option-value,useless-option-value # (no-self-use was removed in pylint 2.14)
+# pylint: disable=no-self-use # (pytest stylistic convention)
+
+""" Unittests for ledger.py file """
+
+import os
+import subprocess # nosec - security considered
+import ledger
+
+
+def _write(path, content=''):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as written_file:
+        written_file.write(content)
+
+
+def _fingerprint(tree, playbook):
+    ledger.hash_tree.cache_clear()
+    return ledger.compute_fingerprint('all: {}', {}, (tree,), playbook)
+
+
+def _make_tree(path):
+    tree = str(path / 'roles')
+    _write(os.path.join(tree, 'node', 'tasks', 'main.yml'), '- debug: msg=node\n')
+    _write(os.path.join(tree, 'node', 'library', 'module.py'), 'print()\n')
+    playbook = str(path / 'site.yml')
+    _write(playbook, '- hosts: all\n')
+    return tree, playbook
+
+
+class TestComputeFingerprint:
+    ''' Tests for compute_fingerprint function '''
+
+    def test_bytecode_does_not_change_fingerprint(self, tmp_path):
+        ''' Test if python bytecode written by ansible next to plugins and modules is not hashed '''
+
+        tree, playbook = _make_tree(tmp_path)
+        fingerprint = _fingerprint(tree, playbook)
+
+        _write(os.path.join(tree, 'node', 'library', '__pycache__', 'module.cpython-311.pyc'), 'bytecode')
+        _write(os.path.join(tree, 'node', 'library', 'module.pyc'), 'bytecode')
+
+        assert _fingerprint(tree, playbook) == fingerprint
+
+    def test_bytecode_in_git_tree_does_not_change_fingerprint(self, tmp_path):
+        ''' Test if only files selected by git are hashed in a git working tree '''
+
+        tree, playbook = _make_tree(tmp_path)
+        subprocess.run(['git', 'init', '-q', str(tmp_path)], check=True) # nosec - B603, B607
+        _write(str(tmp_path / '.gitignore'), 'ignored.yml\n')
+        subprocess.run(['git', '-C', str(tmp_path), 'add', 'roles'], check=True) # nosec - B603, B607
+        fingerprint = _fingerprint(tree, playbook)
+
+        _write(os.path.join(tree, 'node', 'library', '__pycache__', 'module.cpython-311.pyc'), 'bytecode')
+        _write(os.path.join(tree, 'node', 'ignored.yml'), 'ignored')
+        assert _fingerprint(tree, playbook) == fingerprint
+
+        _write(os.path.join(tree, 'node', 'tasks', 'untracked.yml'), '- debug: msg=new\n')
+        assert _fingerprint(tree, playbook) != fingerprint
+
+    def test_changed_file_changes_fingerprint(self, tmp_path):
+        ''' Test if changed contents of a hashed file change the fingerprint '''
+
+        tree, playbook = _make_tree(tmp_path)
+        fingerprint = _fingerprint(tree, playbook)
+
+        _write(os.path.join(tree, 'node', 'tasks', 'main.yml'), '- debug: msg=changed\n')
+
+        assert _fingerprint(tree, playbook) != fingerprint
+
+    def test_inputs_change_fingerprint(self, tmp_path):
+        ''' Test if inventory, vars files and the playbook path change the fingerprint '''
+
+        tree, playbook = _make_tree(tmp_path)
+        vars_path = str(tmp_path / 'all.yml')
+        _write(vars_path, 'a: 1\n')
+        ledger.hash_tree.cache_clear()
+        fingerprint = ledger.compute_fingerprint('all: {}', {'group_vars/all/10-default.yml': vars_path},
+                                                 (tree,), playbook)
+
+        assert ledger.compute_fingerprint('all: {x: 1}', {'group_vars/all/10-default.yml': vars_path},
+                                          (tree,), playbook) != fingerprint
+        assert ledger.compute_fingerprint('all: {}', {'group_vars/all/90-settings.yml': vars_path},
+                                          (tree,), playbook) != fingerprint
+        assert ledger.compute_fingerprint('all: {}', {'group_vars/all/10-default.yml': None},
+                                          (tree,), playbook) != fingerprint
+        _write(vars_path, 'a: 2\n')
+        assert ledger.compute_fingerprint('all: {}', {'group_vars/all/10-default.yml': vars_path},
+                                          (tree,), playbook) != fingerprint
+
+    def test_imported_playbook_changes_fingerprint(self, tmp_path):
+        ''' Test if contents of imported playbooks and phase playbooks are hashed '''
+
+        tree, playbook = _make_tree(tmp_path)
+        _write(playbook, '- name: Settings\n  import_playbook: "playbooks/settings.yml"\n')
+        _write(str(tmp_path / 'playbooks' / 'settings.yml'), '- import_playbook: nested.yml # comment\n')
+        _write(str(tmp_path / 'playbooks' / 'nested.yml'), '- hosts: all\n')
+        phase_playbook = str(tmp_path / 'phase.yml')
+        _write(phase_playbook, '- hosts: all\n')
+        fingerprint = ledger.compute_fingerprint('all: {}', {}, (tree,), playbook, (phase_playbook,))
+
+        _write(str(tmp_path / 'playbooks' / 'nested.yml'), '- hosts: edgenode_group\n')
+        nested_fingerprint = ledger.compute_fingerprint('all: {}', {}, (tree,), playbook, (phase_playbook,))
+        assert nested_fingerprint != fingerprint
+
+        _write(phase_playbook, '- hosts: edgenode_group\n')
+        assert ledger.compute_fingerprint('all: {}', {}, (tree,), playbook, (phase_playbook,)) != nested_fingerprint
+
+
+class TestListPlaybookFiles:
+    ''' Tests for list_playbook_files function '''
+
+    def test_imports_are_followed(self, tmp_path):
+        ''' Test if imports are followed recursively once, missing playbooks are listed too '''
+
+        playbook = str(tmp_path / 'site.yml')
+        _write(playbook, '- import_playbook: playbooks/a.yml\n- ansible.builtin.import_playbook: missing.yml\n'
+                         '- import_playbook: "{{ templated }}.yml"\n')
+        _write(str(tmp_path / 'playbooks' / 'a.yml'), '- import_playbook: ../site.yml\n')
+
+        assert sorted(ledger.list_playbook_files([playbook])) == sorted([
+            playbook, str(tmp_path / 'playbooks' / 'a.yml'), str(tmp_path / 'missing.yml')])
+
+
+class TestDeploymentLedger:
+    ''' Tests for DeploymentLedger class '''
+
+    def test_record(self, tmp_path):
+        ''' Test if recorded fingerprint is unchanged until a different one is checked '''
+
+        deployment_ledger = ledger.DeploymentLedger(str(tmp_path / 'ledger.json'))
+        assert not deployment_ledger.is_unchanged('c1', 'f1')
+
+        deployment_ledger.record('c1', 'f1', 'network_edge.yml')
+        deployment_ledger.record('c2', 'f2', 'network_edge.yml')
+
+        assert deployment_ledger.is_unchanged('c1', 'f1')
+        assert not deployment_ledger.is_unchanged('c1', 'f2')
+        assert deployment_ledger.get_entry('c2')['playbook'] == 'network_edge.yml'
+        assert deployment_ledger.get_entry('c3') is None
+
+    def test_invalid_ledger_is_empty(self, tmp_path):
+        ''' Test if unreadable ledger is treated as empty '''
+
+        path = tmp_path / 'ledger.json'
+        path.write_text('{invalid')
+
+        assert ledger.DeploymentLedger(str(path)).load() == {}
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Tee stage copying ansible-playbook output to log files and a merged console view
+"""
+
+import fcntl
+import os
+import sys
+import time
+
+READ_CHUNK_SIZE = 64 * 1024
+# Maximum number of lines printed to the console per second when output of many clusters is merged
+DEFAULT_RATE_LIMIT = 100
+
+
+class LogTee:
+    """Writes each deployment output to its log file and streams selected clusters to the console"""
+
+    def __init__(self, follow=None, prefix=True, rate_limit=DEFAULT_RATE_LIMIT, out=sys.stdout):
+        """
+        follow - collection of cluster names shown on the console, None shows all of them
+        prefix - prefix console lines with the cluster name
+        rate_limit - maximum number of console lines per second, 0 means no limit
+        """
+        self.__follow = set(follow) if follow is not None else None
+        self.__prefix = prefix
+        self.__rate_limit = rate_limit
+        self.__out = out
+        self.__window_start = 0.0
+        self.__window_lines = 0
+        self.__suppressed = {}
+
+    def is_followed(self, cluster_name):
+        """Returns True if cluster output is shown on the console"""
+        return self.__follow is None or cluster_name in self.__follow
+
+    def attach(self, cluster_name, pipe, log_file, supervisor):
+        """Starts copying pipe to log_file from the supervisor loop, returns ClusterStream"""
+        stream = ClusterStream(self, cluster_name, pipe, log_file, supervisor.unwatch)
+        supervisor.watch(pipe, stream.on_readable)
+        return stream
+
+    def emit(self, cluster_name, lines):
+        """Prints complete lines of given cluster on the console"""
+        if not self.is_followed(cluster_name):
+            return
+
+        for line in lines:
+            if not self.__admit_line():
+                self.__suppressed[cluster_name] = self.__suppressed.get(cluster_name, 0) + 1
+                continue
+            self.__write(cluster_name, line)
+        self.__out.flush()
+
+    def __admit_line(self):
+        if self.__rate_limit <= 0:
+            return True
+
+        now = time.monotonic()
+        if now - self.__window_start >= 1:
+            self.__window_start = now
+            self.__window_lines = 0
+            self.__report_suppressed()
+
+        if self.__window_lines >= self.__rate_limit:
+            return False
+        self.__window_lines += 1
+        return True
+
+    def __report_suppressed(self):
+        for cluster_name, count in self.__suppressed.items():
+            self.__write(cluster_name, f"... {count} lines suppressed, see the log file\n")
+        self.__suppressed = {}
+
+    def __write(self, cluster_name, line):
+        if self.__prefix:
+            self.__out.write(f"[{cluster_name}] {line}")
+        else:
+            self.__out.write(line)
+
+    def flush(self):
+        """Prints pending notifications about suppressed lines"""
+        self.__report_suppressed()
+        self.__out.flush()
+
+
+class ClusterStream:
+    """Output of a single deployment process read by LogTee"""
+
+    def __init__(self, tee, cluster_name, pipe, log_file, unwatch):
+        self.__tee = tee
+        self.__cluster_name = cluster_name
+        self.__pipe = pipe
+        self.__log_file = log_file
+        self.__unwatch = unwatch
+        self.__partial_line = b""
+
+    @property
+    def closed(self):
+        """Returns True if the whole output has been read"""
+        return self.__pipe is None
+
+    def on_readable(self, _):
+        """Supervisor callback, reads available output chunk"""
+        # Stream may be closed by an exit callback dispatched earlier in the same select() batch
+        if self.closed:
+            return
+        if not self.__read_chunk():
+            self.close()
+
+    def drain(self):
+        """Reads whatever output is left without blocking and closes the stream"""
+        if self.closed:
+            return
+        fd = self.__pipe.fileno()
+        fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+        try:
+            while self.__read_chunk():
+                pass
+        except BlockingIOError:
+            # Output still held open by a leftover child process
+            pass
+        self.close()
+
+    def close(self):
+        """Stops reading, prints incomplete last line and closes the pipe"""
+        if self.closed:
+            return
+        self.__unwatch(self.__pipe)
+        self.__pipe.close()
+        self.__pipe = None
+        if self.__partial_line:
+            self.__tee.emit(self.__cluster_name, [self.__decode(self.__partial_line + b"\n")])
+            self.__partial_line = b""
+
+    def __read_chunk(self):
+        chunk = os.read(self.__pipe.fileno(), READ_CHUNK_SIZE)
+        if not chunk:
+            return False
+
+        self.__log_file.write(chunk)
+        self.__log_file.flush()
+
+        if self.__tee.is_followed(self.__cluster_name):
+            lines = (self.__partial_line + chunk).split(b"\n")
+            self.__partial_line = lines.pop()
+            self.__tee.emit(self.__cluster_name, [self.__decode(line + b"\n") for line in lines])
+        return True
+
+    @staticmethod
+    def __decode(line):
+        return line.decode("utf-8", errors="replace")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Group variables of a cluster resolved in ansible precedence order, with evaluation of simple `when:` conditions
+"""
+
+import functools
+import os
+import re
+
+import yaml
+
+from deployment_handlers import inventory_cache
+
+GROUP_VARS_DIR = "group_vars"
+HOST_VARS_DIR = "host_vars"
+ALL_GROUP = "all"
+INVENTORY_LAYER = "inventory"
+# Layers of group_vars files by the number their names start with, in increasing precedence
+LAYERS = {
+    10: "10-default",
+    30: "30-deployment",
+    40: "40-platform-profile",
+    90: "90-settings",
+}
+VARS_FILE_RE = re.compile(r"^(\d+)[-_].*\.ya?ml$", re.IGNORECASE)
+VARS_FILE_EXTENSION_RE = re.compile(r"\.ya?ml$", re.IGNORECASE)
+PROFILE_FILE_RE = re.compile(r"^[a-z]\w*\.ya?ml$", re.IGNORECASE | re.ASCII)
+# Strings ansible's bool filter converts to True
+TRUE_STRINGS = ("yes", "on", "1", "true", "y", "t")
+
+TOKEN_RE = re.compile(r"""\s*(?:
+    (?P<string>"[^"]*"|'[^']*')
+    |(?P<number>-?\d+(?:\.\d+)?)
+    |(?P<op>==|!=|\(|\)|\|)
+    |(?P<name>[A-Za-z_]\w*)
+    )""", re.VERBOSE)
+LITERALS = {"true": True, "false": False, "none": None, "null": None}
+# Value of an undefined variable, until a default filter replaces it
+_UNDEFINED = object()
+
+
+class Undecidable(Exception):
+    """Condition uses undefined variables or expressions which are not supported"""
+
+
+def to_bool(value):
+    """Returns truth value of the variable the way ansible conditionals and the bool filter see it"""
+    if isinstance(value, str):
+        return value.strip().lower() in TRUE_STRINGS
+    return bool(value)
+
+
+@functools.lru_cache(maxsize=None)
+def _load_vars_file(path, mtime_ns, size): # pylint: disable=unused-argument
+    """Returns variables of the file, parsed once per process as long as the file does not change"""
+    with open(path, "r", encoding="utf-8") as vars_file:
+        data = yaml.load(vars_file, Loader=inventory_cache.YAML_LOADER) # nosec - YAML_LOADER is a safe loader
+    return data if isinstance(data, dict) else {}
+
+
+def load_vars_file(path):
+    """Returns variables defined in the YAML file"""
+    stat = os.stat(path)
+    return _load_vars_file(os.path.realpath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def get_layer(file_name):
+    """Returns layer of the group_vars file, e.g. 30-deployment for 30_dek_deployment.yml"""
+    match = VARS_FILE_RE.match(file_name)
+    if match is None:
+        return file_name
+    return LAYERS.get(int(match.group(1)), file_name)
+
+
+def collect_vars_files(ek_path, deployment, platform_profile=None):
+    """
+    Returns {relative path: path} of group_vars files of a cluster laid out as in its inventory directory.
+
+    ek_path - experience kit directory
+    deployment - name of the deployment directory in <ek_path>/deployments
+    platform_profile - name of the platform profile directory in <ek_path>/platform_profiles, None if not used
+    """
+    vars_files = {}
+    default_path = os.path.join(ek_path, "inventory", "default", GROUP_VARS_DIR)
+    for root, _, files in os.walk(default_path):
+        for file_name in files:
+            group = os.path.relpath(root, default_path)
+            vars_files[os.path.join(GROUP_VARS_DIR, group, file_name)] = os.path.join(root, file_name)
+
+    profiles = [(os.path.join(ek_path, "deployments", deployment), f"30_{deployment}_deployment.yml")]
+    if platform_profile:
+        profiles.append((os.path.join(ek_path, "platform_profiles", platform_profile),
+                         f"40_{platform_profile}_platform_profile.yml"))
+    for profile_path, link_name in profiles:
+        if not os.path.isdir(profile_path):
+            continue
+        for file_name in sorted(os.listdir(profile_path)):
+            if PROFILE_FILE_RE.match(file_name):
+                group = os.path.splitext(file_name)[0]
+                vars_files[os.path.join(GROUP_VARS_DIR, group, link_name)] = os.path.join(profile_path, file_name)
+    return vars_files
+
+
+class ResolvedVars:
+    """
+    Flat index of group variables of a cluster.
+
+    Files of every group are applied in name order like ansible does, so 10-default is overridden by
+    30-deployment, 40-platform-profile and 90-settings. Like in ansible, variables of a group defined in the
+    inventory file are overridden by its group_vars files, and variables of the all group, from both, are
+    overridden by variables of the other groups.
+    Variables of a host, from host_vars files and then from the inventory file, override all group variables.
+    Files are read only once per process.
+    """
+
+    def __init__(self, vars_files, inventory_vars=None, inventory_host_vars=None):
+        """
+        vars_files - {relative path: path} of group_vars/<group>/<file>, host_vars/<host>/<file> and
+                     host_vars/<host>.yml files, other paths are ignored
+        inventory_vars - {group: {variable: value}} defined in the inventory file
+        inventory_host_vars - {host: {variable: value}} defined in the inventory file
+        """
+        self.__inventory = self.__index_inventory(inventory_vars)
+        self.__inventory_hosts = self.__index_inventory(inventory_host_vars)
+
+        files = {GROUP_VARS_DIR: {}, HOST_VARS_DIR: {}}
+        for rel_path, path in vars_files.items():
+            parts = rel_path.split(os.sep)
+            if len(parts) == 3 and parts[0] in files:
+                files[parts[0]].setdefault(parts[1], []).append((parts[2], path))
+            elif len(parts) == 2 and parts[0] == HOST_VARS_DIR and VARS_FILE_EXTENSION_RE.search(parts[1]):
+                files[HOST_VARS_DIR].setdefault(VARS_FILE_EXTENSION_RE.sub("", parts[1]), []).append((parts[1], path))
+
+        self.__groups = self.__index_files(files[GROUP_VARS_DIR])
+        self.__hosts = self.__index_files(files[HOST_VARS_DIR])
+
+    @staticmethod
+    def __index_inventory(inventory_vars):
+        return {owner: {name: (value, INVENTORY_LAYER) for name, value in (owner_vars or {}).items()}
+                for owner, owner_vars in (inventory_vars or {}).items()}
+
+    @staticmethod
+    def __index_files(owner_files):
+        indexes = {}
+        for owner, files in owner_files.items():
+            index = indexes.setdefault(owner, {})
+            for file_name, path in sorted(files):
+                layer = get_layer(file_name)
+                index.update((name, (value, layer)) for name, value in load_vars_file(path).items())
+        return indexes
+
+    @classmethod
+    def from_inventory_doc(cls, vars_files, inventory_doc):
+        """Returns variables of the cluster with vars of the groups and hosts of its parsed inventory document"""
+        inventory_vars = {}
+        inventory_host_vars = {}
+        for group, group_doc in (inventory_doc or {}).items():
+            if not isinstance(group_doc, dict):
+                continue
+            if isinstance(group_doc.get("vars"), dict):
+                inventory_vars[group] = group_doc["vars"]
+            if isinstance(group_doc.get("hosts"), dict):
+                for host, host_vars in group_doc["hosts"].items():
+                    inventory_host_vars.setdefault(host, {}).update(host_vars if isinstance(host_vars, dict) else {})
+        return cls(vars_files, inventory_vars, inventory_host_vars)
+
+    def __lookup(self, name, group, host):
+        if host is not None:
+            for indexes in (self.__hosts, self.__inventory_hosts):
+                index = indexes.get(host, {})
+                if name in index:
+                    return index[name]
+        for index_group in (group, ALL_GROUP):
+            for indexes in (self.__groups, self.__inventory):
+                index = indexes.get(index_group, {})
+                if name in index:
+                    return index[name]
+        raise KeyError(name)
+
+    def get(self, name, default=None, group=ALL_GROUP, host=None):
+        """Returns value of the variable in the group, or of the host of the group, default if it is not defined"""
+        try:
+            return self.__lookup(name, group, host)[0]
+        except KeyError:
+            return default
+
+    def get_layer(self, name, group=ALL_GROUP, host=None):
+        """Returns layer defining the effective value of the variable, None if it is not defined"""
+        try:
+            return self.__lookup(name, group, host)[1]
+        except KeyError:
+            return None
+
+    def evaluate(self, condition, group=ALL_GROUP, host=None):
+        """
+        Returns result of the `when:` condition for the group, or for the host of the group, None if it cannot be
+        decided statically.
+
+        Supported are variables, literals, `not`, `and`, `or`, `==`, `!=`, parentheses and the default and bool
+        filters, e.g. "ptp_sync_enable | default(False) and not split_network | bool".
+        """
+        try:
+            parser = _ConditionParser(_tokenize(condition), lambda name: self.__lookup(name, group, host)[0])
+            return to_bool(parser.parse())
+        except Undecidable:
+            return None
+
+
+def _tokenize(condition):
+    tokens = []
+    position = 0
+    condition = condition.strip()
+    while position < len(condition):
+        match = TOKEN_RE.match(condition, position)
+        if match is None or match.end() == position:
+            raise Undecidable(condition)
+        position = match.end()
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == "string":
+            tokens.append(("literal", text[1:-1]))
+        elif kind == "number":
+            tokens.append(("literal", float(text) if "." in text else int(text)))
+        elif kind == "name" and text.lower() in LITERALS:
+            tokens.append(("literal", LITERALS[text.lower()]))
+        elif kind == "name" and text in ("and", "or", "not"):
+            tokens.append(("op", text))
+        else:
+            tokens.append((kind, text))
+    return tokens
+
+
+class _ConditionParser:
+    """Recursive descent evaluation of condition tokens"""
+
+    def __init__(self, tokens, lookup):
+        self.__tokens = tokens
+        self.__position = 0
+        self.__lookup = lookup
+
+    def parse(self):
+        """Returns value of the whole condition"""
+        value = self.__or()
+        if self.__position != len(self.__tokens):
+            raise Undecidable("unexpected token")
+        return value
+
+    def __peek(self):
+        return self.__tokens[self.__position] if self.__position < len(self.__tokens) else (None, None)
+
+    def __accept(self, text):
+        if self.__peek() == ("op", text):
+            self.__position += 1
+            return True
+        return False
+
+    def __expect(self, text):
+        if not self.__accept(text):
+            raise Undecidable(f"expected {text}")
+
+    def __or(self):
+        value = self.__and()
+        while self.__accept("or"):
+            right = self.__and()
+            value = to_bool(value) or to_bool(right)
+        return value
+
+    def __and(self):
+        value = self.__not()
+        while self.__accept("and"):
+            right = self.__not()
+            value = to_bool(value) and to_bool(right)
+        return value
+
+    def __not(self):
+        if self.__accept("not"):
+            return not to_bool(self.__not())
+        return self.__comparison()
+
+    def __comparison(self):
+        value = self.__operand()
+        if self.__accept("=="):
+            return value == self.__operand()
+        if self.__accept("!="):
+            return value != self.__operand()
+        return value
+
+    def __operand(self):
+        kind, text = self.__peek()
+        if self.__accept("("):
+            value = self.__or()
+            self.__expect(")")
+        elif kind == "literal":
+            self.__position += 1
+            value = text
+        elif kind == "name":
+            self.__position += 1
+            try:
+                value = self.__lookup(text)
+            except KeyError:
+                value = _UNDEFINED
+        else:
+            raise Undecidable(f"unexpected {text}")
+        return self.__filters(value)
+
+    def __filters(self, value):
+        while self.__accept("|"):
+            kind, name = self.__peek()
+            if kind != "name":
+                raise Undecidable("expected filter")
+            self.__position += 1
+            if name in ("default", "d"):
+                self.__expect("(")
+                default_kind, default = self.__peek()
+                if default_kind != "literal":
+                    raise Undecidable("only literal defaults are supported")
+                self.__position += 1
+                self.__expect(")")
+                value = default if value is _UNDEFINED else value
+            elif name == "bool":
+                value = value if value is _UNDEFINED else to_bool(value)
+            else:
+                raise Undecidable(f"unsupported filter {name}")
+        if value is _UNDEFINED:
+            raise Undecidable("undefined variable")
+        return value
@@ -0,0 +1,149 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+# pylint: disable=bad-option-value,useless-option-value # (no-self-use was removed in pylint 2.14)
+# pylint: disable=no-self-use # (pytest stylistic convention)
+
+""" Unittests for resolved_vars.py file """
+
+import os
+import pytest
+import resolved_vars
+
+
+def _vars_files(tmp_path, files):
+    vars_files = {}
+    for rel_path, content in files.items():
+        path = tmp_path / rel_path.replace('/', '_')
+        path.write_text(content)
+        vars_files[os.path.join(*rel_path.split('/'))] = str(path)
+    return vars_files
+
+
+def _resolved(tmp_path, files, inventory_vars=None, inventory_host_vars=None):
+    return resolved_vars.ResolvedVars(_vars_files(tmp_path, files), inventory_vars, inventory_host_vars)
+
+
+class TestResolvedVars:
+    ''' Tests for variable precedence of ResolvedVars class '''
+
+    def test_files_of_group_override_in_name_order(self, tmp_path):
+        ''' Test if later group_vars files of a group override earlier ones '''
+
+        cluster_vars = _resolved(tmp_path, {
+            'group_vars/all/10-default.yml': 'a: default\nb: default\n',
+            'group_vars/all/30_dek_deployment.yml': 'a: deployment\n',
+            'group_vars/all/90-settings.yml': 'b: settings\n',
+        })
+
+        assert cluster_vars.get('a') == 'deployment'
+        assert cluster_vars.get_layer('a') == '30-deployment'
+        assert cluster_vars.get('b') == 'settings'
+        assert cluster_vars.get_layer('b') == '90-settings'
+        assert cluster_vars.get('c', 'missing') == 'missing'
+        assert cluster_vars.get_layer('c') is None
+
+    def test_group_precedence(self, tmp_path):
+        ''' Test ansible order: inventory of all < files of all < inventory of group < files of group '''
+
+        files = {
+            'group_vars/all/10-default.yml': 'a: files_all\nb: files_all\nc: files_all\n',
+            'group_vars/edgenode_group/10-default.yml': 'a: files_group\n',
+        }
+        inventory_vars = {
+            'all': {'a': 'inventory_all', 'b': 'inventory_all', 'c': 'inventory_all', 'd': 'inventory_all'},
+            'edgenode_group': {'a': 'inventory_group', 'b': 'inventory_group'},
+        }
+        cluster_vars = _resolved(tmp_path, files, inventory_vars)
+
+        assert cluster_vars.get('a', group='edgenode_group') == 'files_group'
+        assert cluster_vars.get('b', group='edgenode_group') == 'inventory_group'
+        assert cluster_vars.get_layer('b', group='edgenode_group') == resolved_vars.INVENTORY_LAYER
+        assert cluster_vars.get('c', group='edgenode_group') == 'files_all'
+        assert cluster_vars.get('d', group='edgenode_group') == 'inventory_all'
+        assert cluster_vars.get('b') == 'files_all'
+
+    def test_host_overrides_groups(self, tmp_path):
+        ''' Test if host_vars files and then inventory host vars override group variables '''
+
+        files = {
+            'group_vars/edgenode_group/90-settings.yml': 'a: group\nb: group\nc: group\n',
+            'host_vars/node1/10-default.yml': 'a: host_files\n',
+            'host_vars/node2.yml': 'a: host2_file\n',
+        }
+        cluster_vars = _resolved(tmp_path, files, {}, {'node1': {'a': 'inventory_host', 'b': 'inventory_host'}})
+
+        assert cluster_vars.get('a', group='edgenode_group', host='node1') == 'host_files'
+        assert cluster_vars.get('b', group='edgenode_group', host='node1') == 'inventory_host'
+        assert cluster_vars.get('c', group='edgenode_group', host='node1') == 'group'
+        assert cluster_vars.get('a', group='edgenode_group', host='node2') == 'host2_file'
+        assert cluster_vars.get('a', group='edgenode_group') == 'group'
+
+    def test_from_inventory_doc(self, tmp_path):
+        ''' Test if group and host vars of the inventory document are used '''
+
+        cluster_vars = resolved_vars.ResolvedVars.from_inventory_doc(
+            _vars_files(tmp_path, {'group_vars/all/10-default.yml': 'ne_biosfw_enable: true\n'}),
+            {'all': {'vars': {'cluster_name': 'c1'}},
+             'edgenode_group': {'hosts': {'node1': {'ne_biosfw_enable': False}}, 'vars': {'x': 1}}})
+
+        assert cluster_vars.get('cluster_name') == 'c1'
+        assert cluster_vars.get('x', group='edgenode_group') == 1
+        assert cluster_vars.evaluate('ne_biosfw_enable', group='edgenode_group')
+        assert not cluster_vars.evaluate('ne_biosfw_enable', group='edgenode_group', host='node1')
+
+
+class TestEvaluate:
+    ''' Tests for condition evaluation of ResolvedVars class '''
+
+    @pytest.fixture
+    def cluster_vars(self, tmp_path):
+        ''' Variables used by the conditions '''
+        return _resolved(tmp_path, {
+            'group_vars/all/10-default.yml': 'enabled: true\ndisabled: false\nyes_string: "yes"\n'
+                                             'no_string: "no"\nmode: fast\nnumber: 3\n',
+        })
+
+    @pytest.mark.parametrize('condition, expected', [
+        ('enabled', True),
+        ('not enabled', False),
+        ('enabled and disabled', False),
+        ('enabled and not disabled', True),
+        ('disabled or (enabled and mode == "fast")', True),
+        ("mode != 'fast'", False),
+        ('number == 3', True),
+        ('yes_string | bool', True),
+        ('no_string | bool', False),
+        ('no_string', False),
+        ('undefined_var | default(False)', False),
+        ('undefined_var | d(true) and enabled', True),
+        ('undefined_var | default("yes") | bool', True),
+        ('disabled | default(True)', False),
+        ('True', True),
+        ('none', False),
+    ])
+    def test_supported_conditions(self, cluster_vars, condition, expected):
+        ''' Test result of supported conditions '''
+
+        assert cluster_vars.evaluate(condition) is expected
+
+    @pytest.mark.parametrize('condition', [
+        'undefined_var',
+        'undefined_var | bool',
+        'enabled and undefined_var',
+        'number > 2',
+        'mode | lower == "fast"',
+        'enabled | default(other_var)',
+        '(enabled',
+        'enabled enabled',
+        'groups["all"]',
+    ])
+    def test_undecidable_conditions(self, cluster_vars, condition):
+        ''' Test if undefined variables and unsupported expressions cannot be decided '''
+
+        assert cluster_vars.evaluate(condition) is None
+
+    def test_undecidable_exception(self):
+        ''' Test if parser raises Undecidable on an unsupported token '''
+
+        with pytest.raises(resolved_vars.Undecidable):
+            resolved_vars._tokenize('a > b') # pylint: disable=protected-access
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Scheduling of deployment phases across clusters
+"""
+
+import collections
+
+# Unit of work launched by the supervisor: one ansible-playbook run of a cluster.
+# phase is None and playbook is None when the whole default playbook of the cluster is run at once.
+ScheduledPhase = collections.namedtuple("ScheduledPhase", ["inventory", "phase", "playbook", "is_final"])
+
+
+class PhaseScheduler:
+    """
+    Schedules chains of phases, one chain per cluster. Phases of a cluster run in order, phases of different
+    clusters run in parallel within the global limit and the per-phase limits.
+
+    When there is a free slot, the cluster furthest in its chain is started first, so clusters held back by a
+    phase limit do not delay the ones that already passed it. Remaining phases of a cluster are dropped when one
+    of its phases fails.
+    """
+
+    def __init__(self, chains, max_parallel=0, phase_limits=None):
+        """
+        chains - list of ScheduledPhase lists, one per cluster, in order of execution
+        max_parallel - maximum number of phases running at once, 0 means no limit
+        phase_limits - {phase name: maximum number of clusters running the phase at once}
+        """
+        self.__chains = [collections.deque(chain) for chain in chains if chain]
+        self.__progress = [0] * len(self.__chains)
+        self.__running = {}
+        self.__running_phases = collections.Counter()
+        self.__max_parallel = max_parallel
+        self.__phase_limits = phase_limits or {}
+        self.__dropped = []
+
+    def has_pending(self):
+        """Checks if there are phases which have not been started yet"""
+        return any(self.__chains)
+
+    def next_ready(self):
+        """Returns next phase which can be started now and marks it as running, None if there is none"""
+        if 0 < self.__max_parallel <= len(self.__running):
+            return None
+
+        ready = [index for index, chain in enumerate(self.__chains)
+                 if chain and index not in self.__running and self.__has_phase_slot(chain[0].phase)]
+        if not ready:
+            return None
+
+        index = max(ready, key=lambda index: (self.__progress[index], -index))
+        unit = self.__chains[index].popleft()
+        self.__progress[index] += 1
+        self.__running[index] = unit
+        self.__running_phases[unit.phase] += 1
+        return unit
+
+    def on_finished(self, unit, succeeded):
+        """Marks running phase as finished, next phase of its cluster becomes ready if it succeeded"""
+        index = next(index for index, running in self.__running.items() if running is unit)
+        del self.__running[index]
+        self.__running_phases[unit.phase] -= 1
+        if not succeeded:
+            self.__dropped.extend(self.__chains[index])
+            self.__chains[index].clear()
+
+    def cancel(self):
+        """Drops all pending phases, returns phases which have not been started, including dropped ones"""
+        not_started = self.__dropped
+        for chain in self.__chains:
+            not_started.extend(chain)
+            chain.clear()
+        self.__dropped = []
+        return not_started
+
+    def __has_phase_slot(self, phase):
+        limit = self.__phase_limits.get(phase, 0)
+        return limit <= 0 or self.__running_phases[phase] < limit
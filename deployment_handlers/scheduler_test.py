@@ -0,0 +1,102 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+# pylint: disable=bad-option-value,useless-option-value # (no-self-use was removed in pylint 2.14)
+# pylint: disable=no-self-use # (pytest stylistic convention)
+
+""" Unittests for scheduler.py file """
+
+import scheduler
+
+PHASES = ('infrastructure', 'kubernetes', 'telemetry')
+
+
+def _chain(cluster_name):
+    return [scheduler.ScheduledPhase(cluster_name, phase, f'{phase}.yml', phase == PHASES[-1]) for phase in PHASES]
+
+
+def _start_ready(phase_scheduler):
+    units = []
+    unit = phase_scheduler.next_ready()
+    while unit is not None:
+        units.append(unit)
+        unit = phase_scheduler.next_ready()
+    return units
+
+
+def _names(units):
+    return [(unit.inventory, unit.phase) for unit in units]
+
+
+class TestPhaseScheduler:
+    ''' Tests for PhaseScheduler class '''
+
+    def test_phases_of_cluster_run_in_order(self):
+        ''' Test if clusters run in parallel and next phase of a cluster starts after the previous one '''
+
+        phase_scheduler = scheduler.PhaseScheduler([_chain('c1'), _chain('c2')])
+
+        started = _start_ready(phase_scheduler)
+        assert _names(started) == [('c1', 'infrastructure'), ('c2', 'infrastructure')]
+
+        phase_scheduler.on_finished(started[1], True)
+        assert _names(_start_ready(phase_scheduler)) == [('c2', 'kubernetes')]
+        phase_scheduler.on_finished(started[0], True)
+        assert _names(_start_ready(phase_scheduler)) == [('c1', 'kubernetes')]
+
+    def test_phase_limits(self):
+        ''' Test if phase limit holds clusters back and the cluster furthest in its chain is started first '''
+
+        phase_scheduler = scheduler.PhaseScheduler([_chain('c1'), _chain('c2'), _chain('c3')],
+                                                   phase_limits={'infrastructure': 1, 'kubernetes': 1})
+
+        started = _start_ready(phase_scheduler)
+        assert _names(started) == [('c1', 'infrastructure')]
+
+        phase_scheduler.on_finished(started[0], True)
+        started = _start_ready(phase_scheduler)
+        assert _names(started) == [('c1', 'kubernetes'), ('c2', 'infrastructure')]
+
+        phase_scheduler.on_finished(started[1], True)
+        started_c3 = _start_ready(phase_scheduler)
+        assert _names(started_c3) == [('c3', 'infrastructure')]
+
+        phase_scheduler.on_finished(started[0], True)
+        assert _names(_start_ready(phase_scheduler)) == [('c1', 'telemetry'), ('c2', 'kubernetes')]
+
+    def test_max_parallel(self):
+        ''' Test if global limit applies to phases of all clusters, furthest cluster gets the free slot '''
+
+        phase_scheduler = scheduler.PhaseScheduler([_chain('c1'), _chain('c2'), _chain('c3')], max_parallel=2)
+
+        started = _start_ready(phase_scheduler)
+        assert _names(started) == [('c1', 'infrastructure'), ('c2', 'infrastructure')]
+
+        phase_scheduler.on_finished(started[0], True)
+        started = _start_ready(phase_scheduler)
+        assert _names(started) == [('c1', 'kubernetes')]
+        assert phase_scheduler.next_ready() is None
+
+    def test_failed_phase_drops_cluster(self):
+        ''' Test if failure drops remaining phases of the cluster only, they are reported by cancel '''
+
+        phase_scheduler = scheduler.PhaseScheduler([_chain('c1'), _chain('c2')])
+
+        started = _start_ready(phase_scheduler)
+        phase_scheduler.on_finished(started[0], False)
+        assert not _start_ready(phase_scheduler)
+
+        phase_scheduler.on_finished(started[1], True)
+        assert _names(_start_ready(phase_scheduler)) == [('c2', 'kubernetes')]
+        assert phase_scheduler.has_pending()
+
+        assert _names(phase_scheduler.cancel()) == [('c1', 'kubernetes'), ('c1', 'telemetry'), ('c2', 'telemetry')]
+        assert not phase_scheduler.has_pending()
+
+    def test_whole_playbook_units(self):
+        ''' Test if units without phase are not limited by phase limits '''
+
+        chains = [[scheduler.ScheduledPhase(name, None, None, True)] for name in ('c1', 'c2')]
+        phase_scheduler = scheduler.PhaseScheduler(chains + [[]], phase_limits={'infrastructure': 1})
+
+        assert _names(_start_ready(phase_scheduler)) == [('c1', None), ('c2', None)]
+        assert not phase_scheduler.has_pending()
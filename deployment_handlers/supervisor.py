@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Event driven supervisor for parallel deployments
+"""
+
+import functools
+import logging
+import os
+import selectors
+
+# Used only when process exit notifications (pidfd) are not supported by the platform
+FALLBACK_POLL_INTERVAL = 1
+
+
+def open_exit_notifier(pid):
+    """Returns file descriptor which becomes readable when process exits, None if not supported"""
+    pidfd_open = getattr(os, "pidfd_open", None)
+    if pidfd_open is None:
+        return None
+    try:
+        return pidfd_open(pid)
+    except OSError:
+        return None
+
+
+class DeploymentSupervisor:
+    """Launches deployments picked by the scheduler and reacts immediately when any of them exits"""
+
+    def __init__(self, launch, on_exit):
+        """
+        launch - callable taking a scheduled unit (see scheduler module) and returning a started DeploymentWrapper
+        on_exit - callable taking an ended DeploymentWrapper, returns False to stop admitting new deployments
+        """
+        self.__launch = launch
+        self.__on_exit = on_exit
+        self.__selector = selectors.DefaultSelector()
+        self.__running = {}
+        self.__units = {}
+        self.__scheduler = None
+        self.__admitting = True
+
+    def watch(self, fileobj, callback):
+        """Calls callback(fileobj) from the supervisor loop whenever fileobj becomes readable"""
+        self.__selector.register(fileobj, selectors.EVENT_READ, callback)
+
+    def unwatch(self, fileobj):
+        """Stops watching fileobj registered by watch()"""
+        self.__selector.unregister(fileobj)
+
+    def stop_admitting(self):
+        """Prevents not yet started deployments from being launched"""
+        self.__admitting = False
+
+    def run(self, deployment_scheduler, deployments):
+        """Runs deployments of all units of the scheduler, started ones are appended to deployments list.
+        Returns list of units which have not been started."""
+        self.__scheduler = deployment_scheduler
+
+        while (deployment_scheduler.has_pending() and self.__admitting) or self.__running:
+            while self.__admitting:
+                unit = deployment_scheduler.next_ready()
+                if unit is None:
+                    break
+                deployment = self.__launch(unit)
+                deployments.append(deployment)
+                self.__units[deployment] = unit
+                self.__start_watching(deployment)
+
+            if not self.__running:
+                # Nothing to wait for and nothing the scheduler allows to start
+                break
+
+            timeout = FALLBACK_POLL_INTERVAL if None in self.__running.values() else None
+            for key, _ in self.__selector.select(timeout):
+                # Earlier callbacks of the batch may have stopped watching this file object
+                if self.__is_watched(key):
+                    key.data(key.fileobj)
+
+            for deployment, notifier in list(self.__running.items()):
+                if notifier is None and deployment.process.poll() is not None:
+                    self.__reap(deployment)
+
+        return deployment_scheduler.cancel()
+
+    def __is_watched(self, key):
+        # Looked up by descriptor, file objects unwatched by a callback may be closed already
+        return self.__selector.get_map().get(key.fd) is key
+
+    def __start_watching(self, deployment):
+        notifier = open_exit_notifier(deployment.process.pid)
+        if notifier is None:
+            logging.debug("Process exit notifications not supported, polling %s every %ds",
+                          deployment.cluster_name, FALLBACK_POLL_INTERVAL)
+        else:
+            self.watch(notifier, functools.partial(self.__on_notifier_ready, deployment))
+        self.__running[deployment] = notifier
+
+    def __on_notifier_ready(self, deployment, _):
+        self.__reap(deployment)
+
+    def __reap(self, deployment):
+        notifier = self.__running.pop(deployment)
+        if notifier is not None:
+            self.unwatch(notifier)
+            os.close(notifier)
+
+        deployment.process.wait()
+        # Deployments terminated by the caller (e.g. on --any-errors-fatal) are already handled
+        if not deployment.has_ended and not self.__on_exit(deployment):
+            self.stop_admitting()
+        self.__scheduler.on_finished(self.__units.pop(deployment), deployment.ended_successfully)
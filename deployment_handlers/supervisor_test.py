@@ -0,0 +1,80 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+# pylint: disable=bad-option-value,useless-option-value # (no-self-use was removed in pylint 2.14)
+# pylint: disable=no-self-use # (pytest stylistic convention)
+
+""" Unittests for supervisor.py and log_tee.py files """
+
+import io
+import os
+import subprocess # nosec - security considered
+import log_tee
+import scheduler
+import supervisor
+
+
+class _Deployment: # pylint: disable=too-few-public-methods
+    def __init__(self, process):
+        self.process = process
+        self.cluster_name = 'c1'
+        self.has_ended = False
+        self.ended_successfully = True
+
+
+def _pipe_with_output(output=b'line\n'):
+    read_fd, write_fd = os.pipe()
+    os.write(write_fd, output)
+    os.close(write_fd)
+    return os.fdopen(read_fd, 'rb', buffering=0)
+
+
+class TestDeploymentSupervisor:
+    ''' Tests for DeploymentSupervisor class '''
+
+    def test_unwatched_file_objects_are_not_dispatched(self):
+        ''' Test if callbacks of file objects unwatched earlier in the same select() batch are skipped '''
+
+        calls = []
+        pipes = [_pipe_with_output(), _pipe_with_output()]
+
+        def on_readable(pipe):
+            calls.append(pipe)
+            # Like an exit callback closing streams of the other clusters
+            for watched in pipes:
+                if not watched.closed:
+                    deployment_supervisor.unwatch(watched)
+                    watched.close()
+
+        def launch(_):
+            for pipe in pipes:
+                deployment_supervisor.watch(pipe, on_readable)
+            return _Deployment(subprocess.Popen(['sleep', '0.2'])) # nosec - B603, B607
+
+        deployment_supervisor = supervisor.DeploymentSupervisor(launch=launch, on_exit=lambda _: True)
+        deployments = []
+        not_started = deployment_supervisor.run(
+            scheduler.PhaseScheduler([[scheduler.ScheduledPhase(None, None, None, True)]]), deployments)
+
+        assert not not_started
+        assert len(deployments) == 1
+        assert len(calls) == 1
+
+
+class TestClusterStream:
+    ''' Tests for ClusterStream class '''
+
+    def test_closed_stream_ignores_readable_event(self):
+        ''' Test if stream closed by another callback of the same select() batch does not read its pipe '''
+
+        out = io.StringIO()
+        log_file = io.BytesIO()
+        pipe = _pipe_with_output(b'first\nsecond')
+        stream = log_tee.ClusterStream(log_tee.LogTee(out=out), 'c1', pipe, log_file, lambda _: None)
+
+        stream.on_readable(pipe)
+        stream.close()
+        stream.on_readable(pipe)
+
+        assert stream.closed
+        assert log_file.getvalue() == b'first\nsecond'
+        assert out.getvalue() == '[c1] first\n[c1] second\n'
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+"""
+Run-over-run role duration report built from task_timing callback records
+"""
+
+import glob
+import json
+import logging
+import os
+import re
+import statistics
+
+TIMING_FILE_POSTFIX = ".timing.jsonl"
+NO_ROLE = "(tasks without role)"
+# <cluster name>_<deployment>_<date>_<time>_<playbook>, see get_log_file_path of deploy.py
+LOG_FILE_RE = re.compile(r"^(?P<prefix>.+)_\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}_")
+
+
+def get_timing_file_path(log_file_path):
+    """Returns timing records file path accompanying deployment log file"""
+    return os.path.splitext(log_file_path)[0] + TIMING_FILE_POSTFIX
+
+
+def get_file_cluster_name(path, deployments=()):
+    """Returns cluster name from the timing file name, deployments are names the cluster name may be followed by"""
+    match = LOG_FILE_RE.match(os.path.basename(path))
+    if match is None:
+        return None
+    prefix = match.group("prefix")
+    for deployment in sorted(deployments, key=len, reverse=True):
+        if prefix.endswith(f"_{deployment}") and len(prefix) > len(deployment) + 1:
+            return prefix[:-len(deployment) - 1]
+    return prefix
+
+
+def load_run(path, deployments=()):
+    """Loads timing records of a single deployment run, returns None if there are no valid records.
+    Cluster name is taken from the records, or from the file name if they do not have it."""
+    records = []
+    with open(path, "r", encoding="utf-8") as timing_file:
+        for line in timing_file:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                logging.debug("Skipping malformed timing record in %s", path)
+    if not records:
+        return None
+
+    # Wall clock time of the role in every play, hosts of a play are processed in parallel
+    play_bounds = {}
+    for record in records:
+        key = (record.get("playbook"), record.get("play"), record.get("role") or NO_ROLE)
+        start, end = play_bounds.get(key, (record["start"], record["end"]))
+        play_bounds[key] = (min(start, record["start"]), max(end, record["end"]))
+
+    roles = {}
+    for (_, _, role), (start, end) in play_bounds.items():
+        roles[role] = roles.get(role, 0) + end - start
+
+    return {
+        "path": path,
+        "cluster_name": records[0].get("cluster_name") or get_file_cluster_name(path, deployments),
+        "start": min(record["start"] for record in records),
+        "duration": max(record["end"] for record in records) - min(record["start"] for record in records),
+        # Sum of the role spans of all plays running the role
+        "roles": roles,
+    }
+
+
+def load_runs(logs_path, deployments=()):
+    """Returns timing runs found in logs_path grouped by cluster name, oldest first"""
+    runs = {}
+    for path in glob.glob(os.path.join(logs_path, f"*{TIMING_FILE_POSTFIX}")):
+        run = load_run(path, deployments)
+        if run is not None:
+            runs.setdefault(run["cluster_name"], []).append(run)
+    for cluster_runs in runs.values():
+        cluster_runs.sort(key=lambda run: run["start"])
+    return runs
+
+
+def find_regressions(runs, threshold, min_seconds):
+    """Compares the latest run with median of the previous ones.
+    Returns list of (role, latest duration, baseline duration) for roles slower by more than threshold
+    (fraction of baseline) and at least min_seconds."""
+    latest, previous = runs[-1], runs[:-1]
+    regressions = []
+    for role, duration in latest["roles"].items():
+        history = [run["roles"][role] for run in previous if role in run["roles"]]
+        if not history:
+            continue
+        baseline = statistics.median(history)
+        if duration - baseline >= min_seconds and duration > baseline * (1 + threshold):
+            regressions.append((role, duration, baseline))
+    regressions.sort(key=lambda regression: regression[1] - regression[2], reverse=True)
+    return regressions
+
+
+def build_report(logs_path, last_runs, threshold, min_seconds=30, deployments=()):
+    """Returns report lines comparing last_runs runs of every cluster and count of regressed roles.
+    deployments - names of deployments used to find cluster names in names of timing files"""
+    lines = []
+    regressed_count = 0
+    runs = load_runs(logs_path, deployments)
+    if not runs:
+        return [f"No timing records found in {logs_path}"], 0
+
+    for cluster_name in sorted(runs):
+        cluster_runs = runs[cluster_name][-last_runs:]
+        lines.append(f'CLUSTER "{cluster_name}": {len(cluster_runs)} run(s), durations: ' +
+                     ", ".join(f"{run['duration']:.0f}s" for run in cluster_runs))
+        if len(cluster_runs) < 2:
+            lines.append("    not enough runs to compare")
+            continue
+
+        regressions = find_regressions(cluster_runs, threshold, min_seconds)
+        regressed_count += len(regressions)
+        if not regressions:
+            lines.append("    no role regressions")
+        for role, duration, baseline in regressions:
+            lines.append(f"    REGRESSED {role}: {duration:.0f}s vs {baseline:.0f}s median "
+                         f"(+{duration - baseline:.0f}s, +{(duration / baseline - 1) * 100 if baseline else 100:.0f}%)")
+    return lines, regressed_count
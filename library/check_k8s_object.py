@@ -6,8 +6,12 @@
 ''' This is a module for ansible to check working state of some kubernetes
 objects. Please read inline YAML documentation'''
 
-import subprocess # nosec - bandit: security considered
+import codecs
 import json
+import queue
+import subprocess # nosec - bandit: security considered
+import threading
+import time
 
 from ansible.module_utils.basic import AnsibleModule
 
@@ -32,16 +36,37 @@ options:
     kind:
         description:
             - > kind of object to check, can be daemonset, statefulset
-                or deployment
-        required: true
+                or deployment; default kind of the objects list entries
+        required: false
     namespace:
         description:
-            - k8s namespace name
-        required: true
+            - > k8s namespace name; default namespace of the objects list
+                entries
+        required: false
     name:
         description:
-            - k8s object name
-        required: true
+            - k8s object name, mutually exclusive with objects
+        required: false
+    objects:
+        description:
+            - > list of objects to check at once, every entry is an object
+                name or a dictionary with name and optionally kind and
+                namespace keys; objects are fetched with one kubectl call
+                per namespace
+        required: false
+    wait:
+        description:
+            - > wait until all objects are ready instead of failing right
+                away; objects which are not ready are watched with
+                kubectl get --watch, so the module returns as soon as they
+                become ready
+        required: false
+        default: false
+    timeout:
+        description:
+            - maximum time in seconds to wait for the objects to be ready
+        required: false
+        default: 300
 '''
 
 EXAMPLES = '''
@@ -51,6 +76,27 @@ EXAMPLES = '''
     kind: sts
     name: harbor-app-database
     namespace: harbor
+
+# Check several objects with a single kubectl call
+- name: check harbor objects
+  check_k8s_object:
+    kind: deployment
+    namespace: harbor
+    objects:
+    - harbor-app-core
+    - harbor-app-portal
+    - { kind: statefulset, name: harbor-app-database }
+
+# Wait for the objects instead of retrying the task
+- name: wait for harbor objects
+  check_k8s_object:
+    kind: deployment
+    namespace: harbor
+    objects:
+    - harbor-app-core
+    - harbor-app-portal
+    wait: true
+    timeout: 600
 '''
 
 RETURN = '''
@@ -64,29 +110,57 @@ message:
                    like: Replicas status: 1/1
     type: str
     returned: always
+results:
+    description: > Status of every checked object, a list of dictionaries with
+                   kind, name, namespace, ready and message keys
+    type: list
+    returned: always
+elapsed:
+    description: Seconds spent waiting for the objects, only with wait
+    type: float
+    returned: when objects were waited for
 '''
 
+# Accepted kinds and their aliases
+KINDS = {
+    'deployment': 'deployment',
+    'deploy': 'deployment',
+    'daemonset': 'daemonset',
+    'ds': 'daemonset',
+    'statefulset': 'statefulset',
+    'sts': 'statefulset',
+}
+
+# Names of the kinds in kubectl output
+KIND_NAMES = {
+    'deployment': 'Deployment',
+    'daemonset': 'DaemonSet',
+    'statefulset': 'StatefulSet',
+}
 
-def call_kubectl(kind, name, namespace, result):
-    '''Calls kubectl, check the status preventing exceptions from propagation.
+
+def call_kubectl(namespace, objects, result):
+    '''Calls kubectl getting all objects of the namespace at once, check the
+    status preventing exceptions from propagation.
     Modifies results parameter in case of error.
-    Returns a tuple of bool status and output'''
+    Returns a tuple of bool status and list of fetched objects'''
 
     output = None
     try:
-        parameters = ['kubectl', 'get', '--output', 'json',
-                      str(kind),
-                      '-n', str(namespace),
-                      str(name)]
-
-        output = subprocess.check_output(parameters, stderr=subprocess.STDOUT) # nosec - B603
-        output = json.loads(output)
+        parameters = ['kubectl', 'get', '--output', 'json', '--ignore-not-found',
+                      '-n', str(namespace)]
+        parameters.extend(f"{obj['kind']}/{obj['name']}" for obj in objects)
 
         result['cmd'] = " ".join(parameters)
 
+        output = subprocess.check_output(parameters, stderr=subprocess.PIPE) # nosec - B603
+        # Nothing is printed when no object is found, a single object is not wrapped in a List
+        output = json.loads(output) if output.strip() else {'items': []}
+        items = output['items'] if output.get('kind', 'List') == 'List' else [output]
+
         result['failed'] = False
 
-        return (True, output)
+        return (True, items)
     except ValueError as ex:
         result['failed'] = True
         result['message'] = "ValueError: " + str(ex)
@@ -96,13 +170,143 @@ def call_kubectl(kind, name, namespace, result):
         result['message'] = "OSError: " + ex.strerror
     except subprocess.CalledProcessError as ex:
         result['stdout'] = ex.output
+        result['stderr'] = ex.stderr
         result['rc'] = ex.returncode
         result['failed'] = True
         result['message'] = "CalledProcessError: " + str(ex)
+        if ex.stderr:
+            result['message'] += " " + ex.stderr.decode(errors='replace').strip()
 
     return (False, output)
 
 
+def drain_stream(stream, chunks):
+    '''Reads the stream until its end and appends the read chunks to the list,
+    so the writing process never blocks on a full pipe'''
+
+    for chunk in iter(lambda: stream.read1(65536), b''):
+        chunks.append(chunk)
+
+
+def read_watch_events(process, key, events, stderr_thread):
+    '''Reads JSON watch events printed by kubectl and puts (key, event) to the
+    events queue. (key, None) is put when kubectl exits and its stderr is drained'''
+
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    buffer = ''
+
+    while True:
+        chunk = process.stdout.read1(65536)
+        buffer += text_decoder.decode(chunk, final=not chunk)
+        # Events are pretty printed JSON documents, not separated lines
+        while True:
+            buffer = buffer.lstrip()
+            try:
+                (event, end) = decoder.raw_decode(buffer)
+            except ValueError:
+                break
+            buffer = buffer[end:]
+            events.put((key, event))
+        if not chunk:
+            break
+
+    process.wait()
+    stderr_thread.join()
+    events.put((key, None))
+
+
+def watch_objects(namespace, kind, events):
+    '''Starts kubectl watching all objects of the kind in the namespace.
+    Events are put to the events queue by a reader thread, stderr is drained
+    to a list of chunks by another thread.
+    Returns a tuple of the command, the kubectl process and the stderr chunks'''
+
+    parameters = ['kubectl', 'get', '--watch', '--output', 'json', '--output-watch-events',
+                  '-n', namespace, kind]
+    process = subprocess.Popen(parameters, stdout=subprocess.PIPE, # pylint: disable=consider-using-with
+                               stderr=subprocess.PIPE) # nosec - B603
+    stderr = []
+    stderr_thread = threading.Thread(target=drain_stream, args=(process.stderr, stderr), daemon=True)
+    stderr_thread.start()
+    thread = threading.Thread(target=read_watch_events, args=(process, (namespace, kind), events, stderr_thread),
+                              daemon=True)
+    thread.start()
+
+    return (" ".join(parameters), process, stderr)
+
+
+def wait_for_objects(results, timeout, result):
+    '''Watches objects which are not ready yet until all of them are ready or
+    the timeout expires. A watch of the whole kind is used per namespace, so
+    objects created later are noticed too.
+    Updates ready and message of the per-object results'''
+
+    pending = {(obj['namespace'], obj['kind'], obj['name']): obj for obj in results if not obj['ready']}
+    events = queue.Queue()
+    processes = {}
+    stderrs = {}
+    commands = [result['cmd']] if result.get('cmd') else []
+    deadline = time.monotonic() + timeout
+
+    try:
+        for (namespace, kind, _) in pending:
+            if (namespace, kind) not in processes:
+                try:
+                    (command, processes[(namespace, kind)], stderrs[(namespace, kind)]) = \
+                        watch_objects(namespace, kind, events)
+                    commands.append(command)
+                except OSError as ex:
+                    result['rc'] = ex.errno
+                    result['message'] = "OSError: " + ex.strerror
+                    for obj in pending.values():
+                        obj['message'] = result['message']
+                    return
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                ((namespace, kind), event) = events.get(timeout=remaining)
+            except queue.Empty:
+                break
+
+            if event is None:
+                # kubectl exited, objects it watched cannot become ready anymore
+                process = processes[(namespace, kind)]
+                stderr = b''.join(stderrs[(namespace, kind)]).decode(errors='replace').strip()
+                result['rc'] = process.returncode
+                for key in [key for key in pending if key[:2] == (namespace, kind)]:
+                    pending.pop(key)['message'] = f"Watch ended with return code {process.returncode} {stderr}"
+                continue
+
+            item = event.get('object') or {}
+            key = (namespace, kind, item.get('metadata', {}).get('name'))
+            if key not in pending:
+                continue
+
+            if event.get('type') == 'DELETED':
+                pending[key]['message'] = f"{KIND_NAMES[kind]} {key[2]} was deleted"
+                continue
+
+            item.setdefault('kind', KIND_NAMES[kind])
+            (ready, message) = analyze_kubectl_output(item)
+            pending[key]['ready'] = ready
+            pending[key]['message'] = message
+            if ready:
+                del pending[key]
+
+        for obj in pending.values():
+            obj['message'] += f" - timed out after {timeout} s"
+    finally:
+        result['cmd'] = "; ".join(commands)
+        for process in processes.values():
+            if process.poll() is None:
+                process.terminate()
+            process.wait()
+
+
 def check_daemonset(output):
     '''check if daemonset is running correctly'''
 
@@ -188,13 +392,82 @@ def analyze_kubectl_output(output):
     return mapping[kind](output)
 
 
+def get_objects(params):
+    '''Returns list of objects to check with their kind, name and namespace,
+    raises ValueError if any of them is incomplete or has a bad kind'''
+
+    entries = params['objects'] if params['objects'] is not None else [{'name': params['name']}]
+    objects = []
+
+    for entry in entries:
+        obj = {'name': entry} if isinstance(entry, str) else dict(entry)
+        obj.setdefault('kind', params['kind'])
+        obj.setdefault('namespace', params['namespace'])
+
+        missing = [key for key in ('kind', 'name', 'namespace') if not obj.get(key)]
+        if missing:
+            raise ValueError(f"Error: {', '.join(missing)} missing for object {entry}")
+
+        kind = KINDS.get(str(obj['kind']).lower())
+        if kind is None:
+            raise ValueError(f"Error: bad kind {obj['kind']}, it should be one of: {', '.join(KINDS)}")
+
+        objects.append({'kind': kind, 'name': str(obj['name']), 'namespace': str(obj['namespace'])})
+
+    return objects
+
+
+def check_objects(objects, result):
+    '''Checks all objects with one kubectl call per namespace.
+    Returns list of per-object results in order of the objects'''
+
+    namespaces = {}
+    for obj in objects:
+        namespaces.setdefault(obj['namespace'], []).append(obj)
+
+    statuses = {}
+    commands = []
+    errors = []
+
+    for namespace, namespace_objects in namespaces.items():
+        call_result = {}
+        (call_status, items) = call_kubectl(namespace, namespace_objects, call_result)
+        commands.append(call_result['cmd'])
+
+        if not call_status:
+            errors.append(call_result)
+            for obj in namespace_objects:
+                statuses[id(obj)] = (False, call_result['message'])
+            continue
+
+        fetched = {(item.get('kind'), item.get('metadata', {}).get('name')): item for item in items}
+        for obj in namespace_objects:
+            item = fetched.get((KIND_NAMES[obj['kind']], obj['name']))
+            if item is None:
+                statuses[id(obj)] = (False, f"{KIND_NAMES[obj['kind']]} {obj['name']} not found in namespace "
+                                            f"{namespace}")
+            else:
+                statuses[id(obj)] = analyze_kubectl_output(item)
+
+    result['cmd'] = "; ".join(commands)
+    for error in errors:
+        for key in ('rc', 'stdout', 'stderr'):
+            if key in error:
+                result[key] = error[key]
+
+    return [dict(obj, ready=statuses[id(obj)][0], message=statuses[id(obj)][1]) for obj in objects]
+
+
 def run_module():
     '''Module run function'''
 
     arguments = dict(
-        kind=dict(type='str', required=True),
-        name=dict(type='str', required=True),
-        namespace=dict(type='str', required=True),
+        kind=dict(type='str', required=False),
+        name=dict(type='str', required=False),
+        namespace=dict(type='str', required=False),
+        objects=dict(type='list', elements='raw', required=False),
+        wait=dict(type='bool', required=False, default=False),
+        timeout=dict(type='int', required=False, default=300),
     )
 
     result = dict(
@@ -204,36 +477,42 @@ def run_module():
 
     module = AnsibleModule(
         argument_spec=arguments,
+        required_one_of=[['name', 'objects']],
+        mutually_exclusive=[['name', 'objects']],
         supports_check_mode=True
     )
 
-    result['kind'] = kind = module.params['kind']
-    result['name'] = name = module.params['name']
-    result['namespace'] = namespace = module.params['namespace']
-
-    kinds = ['deployment', 'deploy', 'daemonset', 'ds', 'statefulset', 'sts']
-
-    if kind not in kinds:
-        message = "Error: bad kind {}, it should be one of: {}"
-        message = message.format(kind, ", ".join(kinds))
+    result['kind'] = module.params['kind']
+    result['name'] = module.params['name']
+    result['namespace'] = module.params['namespace']
 
-        module.fail_json(msg=message, **result)
+    try:
+        objects = get_objects(module.params)
+    except ValueError as ex:
+        module.fail_json(msg=str(ex), **result)
 
-    (call_status, kubectl_output) = call_kubectl(kind, name, namespace, result)
+    result['results'] = results = check_objects(objects, result)
 
-    if call_status:
-        (analyze_status, message) = analyze_kubectl_output(kubectl_output)
+    if module.params['wait'] and not all(obj['ready'] for obj in results):
+        start = time.monotonic()
+        wait_for_objects(results, module.params['timeout'], result)
+        result['elapsed'] = round(time.monotonic() - start, 1)
 
-        result['message'] = message
+    not_ready = [obj for obj in results if not obj['ready']]
 
-        if analyze_status:
-            module.exit_json(**result)
-        else:
-            result['failed'] = True
-            module.fail_json(msg=message, **result)
+    if module.params['objects'] is None:
+        result['message'] = results[0]['message']
+    elif not_ready:
+        result['message'] = "; ".join(f"{obj['kind']} {obj['namespace']}/{obj['name']}: {obj['message']}"
+                                      for obj in not_ready)
     else:
+        result['message'] = f"All {len(results)} objects seem to be running normally"
+
+    if not_ready:
         result['failed'] = True
         module.fail_json(msg=result['message'], **result)
+    else:
+        module.exit_json(**result)
 
 
 def main():
@@ -0,0 +1,203 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+""" callback plugin checkpointing completed plays and roles of a deployment """
+
+import json
+import os
+import tempfile
+
+from ansible.plugins.callback import CallbackBase
+
+SET_FACT_ACTIONS = ('set_fact', 'ansible.builtin.set_fact', 'ansible.legacy.set_fact')
+
+DOCUMENTATION = '''
+    name: deployment_checkpoint
+    type: aggregate
+    short_description: records completed plays and roles so a failed deployment can be resumed
+    description:
+      - Writes JSON checkpoint with ordered role segments of the playbook run, names of their tasks,
+        hosts that completed them and hosts that failed in them.
+      - Facts set by set_fact are recorded per host too. The run resumed with --start-at-task skips the tasks
+        which set them, e.g. pre_tasks of the first play, so the recorded facts are restored when it starts.
+    requirements:
+      - enable in configuration
+    options:
+      checkpoint_file:
+        description: Path of the JSON checkpoint file, no checkpoint is written if it is not set.
+        env:
+          - name: DEPLOYMENT_CHECKPOINT_FILE
+        ini:
+          - section: callback_deployment_checkpoint
+            key: checkpoint_file
+      fingerprint:
+        description: Fingerprint of the deployment inputs stored in the checkpoint to detect stale checkpoints.
+        env:
+          - name: DEPLOYMENT_CHECKPOINT_FINGERPRINT
+        ini:
+          - section: callback_deployment_checkpoint
+            key: fingerprint
+      resume:
+        description:
+          - Set when the run is resumed with --start-at-task. Completed segments and recorded facts of the existing
+            checkpoint of the same playbook and fingerprint are kept, segments of this run are appended to them.
+        type: bool
+        default: false
+        env:
+          - name: DEPLOYMENT_CHECKPOINT_RESUME
+        ini:
+          - section: callback_deployment_checkpoint
+            key: resume
+'''
+
+
+class CallbackModule(CallbackBase):
+    """Deployment checkpoint callback"""
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'deployment_checkpoint'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, display=None):
+        super(CallbackModule, self).__init__(display=display)  # pylint: disable=super-with-arguments
+        self._checkpoint_file = None
+        self._checkpoint = None
+        self._play_index = -1
+        self._play = None
+        self._hosts = []
+        self._restore_facts = False
+
+    def set_options(self, task_keys=None, var_options=None, direct=None):
+        """Reads the checkpoint file path"""
+        super(CallbackModule, self).set_options(task_keys=task_keys, var_options=var_options,  # pylint: disable=super-with-arguments
+                                                direct=direct)
+        self._checkpoint_file = self.get_option('checkpoint_file')
+
+    def v2_playbook_on_start(self, playbook):
+        """Starts a new checkpoint, or continues the existing one when the run is resumed"""
+        if not self._checkpoint_file:
+            return
+        self._checkpoint = {
+            'playbook': os.path.basename(playbook._file_name),  # pylint: disable=protected-access
+            'fingerprint': self.get_option('fingerprint'),
+            'finished': False,
+            'segments': [],
+            'facts': {},
+        }
+        if self.get_option('resume'):
+            self._load_resumed_checkpoint()
+        self._write()
+
+    def _load_resumed_checkpoint(self):
+        """Takes over segments of the existing checkpoint of the same playbook and fingerprint up to the first
+        incomplete one and its recorded facts. The resumed run starts in that segment, so its failures are
+        cleared and tasks of the run are appended to it, keeping names of the tasks skipped by --start-at-task."""
+        try:
+            with open(self._checkpoint_file, 'r', encoding='utf-8') as checkpoint_file:
+                checkpoint = json.load(checkpoint_file)
+        except (OSError, ValueError):
+            return
+        if not isinstance(checkpoint, dict) or any(checkpoint.get(key) != self._checkpoint[key]
+                                                   for key in ('playbook', 'fingerprint')):
+            return
+
+        for segment in checkpoint.get('segments', []):
+            self._checkpoint['segments'].append(segment)
+            if not segment.get('completed'):
+                segment['failed_hosts'] = []
+                break
+        self._checkpoint['facts'] = checkpoint.get('facts', {})
+        self._restore_facts = True
+
+    def v2_playbook_on_play_start(self, play):
+        """Remembers the play and its hosts, restores recorded facts at the start of the resumed run"""
+        self._play_index += 1
+        self._play = play.get_name()
+        variable_manager = play.get_variable_manager()
+        inventory = variable_manager._inventory if variable_manager else None  # pylint: disable=protected-access
+        self._hosts = [host.name for host in inventory.get_hosts(play.hosts)] if inventory else []
+
+        if self._restore_facts and variable_manager:
+            # Facts set by set_fact are kept by the variable manager for the whole run, like in the original run
+            for host, facts in self._checkpoint['facts'].items():
+                variable_manager.set_nonpersistent_facts(host, facts)
+            self._restore_facts = False
+
+    def _current_segment(self):
+        if self._checkpoint and self._checkpoint['segments']:
+            return self._checkpoint['segments'][-1]
+        return None
+
+    def _complete_current_segment(self):
+        segment = self._current_segment()
+        if segment is not None and not segment['failed_hosts']:
+            segment['completed'] = True
+            segment['completed_hosts'] = list(segment['hosts'])
+
+    def v2_playbook_on_task_start(self, task, is_conditional):  # pylint: disable=unused-argument
+        """Records the task in the segment of its role, starting a new segment when the role changes"""
+        if self._checkpoint is None:
+            return
+
+        role = task._role.get_name() if task._role else None  # pylint: disable=protected-access
+        segment = self._current_segment()
+        if segment is None or segment['play_index'] != self._play_index or segment['role'] != role:
+            self._complete_current_segment()
+            segment = {
+                'play_index': self._play_index,
+                'play': self._play,
+                'role': role,
+                'hosts': self._hosts,
+                'tasks': [],
+                'completed': False,
+                'completed_hosts': [],
+                'failed_hosts': [],
+            }
+            self._checkpoint['segments'].append(segment)
+            segment['tasks'].append(task.get_name())
+            self._write()
+        else:
+            segment['tasks'].append(task.get_name())
+
+    def _record_failure(self, result):
+        segment = self._current_segment()
+        if segment is None:
+            return
+        host = result._host.get_name()  # pylint: disable=protected-access
+        if host not in segment['failed_hosts']:
+            segment['failed_hosts'].append(host)
+        self._write()
+
+    def v2_runner_on_ok(self, result):
+        """Records facts set by set_fact for the host, they are written with the next checkpoint update"""
+        if self._checkpoint is None or result._task.action not in SET_FACT_ACTIONS:  # pylint: disable=protected-access
+            return
+        facts = result._result.get('ansible_facts')  # pylint: disable=protected-access
+        if facts and not result._task.delegate_facts:  # pylint: disable=protected-access
+            host = result._host.get_name()  # pylint: disable=protected-access
+            self._checkpoint['facts'].setdefault(host, {}).update(facts)
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        """Records the host failed in the current segment"""
+        if not ignore_errors:
+            self._record_failure(result)
+
+    def v2_runner_on_unreachable(self, result):
+        """Records the unreachable host as failed in the current segment"""
+        self._record_failure(result)
+
+    def v2_playbook_on_stats(self, stats):
+        """Marks the checkpoint finished if no host failed"""
+        if self._checkpoint is None:
+            return
+        self._checkpoint['finished'] = not stats.failures and not stats.dark
+        if self._checkpoint['finished']:
+            self._complete_current_segment()
+        self._write()
+
+    def _write(self):
+        checkpoint_dir = os.path.dirname(os.path.abspath(self._checkpoint_file))
+        with tempfile.NamedTemporaryFile('w', dir=checkpoint_dir, prefix='.checkpoint.', encoding='utf-8',
+                                         delete=False) as tmp_file:
+            json.dump(self._checkpoint, tmp_file, indent=2)
+        os.replace(tmp_file.name, self._checkpoint_file)
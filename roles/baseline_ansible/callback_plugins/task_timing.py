@@ -0,0 +1,127 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+""" callback plugin writing per task and host timing records """
+
+import json
+import os
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+DOCUMENTATION = '''
+    name: task_timing
+    type: aggregate
+    short_description: writes task timing records in JSON lines format
+    description:
+      - Writes one JSON record per task and host with start, end, duration, changed and failed fields.
+      - Records are tagged with the configured cluster name or the cluster_name variable of the inventory.
+    requirements:
+      - enable in configuration
+    options:
+      output_file:
+        description: Path of the JSON lines file, no records are written if it is not set.
+        env:
+          - name: TASK_TIMING_OUTPUT_FILE
+        ini:
+          - section: callback_task_timing
+            key: output_file
+      cluster_name:
+        description: Cluster name recorded in the records, the cluster_name inventory variable is used if not set.
+        env:
+          - name: TASK_TIMING_CLUSTER_NAME
+        ini:
+          - section: callback_task_timing
+            key: cluster_name
+'''
+
+
+class CallbackModule(CallbackBase):
+    """Task timing callback"""
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = 'aggregate'
+    CALLBACK_NAME = 'task_timing'
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, display=None):
+        super(CallbackModule, self).__init__(display=display)  # pylint: disable=super-with-arguments
+        self._output = None
+        self._cluster_name = None
+        self._playbook = None
+        self._play = None
+        self._started = {}
+
+    def set_options(self, task_keys=None, var_options=None, direct=None):
+        """Opens the output file if it is configured and reads the cluster name"""
+        super(CallbackModule, self).set_options(task_keys=task_keys, var_options=var_options,  # pylint: disable=super-with-arguments
+                                                direct=direct)
+        output_file = self.get_option('output_file')
+        if output_file:
+            self._output = open(output_file, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+        self._cluster_name = self.get_option('cluster_name') or None
+
+    def v2_playbook_on_start(self, playbook):
+        """Remembers name of the playbook file"""
+        self._playbook = os.path.basename(playbook._file_name)  # pylint: disable=protected-access
+
+    def v2_playbook_on_play_start(self, play):
+        """Remembers name of the play and cluster name of the inventory"""
+        self._play = play.get_name()
+        if self._cluster_name is None:
+            inventory = play.get_variable_manager()._inventory  # pylint: disable=protected-access
+            if inventory is not None and 'all' in inventory.groups:
+                self._cluster_name = inventory.groups['all'].get_vars().get('cluster_name')
+
+    def v2_runner_on_start(self, host, task):
+        """Records start time of the task on the host"""
+        self._started[(host.get_name(), task._uuid)] = time.time()  # pylint: disable=protected-access
+
+    def _write_record(self, result, status):
+        if self._output is None:
+            return
+
+        task = result._task  # pylint: disable=protected-access
+        host = result._host.get_name()  # pylint: disable=protected-access
+        end = time.time()
+        start = self._started.pop((host, task._uuid), end)  # pylint: disable=protected-access
+        role = task._role.get_name() if task._role else None  # pylint: disable=protected-access
+
+        record = {
+            'cluster_name': self._cluster_name,
+            'playbook': self._playbook,
+            'play': self._play,
+            'role': role,
+            'task': task.get_name(),
+            'action': task.action,
+            'host': host,
+            'start': start,
+            'end': end,
+            'duration': end - start,
+            'status': status,
+            'changed': bool(result._result.get('changed', False)),  # pylint: disable=protected-access
+            'failed': status in ('failed', 'unreachable'),
+        }
+        self._output.write(json.dumps(record) + '\n')
+        self._output.flush()
+
+    def v2_runner_on_ok(self, result):
+        """Writes record of the successful task"""
+        self._write_record(result, 'ok')
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        """Writes record of the failed task"""
+        self._write_record(result, 'ignored' if ignore_errors else 'failed')
+
+    def v2_runner_on_skipped(self, result):
+        """Writes record of the skipped task"""
+        self._write_record(result, 'skipped')
+
+    def v2_runner_on_unreachable(self, result):
+        """Writes record of the task on the unreachable host"""
+        self._write_record(result, 'unreachable')
+
+    def v2_playbook_on_stats(self, stats):  # pylint: disable=unused-argument
+        """Closes the output file at the end of the playbook run"""
+        if self._output is not None:
+            self._output.close()
+            self._output = None
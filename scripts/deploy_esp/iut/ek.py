@@ -4,16 +4,22 @@
 """Provides experience-kit copying utilites"""
 
 import argparse
+import hashlib
 import logging
 import os
 import shutil
 import subprocess # nosec - B404
-from typing import Optional
+from typing import List, Optional
 
 import seo.git
 
 import iut.error
 
+# Layout of the collections cache consumed by the experience kit deploy.py script
+COLLECTIONS_CACHE_DIR = "collections_cache"
+COLLECTIONS_REQUIREMENTS_FILE = "requirements.yml"
+COLLECTIONS_SOURCE_DIGEST_FILE = "source_requirements.sha256"
+
 
 def copy_experience_kits(platform_cfg: dict, cli_args: argparse.Namespace) -> Optional[str]:
     """Copies or clones experience kits defined in platform config into output directory.
@@ -135,3 +141,50 @@ def get_copy_filter(ekpath: str, output_path: str):
             to_ignore.extend([f for f in names if os.path.abspath(os.path.join(path, f)) == i])
         return set(to_ignore)
     return _ignore
+
+
+def get_copied_experience_kits(output_path: str) -> List[str]:
+    """Returns paths of experience kits copied or cloned into the output directory by copy_experience_kits."""
+    outdir = os.path.join(os.path.abspath(output_path), "experience-kits")
+    if not os.path.isdir(outdir):
+        return []
+    return sorted(entry.path for entry in os.scandir(outdir) if entry.is_dir())
+
+
+def download_ansible_collections(ek_paths: List[str]):
+    """Downloads ansible collection tarballs required by experience kits for the offline deployment.
+
+    The tarballs are stored in the collections cache directory of every kit having a requirements file, so the
+    deploy.py script can install collections without access to Ansible Galaxy.
+
+    Args:
+        ek_paths: paths of experience kits copied to the installation package.
+    """
+    for ek_path in ek_paths:
+        requirements_path = os.path.join(ek_path, COLLECTIONS_REQUIREMENTS_FILE)
+        if not os.path.isfile(requirements_path):
+            logging.debug("No ansible collections requirements in '%s'", ek_path)
+            continue
+
+        cache_path = os.path.join(ek_path, COLLECTIONS_CACHE_DIR)
+        cmd = ["ansible-galaxy", "collection", "download", "-r", requirements_path, "-p", cache_path]
+        try:
+            subprocess.run(cmd, # nosec - B603, B607 (subprocess call)
+                           stdout=subprocess.PIPE,
+                           stderr=subprocess.STDOUT,
+                           encoding="utf-8",
+                           check=True)
+        except (OSError, subprocess.CalledProcessError) as e:
+            output = getattr(e, "stdout", None) or e
+            raise iut.error.IutError(
+                iut.error.Codes.RUNTIME_ERROR,
+                "IUT-X",
+                f"Failed to download ansible collections for '{ek_path}':\n"
+                f"    {output}") from e
+
+        with open(requirements_path, "rb") as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        with open(os.path.join(cache_path, COLLECTIONS_SOURCE_DIGEST_FILE), "w", encoding="utf-8") as f:
+            f.write(digest)
+
+        logging.info("Downloaded ansible collections for the '%s' experience kit", os.path.basename(ek_path))
@@ -52,3 +52,19 @@ class TestCopyExperienceKits:
 
         result = iut.ek.copy_experience_kits(platform_cfg, Namespace(output_path=str(tmp_path)))
         assert result is None
+
+
+class TestDownloadAnsibleCollections:
+    ''' Test download_ansible_collections function '''
+
+    def test_download_ansible_collections_no_requirements(self, tmp_path):
+        ''' Test if kits without the requirements file are skipped '''
+
+        ek_path = tmp_path / "experience-kits" / "dek"
+        ek_path.mkdir(parents=True)
+
+        ek_paths = iut.ek.get_copied_experience_kits(str(tmp_path))
+        assert ek_paths == [str(ek_path)]
+
+        iut.ek.download_ansible_collections(ek_paths)
+        assert not (ek_path / iut.ek.COLLECTIONS_CACHE_DIR).exists()
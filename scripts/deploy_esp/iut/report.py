@@ -0,0 +1,449 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+
+""" Fleet-wide report collection functions """
+
+import concurrent.futures
+import hashlib
+import io
+import json
+import logging
+import os
+import shutil
+import signal
+import subprocess # nosec - B404 (security implications considered)
+import tarfile
+import tempfile
+import threading
+import time
+
+import iut.error
+
+COLLECTOR_FILES = ("log_collector.py", "log_collector.json", "log_collector_archive.py", "log_collector_budget.py",
+                   "log_collector_journal.py", "log_collector_runner.py", "log_collector_state.py")
+INDEX_FILE_NAME = "index.json"
+STDERR_FILE_NAME = "collector_stderr.log"
+LAYOUT_FILE_NAME = "layout.json"
+BLOBS_DIR = "blobs"
+DEFAULT_JOBS = 8
+DEFAULT_NODE_TIMEOUT = 1800
+
+_SSH_OPTIONS = ["-o", "BatchMode=yes", "-o", "ConnectTimeout=10", "-o", "ServerAliveInterval=30"]
+
+# The collector and its configuration are sent as a tar stream to the standard input, the report archive is
+# streamed back from the standard output; nothing is left on the node
+_REMOTE_COMMAND = (
+    't="$(mktemp -d)" && trap \'rm -rf "$t"\' EXIT && cd "$t" && tar -xf - && '
+    'python3 log_collector.py -c log_collector.json --output-file - -l ERROR')
+
+
+def get_fleet_nodes(platform_cfg):
+    """ Return list of nodes of all clusters of the platform configuration
+
+        Every node is a dictionary with the 'cluster', 'name', 'address' and 'username' keys. Host links and hosts
+        without an address are skipped, hosts listed in multiple groups are returned once.
+    """
+
+    nodes = []
+    addresses = set()
+
+    for cluster in platform_cfg.get("clusters", []):
+        account = next((a for a in platform_cfg.get("accounts", []) if a["name"] == cluster.get("account")), {})
+
+        for group, hosts in cluster.get("hosts", {}).items():
+            for host in hosts:
+                if "address" not in host:
+                    logging.debug("Host '%s' in group '%s' from cluster '%s' has no address, skipping it",
+                                  host["name"], group, cluster["name"])
+                    continue
+
+                if host["address"] in addresses:
+                    continue
+
+                addresses.add(host["address"])
+                nodes.append({
+                    "cluster": cluster["name"],
+                    "name": host["name"],
+                    "address": host["address"],
+                    "username": account.get("username"),
+                })
+
+    return nodes
+
+
+def pack_collector(scripts_path):
+    """ Return tar archive with the collector script and its configuration sent to every node """
+
+    data = io.BytesIO()
+
+    with tarfile.open(fileobj=data, mode="w") as tar:
+        for file_name in COLLECTOR_FILES:
+            tar.add(os.path.join(scripts_path, file_name), arcname=file_name)
+
+    return data.getvalue()
+
+
+def get_node_dir(report_dir, node):
+    """ Return directory of the node report """
+    return os.path.join(report_dir, node["cluster"], node["name"])
+
+
+def get_ssh_command(node):
+    """ Return command running the collector on the node """
+    target = f"{node['username']}@{node['address']}" if node.get("username") else node["address"]
+    return ["ssh"] + _SSH_OPTIONS + [target, _REMOTE_COMMAND]
+
+
+class BlobStore:
+    """ Content-addressed store of report files shared by all nodes of the fleet report
+
+        Every distinct file content is stored once as <root>/<first two digits>/<sha256> and referenced by the layout
+        files of the nodes.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def get_path(self, digest):
+        """ Return path of the blob with the digest """
+        return os.path.join(self.root, digest[:2], digest)
+
+    def add(self, src):
+        """ Store contents of the file object
+
+            The contents are hashed while they are copied to a temporary file, which becomes the blob unless the
+            blob already exists.
+
+            Returns:
+                Tuple of the blob digest, its size and flag telling if the blob was not stored before
+        """
+
+        sha256 = hashlib.sha256()
+        size = 0
+
+        with tempfile.NamedTemporaryFile(dir=self.root, prefix=".blob.", delete=False) as dst:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                sha256.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+
+        digest = sha256.hexdigest()
+        path = self.get_path(digest)
+
+        if os.path.exists(path):
+            os.unlink(dst.name)
+            return digest, size, False
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(dst.name, path)
+        return digest, size, True
+
+
+def write_layout(node_dir, layout):
+    """ Write layout of the deduplicated node report, {path: {"sha256", "size"}} of its files """
+
+    with open(os.path.join(node_dir, LAYOUT_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump({"files": layout}, f, indent=4, sort_keys=True)
+
+
+def read_layout(node_dir):
+    """ Return layout of the deduplicated node report, None if the node report is not deduplicated """
+
+    try:
+        with open(os.path.join(node_dir, LAYOUT_FILE_NAME), encoding="utf-8") as f:
+            return json.load(f)["files"]
+    except FileNotFoundError:
+        return None
+
+
+def _get_member_path(name):
+    """ Return path of the archive member relative to the report root directory, None if it's unsafe """
+
+    parts = name.replace("\\", "/").split("/")[1:]
+    path = os.path.normpath(os.path.join(*parts)) if parts else ""
+
+    if not path or path == "." or os.path.isabs(path) or path.split(os.sep)[0] == "..":
+        return None
+
+    return path
+
+
+def extract_report(stream, dest_dir, store=None):
+    """ Extract the report archive read from the stream into the destination directory
+
+        The archive is extracted while it's being read, without staging it. The report root directory of the
+        archive is stripped; links, devices and members escaping the destination directory are skipped.
+
+        Parameters:
+            stream: File object of the report archive
+            dest_dir: Destination directory
+            store: BlobStore the files are stored in, only their layout file is written to the destination
+                directory then
+
+        Returns:
+            Tuple of the number of extracted files, their total size in bytes and the size of newly stored blobs
+    """
+
+    files = 0
+    size = 0
+    stored = 0
+    layout = {}
+
+    with tarfile.open(fileobj=stream, mode="r|*") as tar:
+        for member in tar:
+            path = _get_member_path(member.name)
+
+            if path is None:
+                continue
+
+            dest = os.path.join(dest_dir, path)
+
+            if member.isdir() and store is None:
+                os.makedirs(dest, exist_ok=True)
+            elif member.isfile() and store is not None:
+                with tar.extractfile(member) as src:
+                    digest, blob_size, new = store.add(src)
+                layout[path.replace(os.sep, "/")] = {"sha256": digest, "size": blob_size}
+                files += 1
+                size += blob_size
+                stored += blob_size if new else 0
+            elif member.isfile():
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                with tar.extractfile(member) as src, open(dest, "wb") as dst:
+                    shutil.copyfileobj(src, dst)
+                files += 1
+                size += member.size
+            elif not member.isdir():
+                logging.debug("Skipping report archive member '%s' of type %s", member.name, member.type)
+
+    if store is not None:
+        write_layout(dest_dir, layout)
+
+    return files, size, stored
+
+
+def _kill(process):
+    """ Kill the process group of the process, e.g. ssh and its proxy command """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+def _get_last_line(path):
+    """ Return the last non-empty line of the text file, an empty string if there is none """
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            lines = [line.strip() for line in f if line.strip()]
+    except OSError:
+        return ""
+    return lines[-1] if lines else ""
+
+
+def collect_node(node, payload, report_dir, timeout=DEFAULT_NODE_TIMEOUT, store=None):
+    """ Run the collector on the node and extract its report into the node report directory
+
+        Returns:
+            Dictionary with the node result: its status ('ok', 'failed' or 'timeout'), exit code, duration, number
+            and size of the collected files, size of the blobs the node added to the store, and error message of
+            a failure
+    """
+
+    node_dir = get_node_dir(report_dir, node)
+    os.makedirs(node_dir, exist_ok=True)
+    stderr_path = os.path.join(node_dir, STDERR_FILE_NAME)
+
+    result = dict(node, status="ok", exit_code=None, duration=0, files=0, bytes=0, stored_bytes=0, error=None)
+    read_error = None
+    timed_out = threading.Event()
+    start = time.monotonic()
+
+    logging.info("Collecting the report of '%s' node (%s) from '%s' cluster", node["name"], node["address"],
+                 node["cluster"])
+
+    cmd = get_ssh_command(node)
+
+    try:
+        with open(stderr_path, "wb") as stderr, \
+             subprocess.Popen(cmd, # nosec - B603 (the user is the system administrator - the input is trusted)
+                              stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=stderr,
+                              start_new_session=True) as process:
+            timer = threading.Timer(timeout, lambda: (timed_out.set(), _kill(process)))
+            timer.start()
+
+            try:
+                try:
+                    process.stdin.write(payload)
+                    process.stdin.close()
+                except BrokenPipeError:
+                    pass # ssh failed, its exit code and error output tell why
+
+                result["files"], result["bytes"], result["stored_bytes"] = extract_report(
+                    process.stdout, node_dir, store)
+            except (OSError, tarfile.TarError) as e:
+                read_error = str(e)
+                _kill(process)
+            finally:
+                result["exit_code"] = process.wait()
+                timer.cancel()
+    except OSError as e:
+        result.update(status="failed", duration=round(time.monotonic() - start, 3),
+                      error=f"Failed to run the collector: {e}")
+        return result
+
+    result["duration"] = round(time.monotonic() - start, 3)
+
+    if timed_out.is_set():
+        result["status"] = "timeout"
+        result["error"] = f"The collector did not finish within {timeout} seconds"
+    elif result["exit_code"] != 0:
+        result["status"] = "failed"
+        result["error"] = f"The collector exited with code {result['exit_code']}: {_get_last_line(stderr_path)}"
+    elif read_error is not None:
+        result["status"] = "failed"
+        result["error"] = f"Failed to read the report archive: {read_error}"
+
+    return result
+
+
+def write_index(report_dir, results, deduplicated=False):
+    """ Write index of the fleet report with results of all nodes """
+
+    index = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "blobs": BLOBS_DIR if deduplicated else None,
+        "nodes": [dict(result, path=os.path.relpath(get_node_dir(report_dir, result), report_dir))
+                  for result in results],
+    }
+
+    with open(os.path.join(report_dir, INDEX_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=4)
+
+
+def read_index(report_dir):
+    """ Return index of the fleet report """
+
+    try:
+        with open(os.path.join(report_dir, INDEX_FILE_NAME), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise iut.error.IutError(
+            iut.error.Codes.RUNTIME_ERROR,
+            "IUT-X",
+            f"Failed to read the fleet report index from {report_dir}:\n    {e}") from e
+
+
+def log_summary(results):
+    """ Log table with timing and status of every node """
+
+    lines = [f"{'CLUSTER':<20} {'NODE':<24} {'STATUS':<8} {'TIME [s]':>9} {'FILES':>6} {'SIZE [MiB]':>11}"]
+
+    for result in results:
+        lines.append(
+            f"{result['cluster']:<20} {result['name']:<24} {result['status']:<8} {result['duration']:>9.1f} "
+            f"{result['files']:>6} {result['bytes'] / 1024 / 1024:>11.1f}")
+
+    logging.info("Fleet report summary:\n    %s", "\n    ".join(lines))
+
+    for result in results:
+        if result["status"] != "ok":
+            logging.error("Report collection from '%s' node failed: %s", result["name"], result["error"])
+
+
+def log_dedup_summary(results):
+    """ Log size of the deduplicated fleet report compared to the size of all collected files """
+
+    total = sum(result["bytes"] for result in results)
+    stored = sum(result["stored_bytes"] for result in results)
+
+    logging.info("Deduplicated fleet report: %.1f MiB of blobs stored for %.1f MiB of collected files (%.0f%%)",
+                 stored / 1024 / 1024, total / 1024 / 1024, 100 * stored / total if total else 100)
+
+
+def collect_fleet_report(nodes, scripts_path, report_dir, jobs=DEFAULT_JOBS, timeout=DEFAULT_NODE_TIMEOUT,
+                         dedup=False): # pylint: disable=too-many-arguments
+    """ Collect reports of all nodes concurrently, at most jobs at once, into the report directory
+
+        Reports of nodes are stored in <report_dir>/<cluster>/<node> directories indexed by the index.json file.
+        With dedup, files are stored once by their SHA-256 in <report_dir>/blobs and node directories hold only
+        layout files referencing them; expand_fleet_report restores the plain layout.
+        An error is raised after the index is written if collection failed on any node.
+    """
+
+    payload = pack_collector(scripts_path)
+    os.makedirs(report_dir, exist_ok=True)
+    store = BlobStore(os.path.join(report_dir, BLOBS_DIR)) if dedup else None
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        results = list(executor.map(lambda node: collect_node(node, payload, report_dir, timeout, store), nodes))
+
+    write_index(report_dir, results, dedup)
+    log_summary(results)
+
+    if dedup:
+        log_dedup_summary(results)
+
+    failed = [result["name"] for result in results if result["status"] != "ok"]
+
+    if failed:
+        raise iut.error.IutError(
+            iut.error.Codes.RUNTIME_ERROR,
+            "IUT-X",
+            f"Failed to collect the report from {len(failed)} of {len(results)} nodes: {', '.join(failed)}\n"
+            f"    See {os.path.join(report_dir, INDEX_FILE_NAME)} for details")
+
+    return results
+
+
+def expand_fleet_report(report_dir, dest_dir):
+    """ Expand the deduplicated fleet report into the plain directory layout
+
+        Files of every node are copied from the blobs to their paths in the node directory of the destination,
+        other files of the node directories (e.g. the collector error output) and the index are copied as they are.
+
+        Returns:
+            Number of the expanded files
+    """
+
+    index = read_index(report_dir)
+
+    if not index.get("blobs"):
+        raise iut.error.IutError(
+            iut.error.Codes.RUNTIME_ERROR,
+            "IUT-X",
+            f"The fleet report in {report_dir} is not deduplicated")
+
+    store = BlobStore(os.path.join(report_dir, index["blobs"]))
+    files = 0
+
+    for node in index["nodes"]:
+        node_dir = os.path.join(report_dir, node["path"])
+        dest_node_dir = os.path.join(dest_dir, node["path"])
+        os.makedirs(dest_node_dir, exist_ok=True)
+
+        for entry in os.listdir(node_dir) if os.path.isdir(node_dir) else []:
+            if entry != LAYOUT_FILE_NAME and os.path.isfile(os.path.join(node_dir, entry)):
+                shutil.copyfile(os.path.join(node_dir, entry), os.path.join(dest_node_dir, entry))
+
+        for path, blob in (read_layout(node_dir) or {}).items():
+            dest_path = _get_member_path(f"report/{path}")
+
+            if dest_path is None:
+                logging.warning("Skipping unsafe path '%s' in the layout of '%s' node", path, node["name"])
+                continue
+
+            dest = os.path.join(dest_node_dir, dest_path)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copyfile(store.get_path(blob["sha256"]), dest)
+            files += 1
+
+    index["blobs"] = None
+    with open(os.path.join(dest_dir, INDEX_FILE_NAME), "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=4)
+
+    logging.info("Expanded %d files of %d nodes into %s", files, len(index["nodes"]), dest_dir)
+    return files
@@ -0,0 +1,172 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+# pylint: disable=bad-option-value,useless-option-value # (no-self-use was removed in pylint 2.14)
+# pylint: disable=no-self-use # (pytest stylistic convention)
+
+""" Unittests for report.py file """
+
+import io
+import json
+import os
+import stat
+import tarfile
+import pytest
+import conftest
+import iut.error
+import iut.report
+
+
+def _platform_cfg():
+    return {
+        'accounts': [{'name': 'default', 'username': 'smartedge-open'}],
+        'clusters': [
+            {'name': 'c1', 'account': 'default', 'hosts': {
+                'controller_group': [{'name': 'n1', 'address': '10.0.0.1'}],
+                'edgenode_group': [{'name': 'n1'}, {'name': 'n2', 'address': '10.0.0.2'}]}},
+            {'name': 'c2', 'account': 'default', 'hosts': {
+                'controller_group': [{'name': 'n3', 'address': '10.0.0.3'}],
+                'edgenode_group': [{'name': 'n3_alias', 'address': '10.0.0.3'}, {'name': 'n4'}]}}]}
+
+
+def _report_archive(members):
+    data = io.BytesIO()
+    with tarfile.open(fileobj=data, mode='w:gz') as tar:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    data.seek(0)
+    return data
+
+
+def _fake_ssh(tmp_path, monkeypatch):
+    ''' Install ssh replacement running the remote command locally, failing for the 'bad' host '''
+    bin_path = tmp_path / 'bin'
+    bin_path.mkdir()
+    ssh_path = bin_path / 'ssh'
+    ssh_path.write_text(
+        '#!/bin/sh\n'
+        'for a; do host="$target"; target="$a"; done\n'
+        'case "$host" in *bad*) echo "Connection refused" >&2; exit 255;; esac\n'
+        'exec sh -c "$target"\n')
+    ssh_path.chmod(ssh_path.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+
+
+def _fake_collector(tmp_path):
+    ''' Create scripts directory with collector replacement writing a minimal report archive to the standard output '''
+    scripts = tmp_path / 'scripts'
+    scripts.mkdir()
+    for file_name in iut.report.COLLECTOR_FILES:
+        (scripts / file_name).write_text('{}' if file_name.endswith('.json') else '')
+    (scripts / 'log_collector.py').write_text(
+        'import io, sys, tarfile\n'
+        'with tarfile.open(fileobj=sys.stdout.buffer, mode="w|gz") as tar:\n'
+        '    info = tarfile.TarInfo("report/manifest.json")\n'
+        '    info.size = 2\n'
+        '    tar.addfile(info, io.BytesIO(b"{}"))\n')
+    return scripts
+
+
+class TestGetFleetNodes:
+    ''' Tests for get_fleet_nodes function '''
+
+    def test_links_and_duplicates_are_skipped(self):
+        ''' Test if every address is returned once, with the account user name '''
+
+        nodes = iut.report.get_fleet_nodes(_platform_cfg())
+
+        assert [(n['cluster'], n['name'], n['address']) for n in nodes] == [
+            ('c1', 'n1', '10.0.0.1'), ('c1', 'n2', '10.0.0.2'), ('c2', 'n3', '10.0.0.3')]
+        assert all(n['username'] == 'smartedge-open' for n in nodes)
+
+
+class TestExtractReport:
+    ''' Tests for extract_report function '''
+
+    def test_root_directory_is_stripped(self, tmp_path):
+        ''' Test if the report is extracted without its root directory '''
+
+        archive = _report_archive({'report/manifest.json': b'{}', 'report/os/df.log': b'df'})
+
+        assert iut.report.extract_report(archive, str(tmp_path)) == (2, 4, 0)
+        assert (tmp_path / 'os' / 'df.log').read_bytes() == b'df'
+        assert (tmp_path / 'manifest.json').exists()
+
+    def test_unsafe_members_are_skipped(self, tmp_path):
+        ''' Test if members escaping the destination directory are not extracted '''
+
+        archive = _report_archive({'report/../../escaped.log': b'x', 'report/os/../../../escaped.log': b'x',
+                                   'report/ok.log': b'x'})
+        dest = tmp_path / 'dest'
+        dest.mkdir()
+
+        assert iut.report.extract_report(archive, str(dest)) == (1, 1, 0)
+        assert not (tmp_path / 'escaped.log').exists()
+        assert (dest / 'ok.log').exists()
+
+
+class TestBlobStore:
+    ''' Tests for BlobStore class '''
+
+    def test_identical_contents_are_stored_once(self, tmp_path):
+        ''' Test if the blob is stored only by the first addition of the same contents '''
+
+        store = iut.report.BlobStore(str(tmp_path / 'blobs'))
+
+        digest, size, new = store.add(io.BytesIO(b'same'))
+        assert (size, new) == (4, True)
+        assert store.add(io.BytesIO(b'same')) == (digest, 4, False)
+        assert store.add(io.BytesIO(b'other'))[2]
+
+        with open(store.get_path(digest), 'rb') as f:
+            assert f.read() == b'same'
+        assert sorted(p.name for p in (tmp_path / 'blobs').rglob('*') if p.is_file()) == sorted(
+            [digest, store.add(io.BytesIO(b'other'))[0]])
+
+
+class TestCollectFleetReport:
+    ''' Tests for collect_fleet_report function '''
+
+    def test_reports_are_merged_and_indexed(self, tmp_path, monkeypatch):
+        ''' Test if reports of all nodes are collected and failures are recorded in the index '''
+
+        _fake_ssh(tmp_path, monkeypatch)
+        scripts = _fake_collector(tmp_path)
+
+        nodes = iut.report.get_fleet_nodes(_platform_cfg())
+        nodes.append({'cluster': 'c2', 'name': 'bad', 'address': conftest.random_ipv4() + 'bad',
+                      'username': None})
+        report_dir = tmp_path / 'fleet'
+
+        with pytest.raises(iut.error.IutError):
+            iut.report.collect_fleet_report(nodes, str(scripts), str(report_dir), jobs=2, timeout=60)
+
+        with open(report_dir / iut.report.INDEX_FILE_NAME, encoding='utf-8') as f:
+            index = json.load(f)
+
+        statuses = {node['name']: node['status'] for node in index['nodes']}
+        assert statuses == {'n1': 'ok', 'n2': 'ok', 'n3': 'ok', 'bad': 'failed'}
+        assert (report_dir / 'c1' / 'n2' / 'manifest.json').read_text() == '{}'
+        assert 'Connection refused' in index['nodes'][-1]['error']
+
+    def test_deduplicated_report_is_expanded(self, tmp_path, monkeypatch):
+        ''' Test if identical files of all nodes are stored once and expanded into the plain layout '''
+
+        _fake_ssh(tmp_path, monkeypatch)
+        scripts = _fake_collector(tmp_path)
+        report_dir = tmp_path / 'fleet'
+
+        results = iut.report.collect_fleet_report(
+            iut.report.get_fleet_nodes(_platform_cfg()), str(scripts), str(report_dir), jobs=3, timeout=60,
+            dedup=True)
+
+        assert [(r['bytes'], r['stored_bytes']) for r in results].count((2, 0)) == 2
+        assert not (report_dir / 'c1' / 'n2' / 'manifest.json').exists()
+        assert len([p for p in (report_dir / iut.report.BLOBS_DIR).rglob('*') if p.is_file()]) == 1
+
+        expanded = tmp_path / 'expanded'
+        assert iut.report.expand_fleet_report(str(report_dir), str(expanded)) == 3
+        assert (expanded / 'c1' / 'n2' / 'manifest.json').read_text() == '{}'
+        assert (expanded / 'c2' / 'n3' / iut.report.STDERR_FILE_NAME).exists()
+        assert not (expanded / 'c2' / 'n3' / iut.report.LAYOUT_FILE_NAME).exists()
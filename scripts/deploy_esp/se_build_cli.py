@@ -170,6 +170,7 @@ def main(args, toolchain_cfg):
 
     build_toolchain_path = iut.ek.copy_experience_kits(platform_cfg, args)
     logging.info("Determined new toolchain path %s", build_toolchain_path)
+    iut.ek.download_ansible_collections(iut.ek.get_copied_experience_kits(args.output_path))
     copy_deployment_toolchain_wrappers(toolchain_cfg, args, build_toolchain_path)
 
     # Ensure that the ownership of the entire content of the output directory is consistent:
@@ -10,11 +10,18 @@ import copy
 import json
 import os
 import subprocess # nosec - B404 (security implications considered)
+import time
 
 import iut.config
 import iut.error
+import iut.report
 import iut.run
 
+REPORT_DIR = "report_out"
+FLEET_DIR = "fleet"
+EXPANDED_SUFFIX = "_expanded"
+STATE_FILE_NAME = "report_state.json"
+
 
 def parse_args(package_root, toolchain_cfg):
     """ Parse script arguments """
@@ -26,6 +33,47 @@ def parse_args(package_root, toolchain_cfg):
 
     iut.config.create_common_argument_group(p, package_root)
 
+    g = p.add_argument_group("report arguments")
+
+    g.add_argument(
+        "--incremental", action="store_true", dest="incremental_flag",
+        help=f"""
+            collect only the logs that changed since the previous incremental report; every incremental report is
+            written to a new {REPORT_DIR}_<TIMESTAMP> directory and its manifest references the previous report
+            """)
+
+    g.add_argument(
+        "--fleet", action="store_true", dest="fleet_flag",
+        help=f"""
+            also collect the report of every host of all clusters of the platform configuration over SSH; reports of
+            the hosts are stored in the {FLEET_DIR}/<CLUSTER>/<HOST> subdirectories of the report along with the
+            {iut.report.INDEX_FILE_NAME} file summarizing the collection status and time of every host
+            """)
+
+    g.add_argument(
+        "--fleet-jobs", action="store", dest="fleet_jobs", metavar="N", type=int, default=iut.report.DEFAULT_JOBS,
+        help="maximum number of hosts the report is collected from at the same time (default: %(default)s)")
+
+    g.add_argument(
+        "--fleet-timeout", action="store", dest="fleet_timeout", metavar="SECONDS", type=float,
+        default=iut.report.DEFAULT_NODE_TIMEOUT,
+        help="time after which the report collection from a host is stopped (default: %(default)s)")
+
+    g.add_argument(
+        "--fleet-dedup", action="store_true", dest="fleet_dedup_flag",
+        help=f"""
+            store every distinct file of the host reports once, by its SHA-256, in the {iut.report.BLOBS_DIR}
+            subdirectory of the {FLEET_DIR} report; the host directories hold only the
+            {iut.report.LAYOUT_FILE_NAME} files referencing them
+            """)
+
+    g.add_argument(
+        "--expand-fleet", action="store", dest="expand_fleet", metavar="FLEET_DIR",
+        help=f"""
+            expand the deduplicated fleet report into the plain directory layout in the FLEET_DIR{EXPANDED_SUFFIX}
+            directory, no report is collected
+            """)
+
     args = p.parse_args()
     args.prog = p.prog
 
@@ -57,9 +105,14 @@ def update_paths(collector_cfg, toolchain_cfg):
     return cfg
 
 
-def main(args, toolchain_cfg): # pylint: disable=unused-argument
+def main(args, toolchain_cfg):
     """ Script entry function """
 
+    if args.expand_fleet:
+        fleet_dir = os.path.normpath(args.expand_fleet)
+        iut.report.expand_fleet_report(fleet_dir, f"{fleet_dir}{EXPANDED_SUFFIX}")
+        return iut.error.Codes.NO_ERROR
+
     config_path = os.path.join(toolchain_cfg["path"]["full"]["repo"], toolchain_cfg["path"]["part"]["report_config"])
 
     with open(config_path) as f:
@@ -67,12 +120,25 @@ def main(args, toolchain_cfg): # pylint: disable=unused-argument
 
     conf = update_paths(conf, toolchain_cfg)
 
-    collector_cmd_path = os.path.join(
-        toolchain_cfg["path"]["full"]["repo"], toolchain_cfg["path"]["part"]["scripts"], "log_collector.py")
+    scripts_path = os.path.join(toolchain_cfg["path"]["full"]["repo"], toolchain_cfg["path"]["part"]["scripts"])
+    collector_cmd_path = os.path.join(scripts_path, "log_collector.py")
+
+    report_dir = REPORT_DIR
+    collector_cmd = [collector_cmd_path, "--stdin", "--output-dir", report_dir, "--force"]
+    if args.incremental_flag:
+        report_dir = f"{REPORT_DIR}_{time.strftime('%Y%m%d_%H%M%S')}"
+        state_path = os.path.join(toolchain_cfg["path"]["full"]["logs"], STATE_FILE_NAME)
+        collector_cmd = [
+            collector_cmd_path, "--stdin", "--output-dir", report_dir, "--incremental", "--state-file", state_path]
 
     subprocess.run( # nosec - B603 (the user is the system administrator - the input is trusted)
-        [collector_cmd_path, "--stdin", "--output-dir", "report_out", "--force"],
-        input=json.dumps(conf).encode(), check=True)
+        collector_cmd, input=json.dumps(conf).encode(), check=True)
+
+    if args.fleet_flag:
+        platform_cfg = iut.config.load_platform_cfg(args, toolchain_cfg)
+        iut.report.collect_fleet_report(
+            iut.report.get_fleet_nodes(platform_cfg), scripts_path, os.path.join(report_dir, FLEET_DIR),
+            args.fleet_jobs, args.fleet_timeout, args.fleet_dedup_flag)
 
     return iut.error.Codes.NO_ERROR
 
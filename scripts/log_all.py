@@ -15,10 +15,23 @@ import os
 import sys
 import subprocess # nosec - B404
 import tarfile
+import tempfile
+import threading
 import json
 import re
+import io
 from datetime import datetime
 
+SNAPSHOT_TREE = "tree"
+SNAPSHOT_BUNDLE = "bundle"
+BUNDLE_NAME = "repo.bundle"
+DIFF_NAME = "working_tree.diff"
+COLLECTOR_FILES = ["scripts/log_collector", "scripts/log_collector.py", "scripts/log_collector.json",
+                   "scripts/log_collector_archive.py", "scripts/log_collector_budget.py",
+                   "scripts/log_collector_journal.py", "scripts/log_collector_runner.py",
+                   "scripts/log_collector_state.py"]
+
+
 def read_cfg(path):
     """
     Function reads json configuration file.
@@ -36,91 +49,295 @@ def read_cfg(path):
             return json.load(config_file)
     return {}
 
-def tar_filter_with_exclude(exclude_paths):
+
+def compile_exclude_paths(exclude_paths):
     """
-    Filters out files which paths match any RE from exclude_paths list
+    Function compiles the excluded paths into one regular expression.
 
     Parameters:
-    exclude_paths (list(RE)): List of regular expresions with excluded paths
+    exclude_paths (list(string)): List of regular expressions with excluded paths
 
-    Returs:
-    function: Function performing TarInfo base filtering depending on exclude_paths size
+    Returns:
+    re.Pattern: Pattern searched in paths relative to the experience kit directory, None if nothing is excluded.
     """
-    def tar_filter_none(tar_info):
-        return tar_info
+    if not exclude_paths:
+        return None
+    return re.compile("|".join(f"(?:{exclude_path})" for exclude_path in exclude_paths))
 
-    def tar_filter(tar_info):
-        dir_sep_pos = tar_info.name.find(os.sep)
-        if dir_sep_pos > 0:
-            file_path_without_base = tar_info.name[dir_sep_pos + 1:]
 
-            for exclude_path in exclude_paths:
-                if exclude_path.search(file_path_without_base):
-                    print('Excluding: ', tar_info.name)
-                    return None
-        return tar_info
+def run_git(args, stdout=subprocess.PIPE):
+    """
+    Function runs git command in the current directory.
 
-    if len(exclude_paths) > 0:
-        return tar_filter
-    return tar_filter_none
+    Parameters:
+    args (list(string)): Git command arguments.
+    stdout (file): Output of the command, captured by default.
 
+    Returns:
+    bytes: Captured output of the command, None if it has failed.
+    """
+    try:
+        result = subprocess.run(["git", *args], # nosec - B603, B607
+                                stdout=stdout,
+                                stderr=subprocess.DEVNULL,
+                                check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout if stdout == subprocess.PIPE else b""
 
-def collect_logs(user, host):
+
+def list_git_files():
     """
-    Function creates archive file with Smart Edge experience kit information and
-    send it to controller root directory.
+    Function lists files of the git working tree: tracked ones and untracked ones which are not ignored.
+
+    Returns:
+    tuple(list(string), list(string)): Tracked and untracked paths, None if the directory is not a git
+                                       working tree.
+    """
+    tracked = run_git(["ls-files", "-z", "--cached"])
+    untracked = run_git(["ls-files", "-z", "--others", "--exclude-standard"])
+    if tracked is None or untracked is None:
+        return None
+
+    def split(output):
+        return [path for path in output.decode("utf-8", "surrogateescape").split("\0") if path]
+
+    return split(tracked), split(untracked)
+
+
+def walk_files(exclude):
+    """
+    Function lists files of the current directory, skipping excluded directories without entering them.
+
+    Parameters:
+    exclude (re.Pattern): Excluded paths pattern, None if nothing is excluded.
+
+    Returns:
+    list(string): Relative paths of the files.
+    """
+    paths = []
+    for root, dirs, files in os.walk("."):
+        rel_root = os.path.relpath(root, ".")
+        rel_root = "" if rel_root == "." else rel_root + "/"
+        dirs[:] = [name for name in dirs if not (exclude and exclude.search(rel_root + name + "/"))]
+        paths.extend(rel_root + name for name in files)
+    return sorted(paths)
+
+
+def select_files(paths, exclude):
+    """
+    Function filters out excluded and no longer existing files.
+
+    Parameters:
+    paths (list(string)): Relative paths of the files.
+    exclude (re.Pattern): Excluded paths pattern, None if nothing is excluded.
+
+    Returns:
+    list(string): Selected paths.
+    """
+    selected = [path for path in paths if not (exclude and exclude.search(path))]
+    excluded = len(paths) - len(selected)
+    if excluded:
+        print(f"Excluding {excluded} files matching excludePaths")
+    return [path for path in selected if os.path.lexists(path)]
+
+
+def add_bytes(tar, name, data):
+    """
+    Function adds in-memory file to the archive.
+
+    Parameters:
+    tar (tarfile.TarFile): Archive.
+    name (string): Name of the archive member.
+    data (bytes): Contents of the file.
+    """
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(datetime.now().timestamp())
+    tar.addfile(info, io.BytesIO(data))
+
+
+def add_git_bundle(tar, base_dir, untracked, exclude):
+    """
+    Function adds git bundle of the checked out history, the diff of the working tree against it and the untracked
+    files to the archive. The experience kit tree is restored by cloning the bundle and applying the diff.
+    Excluded paths apply only to the untracked files, the bundle holds the whole history.
+
+    Parameters:
+    tar (tarfile.TarFile): Archive.
+    base_dir (string): Name of the experience kit directory in the archive.
+    untracked (list(string)): Untracked paths.
+    exclude (re.Pattern): Excluded paths pattern, None if nothing is excluded.
+
+    Returns:
+    bool: True on success, False if the bundle cannot be created, e.g. there are no commits.
+    """
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bundle_path = os.path.join(tmp_dir, BUNDLE_NAME)
+        diff = run_git(["diff", "--binary", "HEAD"])
+        if diff is None or run_git(["bundle", "create", bundle_path, "HEAD"]) is None:
+            return False
+        tar.add(bundle_path, arcname=f"{base_dir}/{BUNDLE_NAME}")
+
+    add_bytes(tar, f"{base_dir}/{DIFF_NAME}", diff)
+    for path in select_files(untracked, exclude):
+        tar.add(path, arcname=f"{base_dir}/{path}", recursive=False)
+    return True
+
+
+class Snapshot:
+    """
+    Experience kit snapshot archive stored in a temporary file, shared by all controllers it is sent to.
+    """
+    def __init__(self, name, path):
+        self.name = name
+        self.path = path
+
+    @property
+    def size(self):
+        """Size of the archive in bytes"""
+        return os.path.getsize(self.path)
+
+    def close(self):
+        """Removes the archive"""
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+
+def create_archive():
+    """
+    Function creates archive file with Smart Edge experience kit information.
+
+    Files are selected by git, the tracked and the untracked but not ignored ones, the whole directory is walked
+    only outside of a git working tree. By default ("bundle" snapshotMode) the tree of a git working tree is replaced
+    by a git bundle and a diff of the working tree, the files are archived when the bundle cannot be created.
+    The "tree" snapshotMode archives the files always.
+
+    Returns:
+    Snapshot: Created archive, None on failure.
     """
     start = (datetime.now()).strftime("%Y_%m_%d_%H_%M_%S")
-    file_name = f"../{start}_SmartEdge_experience_kit_archive.tar.gz"
+    file_name = f"{start}_SmartEdge_experience_kit_archive.tar.gz"
     config = read_cfg("scripts/log_all.json")
 
     commands = ["git status", "git diff", "git log -n100"]
     if "commands" in config:
         commands = config["commands"]
 
-    exclude_paths = []
-    if "excludePaths" in config:
-        exclude_paths = [re.compile(excluded_path) for excluded_path in config["excludePaths"]]
+    exclude = compile_exclude_paths(config.get("excludePaths", []))
+    mode = config.get("snapshotMode", SNAPSHOT_BUNDLE)
+    base_dir = os.path.basename(os.path.abspath(os.getcwd()))
+
+    git_files = list_git_files()
+    with tempfile.NamedTemporaryFile(prefix=".log_all_", suffix=".tar.gz", delete=False) as archive_file:
+        snapshot = Snapshot(file_name, archive_file.name)
 
     try:
-        with tarfile.open(file_name, "w:gz") as tar:
-            main_dir = os.path.abspath(os.getcwd())
-            tar.add(main_dir, arcname=os.path.basename(main_dir),
-                    filter=tar_filter_with_exclude(exclude_paths))
-            if os.path.isdir(main_dir + "/.git"):
+        with tarfile.open(snapshot.path, "w:gz") as tar:
+            if git_files is None:
+                paths = select_files(walk_files(exclude), exclude)
+            elif mode == SNAPSHOT_BUNDLE and add_git_bundle(tar, base_dir, git_files[1], exclude):
+                paths = []
+            else:
+                paths = select_files(git_files[0] + git_files[1], exclude)
+
+            for path in paths:
+                tar.add(path, arcname=f"{base_dir}/{path}", recursive=False)
+
+            if git_files is not None:
                 for com in commands:
-                    path = com.replace(" ", "_") + ".log"
-                    with open(path, "w", encoding="utf-8") as log_file:
-                        subprocess.run(com, # nosec - B602
-                                       shell=True,
-                                       stdout=log_file,
-                                       stderr=subprocess.STDOUT,
-                                       check=False,
-                                       universal_newlines=True)
-                        tar.add(path, arcname=path)
+                    output = subprocess.run(com, # nosec - B602
+                                            shell=True,
+                                            stdout=subprocess.PIPE,
+                                            stderr=subprocess.STDOUT,
+                                            check=False).stdout
+                    add_bytes(tar, com.replace(" ", "_") + ".log", output)
     except OSError as os_error:
         print(f"ERROR: {os_error}")
-        return -1
+        snapshot.close()
+        return None
+
+    return snapshot
 
-    try:
-        user_prefix = ""
-        if user != "":
-            user_prefix = f"{user}@"
 
-        files = "scripts/log_collector scripts/log_collector.py scripts/log_collector.json"
+def send_archive(snapshot, user, host, timeout=None):
+    """
+    Function streams archive file and log collector scripts to controller root directory over a single ssh
+    connection, as a tar stream extracted on the controller.
+
+    Parameters:
+    snapshot (Snapshot): Archive created by create_archive.
+    user (string): Controller user, empty string for the default one.
+    host (string): Controller host.
+    timeout (float): Maximum time of the transfer in seconds, None means no limit.
+
+    Returns:
+    int: 0 on success, -1 otherwise.
+    """
+    user_prefix = ""
+    if user != "":
+        user_prefix = f"{user}@"
 
-        subprocess.run( # nosec - B602, B603
-            f"scp -C {file_name} {files} {user_prefix}{host}:~",
-            shell=True,
-            check=True)
+    with subprocess.Popen(["ssh", "-C", f"{user_prefix}{host}", "tar -xf - -C ~"], # nosec - B603, B607
+                          stdin=subprocess.PIPE) as process:
+        timed_out = threading.Event()
+        timer = threading.Timer(timeout, lambda: (timed_out.set(), process.kill())) if timeout else None
+        if timer is not None:
+            timer.start()
+        try:
+            with tarfile.open(fileobj=process.stdin, mode="w|") as tar:
+                tar.add(snapshot.path, arcname=snapshot.name)
+                for path in COLLECTOR_FILES:
+                    if os.path.exists(path):
+                        tar.add(path, arcname=os.path.basename(path))
+            process.stdin.close()
+        except BrokenPipeError:
+            pass # ssh failed or was killed, its exit code tells it
+        except OSError:
+            process.kill()
+            raise
+        finally:
+            return_code = process.wait()
+            if timer is not None:
+                timer.cancel()
 
-    except subprocess.CalledProcessError as process_error:
-        print(f"Collecting controller logs failed: {process_error}")
+    if timed_out.is_set():
+        print(f"Collecting controller logs from {host} timed out after {timeout}s")
         print("Please check connection and run: `python3 scripts/log_all.py`")
+        return -1
+
+    if return_code != 0:
+        print(f"Collecting controller logs failed: ssh exited with code {return_code}")
+        print("Please check connection and run: `python3 scripts/log_all.py`")
+        return -1
 
     return 0
 
 
+def collect_logs(user, host, archive=None, timeout=None):
+    """
+    Function creates archive file with Smart Edge experience kit information and
+    send it to controller root directory.
+
+    Parameters:
+    user (string): Controller user, empty string for the default one.
+    host (string): Controller host.
+    archive (Snapshot): Already created archive to send, created and removed after sending if None.
+    timeout (float): Maximum time of the transfer in seconds, None means no limit.
+    """
+    if archive is not None:
+        return send_archive(archive, user, host, timeout)
+
+    archive = create_archive()
+    if archive is None:
+        return -1
+
+    try:
+        return send_archive(archive, user, host, timeout)
+    finally:
+        archive.close()
+
+
 def main():
     """
     Function creates archive file with Smart Edge experience kit information and
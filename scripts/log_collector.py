@@ -11,19 +11,34 @@ automated tests gather all required data for further analysis. \
 """
 
 import argparse
+import functools
 import glob
 import json
 import logging
 import os
 import re
+import shlex
 import shutil
+import stat
 import subprocess # nosec - B404
 import sys
-import tarfile
-import tempfile
+import threading
+import time
+
+from log_collector_archive import (COMPRESSIONS, DEFAULT_COMPRESSION, DEFAULT_COMPRESSION_LEVELS, ArchiveReportWriter,
+                                   DirectoryReportWriter)
+from log_collector_budget import LimitedWriter, ReportBudget
+from log_collector_journal import demux_journal, get_journal_command
+from log_collector_runner import DEFAULT_COMMAND_TIMEOUT, DEFAULT_JOBS, CommandRunner, kill_process_group, run_command
+from log_collector_state import DEFAULT_STATE_FILE, IncrementalState
 
 
 _FORCE_OPT = "--force"
+MANIFEST_FILE_NAME = "manifest.json"
+DIRECTORY_ARCHIVE_EXTENSIONS = (".tar.gz", ".tgz", ".tar")
+STDOUT_PATH = "-"
+# Root directory of the archive written to the standard output
+STDOUT_ARCHIVE_PREFIX = "report"
 
 def parse_options(args):
     """
@@ -62,8 +77,9 @@ def parse_options(args):
 
     output_group.add_argument(
         output_file_opt, action="store", dest="output_file", metavar="PATH",
-        help="""
-            output archive file PATH
+        help=f"""
+            output archive file PATH; "{STDOUT_PATH}" writes the archive to the standard output, e.g. to stream it over
+            SSH, console logs are written to the standard error output then
             """)
 
     output_group.add_argument(
@@ -81,9 +97,71 @@ def parse_options(args):
             output file (specified using {output_file_opt} or {output_old_opt} options)
         """)
 
+    parser.add_argument(
+        "--compression", action="store", dest="compression", metavar="TYPE", default=DEFAULT_COMPRESSION,
+        choices=COMPRESSIONS,
+        help=f"""
+            compression of the output archive (one of: {', '.join(COMPRESSIONS)}; default: %(default)s);
+            zstd requires the zstandard Python module or the zstd tool
+            """)
+
+    parser.add_argument(
+        "--compression-level", action="store", dest="compression_level", metavar="N", type=int,
+        help=f"""
+            compression level (default: {', '.join(f'{k} {v}' for k, v in DEFAULT_COMPRESSION_LEVELS.items())})
+            """)
+
+    parser.add_argument(
+        "-j", "--jobs", action="store", dest="jobs", metavar="N", type=int, default=DEFAULT_JOBS,
+        help="number of commands run at the same time (default: %(default)s)")
+
+    parser.add_argument(
+        "--command-timeout", action="store", dest="command_timeout", metavar="SECONDS", type=float,
+        default=DEFAULT_COMMAND_TIMEOUT,
+        help="""
+            time after which a command is killed, unless its configuration specifies "timeout"
+            (default: %(default)s)
+            """)
+
+    parser.add_argument(
+        "--time-budget", action="store", dest="time_budget", metavar="SECONDS", type=float, default=0,
+        help="""
+            wall-clock time budget of running all commands; commands are killed when it is exceeded and not yet
+            started ones are skipped, 0 means no budget (default: %(default)s)
+            """)
+
+    parser.add_argument(
+        "--since", action="store", dest="since", metavar="TIME",
+        help="""
+            collect journal entries of <SERVICE> commands not older than TIME, in any format accepted by
+            "journalctl --since", e.g. "2022-05-01 10:00" or "-2h"
+            """)
+
+    parser.add_argument(
+        "--max-report-bytes", action="store", dest="max_report_bytes", metavar="N", type=int, default=0,
+        help="""
+            budget of the size of all collected artifacts in bytes, 0 means no budget (default: %(default)s);
+            artifacts of specs with higher "priority" are collected first, the ones collected after the budget is
+            used up are truncated according to the "truncate" strategy of their spec or left empty
+            """)
+
+    parser.add_argument(
+        "--incremental", action="store_true", dest="incremental",
+        help="""
+            collect only artifacts that changed since the previous incremental collection: new journal entries,
+            new pod logs, data appended to files and files with changed contents; the manifest references the
+            previous report
+            """)
+
+    parser.add_argument(
+        "--state-file", action="store", dest="state_file", metavar="FILE", default=DEFAULT_STATE_FILE,
+        help="FILE holding the state of the previous incremental collection (default: %(default)s)")
+
     parser.add_argument(
         "-t", "--tmp-dir", action="store", dest="tmp_dir", metavar="PATH", default=".",
-        help="directory to create a temporary directory in (default: %(default)s)")
+        help="""
+            directory to create temporary files holding output of running commands in (default: %(default)s)
+            """)
 
     level_debug = "DEBUG"
     levels = [level_debug, "INFO", "WARNING", "ERROR", "CRITICAL", "NONE"]
@@ -139,45 +217,73 @@ def read_config_json(options):
     return None
 
 
-def run_command(command, file_name):
+class Manifest:
     """
-    Function runs command and save its result to file.
-
-    Parameters:
-    command(string): Command to run.
-    file_name(string): Path to save results.
+    Report manifest listing collected artifacts. Written to the report root directory as manifest.json.
     """
-    logging.debug("Saving command: %s to file: %s", command, file_name)
-    with open(file_name, "w") as output_file:
-        try:
-            subprocess.run(command,
-                        shell=True, # nosec - B602
-                        stdout=output_file,
-                        stderr=subprocess.STDOUT,
-                        check=True,
-                        universal_newlines=True)
-        except subprocess.CalledProcessError as process_error:
-            logging.error("Command \"%s\" failed with error: %s", command, process_error.output)
-    logging.debug("Running command finished.")
 
+    def __init__(self):
+        self.commands = []
+        self.files = []
+        self.truncations = []
+        self.incremental = None
+        self._lock = threading.Lock()
 
-def make_targz(archive_name, src):
-    """
-    Function creates tar.gz archive.
+    def add_command(self, command, name, **result):
+        """
+        Function records result of a command.
 
-    Parameters:
-    archive_name (string): Output archive name.
-    src (string): Directory path that will be archived.
-    """
-    logging.info("Creating %s started.", archive_name)
-    with tarfile.open(archive_name, "w:gz", dereference=True) as tar:
-        try:
-            tar.add(src, arcname=archive_name)
-        except OSError as tar_file_exception:
-            logging.error(
-                "Adding artifacts to the archive \"%s\" failed with error: %s",
-                archive_name, tar_file_exception)
-    logging.info("Creating %s succeeded.", archive_name)
+        Parameters:
+        command (string): Command which was run.
+        name (string): Report path of the command output file.
+        result: Fields describing the result, e.g. status, exit_code, duration.
+        """
+        record = {"command": command, "file": name}
+        record.update(result)
+        with self._lock:
+            self.commands.append(record)
+
+    def add_file(self, path, name, **result):
+        """
+        Function records a collected file.
+
+        Parameters:
+        path (string): Path of the collected file.
+        name (string): Report path of the file.
+        result: Fields describing the result, e.g. status, offset.
+        """
+        record = {"path": path, "file": name}
+        record.update(result)
+        with self._lock:
+            self.files.append(record)
+
+    def add_truncation(self, name, **details):
+        """
+        Function records a truncated artifact.
+
+        Parameters:
+        name (string): Report path of the artifact.
+        details: Fields describing the truncation, e.g. strategy, original_bytes, collected_bytes.
+        """
+        record = {"file": name}
+        record.update(details)
+        with self._lock:
+            self.truncations.append(record)
+
+    def write(self, writer):
+        """
+        Function adds the manifest file to the report.
+
+        Parameters:
+        writer (DirectoryReportWriter or ArchiveReportWriter): Writer of the report.
+        """
+        with self._lock:
+            manifest = {"commands": sorted(self.commands, key=lambda record: record["file"]),
+                        "files": sorted(self.files, key=lambda record: record["file"]),
+                        "truncations": sorted(self.truncations, key=lambda record: record["file"])}
+        if self.incremental is not None:
+            manifest["incremental"] = self.incremental
+        writer.add_bytes(MANIFEST_FILE_NAME, json.dumps(manifest, indent=4).encode("utf-8"))
 
 
 def handle_output_path(options, path, kind):
@@ -228,24 +334,31 @@ def handle_output_path(options, path, kind):
     return True
 
 
-def prepare_directories_tree(options, tmp_dir, sub_dirs):
+def prepare_output(options):
     """
-    Function prepares directories tree.
+    Function checks the output path and removes it if --force option is given.
 
     Parameters:
     options (Namespace): Options Namespace object with run-time commands.
-    tmp_dir (string): Temporary directory path to store collected artifacts.
-    sub_dirs (list): Sub-directories created in root directory.
 
     Returns:
-    (int): Operation performance exit code. 0 on success, -1 otherwise.
+    bool: True on success, False otherwise.
     """
 
-    logging.info("Preparing directories tree to collect artifacts started.")
+    logging.info("Preparing output to collect artifacts started.")
 
     if options.output_dir_path is not None:
         if not handle_output_path(options, options.output_dir_path, "directory"):
             return False
+        try:
+            os.makedirs(options.output_dir_path)
+        except OSError as e:
+            logging.error(
+                "Failed to create the output directory:\n"
+                "    %s", e)
+            return False
+    elif options.output_file == STDOUT_PATH:
+        pass
     elif options.output_file is not None:
         if not handle_output_path(options, options.output_file, "file"):
             return False
@@ -257,30 +370,57 @@ def prepare_directories_tree(options, tmp_dir, sub_dirs):
         if not handle_output_path(options, options.out, "file"):
             return False
 
-    try:
-        for sub in sub_dirs:
-            os.makedirs(os.path.join(tmp_dir, sub), exist_ok=True)
-    except OSError as e:
-        logging.error(
-            "Failed to create the output directories tree:\n"
-            "    %s", e)
-        return False
+    return True
 
-    logging.debug("Successfully created the output directories tree")
 
-    return True
+def get_report_path(options):
+    """
+    Function returns path of the output directory or archive.
+
+    Parameters:
+    options (Namespace): Options Namespace object with run-time commands.
+    """
+    if options.output_dir_path is not None:
+        return options.output_dir_path
+    return options.output_file if options.output_file is not None else options.out
 
 
-def collect_pods_logs(file_name, com):
+def create_report_writer(options):
     """
-    Function collects PODs logs into logs files.
+    Function creates writer of the report to the output directory or archive.
 
     Parameters:
-    file_name (string): sub-directory prefix path.
-    com (string): command to run.
+    options (Namespace): Options Namespace object with run-time commands.
+
+    Returns:
+    DirectoryReportWriter or ArchiveReportWriter: Report writer, None on failure.
     """
-    logging.debug("Collecting pods logs started.")
+    if options.output_dir_path is not None:
+        return DirectoryReportWriter(options.output_dir_path)
 
+    archive_file = get_report_path(options)
+    logging.info("Creating %s started.", archive_file)
+    try:
+        if archive_file == STDOUT_PATH:
+            return ArchiveReportWriter(sys.stdout.buffer, STDOUT_ARCHIVE_PREFIX, options.compression,
+                                       options.compression_level, options.tmp_dir)
+        # Artifacts are stored under a directory named as the archive, as they have always been
+        return ArchiveReportWriter(archive_file, archive_file.replace(os.sep, "/").lstrip("/"),
+                                   options.compression, options.compression_level, options.tmp_dir)
+    except (OSError, ValueError) as e:
+        logging.error("Failed to create the archive \"%s\": %s", archive_file, e)
+        return None
+
+
+# Listed once per collection for all pod command specs
+@functools.lru_cache(maxsize=None)
+def get_pods():
+    """
+    Function lists pods of all namespaces.
+
+    Returns:
+    list: Pods as returned by the Kubernetes API, None on failure.
+    """
     try:
         pods_info_req = subprocess.run("kubectl get pods -A -o wide -o json", # nosec - B607
                                         shell=True, # nosec - B602
@@ -290,43 +430,193 @@ def collect_pods_logs(file_name, com):
     except subprocess.CalledProcessError as process_error:
         logging.error("Failed to get pods. No logs from pods fetched. Error: %s",
                       process_error.output)
-    else:
-        pods = json.loads(pods_info_req.stdout.decode("utf-8"))
+        return None
+    return json.loads(pods_info_req.stdout.decode("utf-8"))["items"]
 
-        for pod in pods["items"]:
-            pod_name = pod["metadata"]["name"]
-            pod_ns = pod["metadata"]["namespace"]
 
-            pod_cmd = com.replace("<POD>", pod_name).replace("<NAMESPACE>", pod_ns)
-            pod_path = file_name.replace("<POD>", pod_name).replace("<NAMESPACE>", pod_ns)
+def parse_duration(duration):
+    """
+    Function converts duration, e.g. "1h30m", to seconds.
 
-            if "describe" in com:
-                run_command(pod_cmd, pod_path)
+    Returns:
+    float: Number of seconds, None if the duration cannot be parsed.
+    """
+    match = re.fullmatch(r"(?:(\d+(?:\.\d+)?)h)?(?:(\d+(?:\.\d+)?)m)?(?:(\d+(?:\.\d+)?)s)?", str(duration))
+    if match is None or not any(match.groups()):
+        return None
+    hours, minutes, seconds = (float(group or 0) for group in match.groups())
+    return hours * 3600 + minutes * 60 + seconds
 
-            if "logs" in com:
-                for container in pod["spec"]["containers"]:
-                    command = pod_cmd.replace("<CONTAINER>", container["name"])
-                    path = pod_path.replace("<CONTAINER>", container["name"])
-                    run_command(command, path)
 
-                if "initContainers" in pod["spec"]:
-                    for init_container in pod["spec"]["initContainers"]:
-                        command = pod_cmd.replace("<CONTAINER>", init_container["name"])
-                        path = pod_path.replace("<CONTAINER>", init_container["name"])
-                        run_command(command, path)
+def add_logs_caps(command, spec, since_time=None):
+    """
+    Function appends "kubectl logs" options limiting the amount of collected logs configured in the spec.
 
-        logging.debug("Collecting pods logs finished.")
+    Parameters:
+    command (string): kubectl logs command.
+    spec (dict): Command configuration with optional "tail", "since" and "limit_bytes" keys.
+    since_time (float): Collect only logs newer than this time in seconds since the epoch, used instead of
+                        the "since" of the spec if it is more recent.
+    """
+    spec = dict(spec)
+    if since_time is not None:
+        since = parse_duration(spec["since"]) if "since" in spec else None
+        if "since" not in spec or (since is not None and time.time() - since < since_time):
+            spec.pop("since", None)
+            command += f" --since-time={time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(since_time))}"
+    for key, option in (("tail", "--tail"), ("since", "--since"), ("limit_bytes", "--limit-bytes")):
+        if key in spec:
+            command += f" {option}={shlex.quote(str(spec[key]))}"
+    return command
+
+
+def collect_containers_logs(writer, commands, timeout=None):
+    """
+    Function collects logs of all containers of a pod within the pod timeout.
 
-def collect_journalctl_services_logs(file_name, com):
+    Parameters:
+    writer (LimitedWriter): Writer of the report.
+    commands (list): (command, report path) of every container.
+    timeout (float): Time in seconds for the whole pod, None means no limit.
+
+    Returns:
+    (int, bool): Exit code of the last failed command (0 if none failed) and flag whether the pod timed out.
     """
-    Function collects journalctl tool services logs files.
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    result = 0
+    for command, name in commands:
+        remaining = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logging.error("Command \"%s\" skipped, pod timeout exceeded", command)
+                return None, True
+        with writer.output_file(name) as output:
+            exit_code, timed_out = run_command(command, output, remaining)
+        if timed_out:
+            return None, True
+        if exit_code != 0:
+            result = exit_code
+    return result, False
+
+
+def split_describe_output(output):
+    """
+    Function splits output of "kubectl describe" of multiple objects.
 
     Parameters:
-    prefix (string): sub-directory prefix path.
-    com (string): command to run.
+    output (string): kubectl describe output.
+
+    Returns:
+    dict: Object names mapped to their descriptions.
     """
-    logging.debug("Collecting journalctl services logs started.")
+    descriptions = {}
+    starts = list(re.finditer(r"^Name:[ \t]+(\S+)[ \t]*$", output, re.MULTILINE))
+    for match, next_match in zip(starts, starts[1:] + [None]):
+        end = next_match.start() if next_match is not None else len(output)
+        descriptions[match.group(1)] = output[match.start():end].rstrip("\n") + "\n"
+    return descriptions
+
+
+def describe_namespace_pods(writer, command, paths, timeout=None):
+    """
+    Function describes all pods of a namespace with a single command and writes description of every pod
+    to its file.
+
+    Parameters:
+    writer (LimitedWriter): Writer of the report.
+    command (string): kubectl describe command of all pods of the namespace.
+    paths (dict): Pod names mapped to report paths of their descriptions.
+    timeout (float): Time in seconds after which the command is killed, None means no limit.
+
+    Returns:
+    (int, bool): Command exit code (None if it was killed) and flag whether it timed out.
+    """
+    logging.debug("Describing %d pods: %s", len(paths), command)
+    with subprocess.Popen(command,
+                          shell=True, # nosec - B602
+                          stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT,
+                          universal_newlines=True,
+                          start_new_session=True) as process:
+        try:
+            output, _ = process.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logging.error("Command \"%s\" timed out after %.1f seconds", command, timeout)
+            kill_process_group(process)
+            process.communicate()
+            return None, True
+
+    descriptions = split_describe_output(output)
+    for pod_name, path in paths.items():
+        if pod_name in descriptions:
+            description = descriptions[pod_name]
+        elif process.returncode != 0:
+            description = output
+        else:
+            description = f"Pod {pod_name} not found in the namespace description\n"
+        writer.add_bytes(path, description.encode("utf-8"))
+    if process.returncode != 0:
+        logging.error("Command \"%s\" failed with exit code: %d", command, process.returncode)
+    return process.returncode, False
+
+
+def collect_pods_logs(runner, file_name, spec, since_time=None):
+    """
+    Function collects PODs logs into logs files.
+
+    Logs of containers of every pod are collected by one task, within the "timeout" of the spec.
+    Describe commands are run once per namespace.
+
+    Parameters:
+    runner (CommandRunner): Runner of the commands.
+    file_name (string): Report path pattern.
+    spec (dict): Command configuration; "tail", "since" and "limit_bytes" keys limit collected logs.
+    since_time (float): Collect only logs newer than this time in seconds since the epoch, all if None.
+    """
+    logging.debug("Collecting pods logs started.")
+
+    com = spec["command"]
+    timeout = spec.get("timeout")
+    writer = runner.writer.for_spec(spec)
+    pods = get_pods()
+    if pods is None:
+        return
+
+    namespaces = {}
+    for pod in pods:
+        pod_name = pod["metadata"]["name"]
+        pod_ns = pod["metadata"]["namespace"]
 
+        pod_cmd = com.replace("<POD>", pod_name).replace("<NAMESPACE>", pod_ns)
+        pod_path = file_name.replace("<POD>", pod_name).replace("<NAMESPACE>", pod_ns)
+
+        if "describe" in com:
+            namespaces.setdefault(pod_ns, {})[pod_name] = pod_path
+
+        if "logs" in com:
+            containers = pod["spec"]["containers"] + pod["spec"].get("initContainers", [])
+            commands = [(add_logs_caps(pod_cmd.replace("<CONTAINER>", container["name"]), spec, since_time),
+                         pod_path.replace("<CONTAINER>", container["name"])) for container in containers]
+            runner.submit_task(add_logs_caps(pod_cmd.replace("<CONTAINER>", "*"), spec, since_time),
+                               pod_path.replace("<CONTAINER>", "*"),
+                               functools.partial(collect_containers_logs, writer, commands), timeout)
+
+    for pod_ns, paths in namespaces.items():
+        command = " ".join(arg for arg in com.replace("<NAMESPACE>", pod_ns).split() if "<POD>" not in arg)
+        runner.submit_task(command, file_name.replace("<NAMESPACE>", pod_ns).replace("<POD>", "*"),
+                           functools.partial(describe_namespace_pods, writer, command, paths), timeout)
+
+    logging.debug("Collecting pods logs finished.")
+
+
+def list_services():
+    """
+    Function lists service unit files.
+
+    Returns:
+    list: Service names, None on failure.
+    """
     try:
         output = subprocess.run( # nosec - B607
             "systemctl --no-page list-unit-files --type=service --no-legend",
@@ -336,25 +626,96 @@ def collect_journalctl_services_logs(file_name, com):
             stderr=subprocess.STDOUT).stdout.decode("utf-8")
     except subprocess.CalledProcessError as process_error:
         logging.error("Failed to get services. Error: %s", process_error.output)
-    else:
-        services = [x.split(" ", 1)[0] for x in output.splitlines()][:-1]
+        return None
+    return [x.split(" ", 1)[0] for x in output.splitlines()][:-1]
+
+
+def get_service_path(file_name, service_name):
+    """
+    Function returns path of the service logs file.
+
+    Parameters:
+    file_name (string): Path pattern with <SERVICE> placeholder.
+    service_name (string): Name of the service.
+    """
+    service_name = service_name.replace(".", "_").replace("-", "_").replace("@", "_")
+    return re.sub("<SERVICE>", service_name, file_name)
+
+
+def collect_journalctl_services_logs(runner, file_name, spec, since=None):
+    """
+    Function collects journalctl tool services logs files.
+
+    Parameters:
+    runner (CommandRunner): Runner of the commands.
+    file_name (string): Path pattern with <SERVICE> placeholder.
+    spec (dict): Command configuration, its "timeout" applies to every command.
+    since (string): Collect only entries not older than since, all if None.
+    """
+    logging.debug("Collecting journalctl services logs started.")
+
+    writer = runner.writer.for_spec(spec)
+    services = list_services()
+    if services is not None:
         for service_name in services:
             logging.debug("Collecting service logs for: %s", service_name)
-            command = re.sub("<SERVICE>", service_name, com)
-            service_name = service_name.replace(".", "_").replace("-", "_").replace("@", "_")
-            path = re.sub("<SERVICE>", service_name, file_name)
-            run_command(command, path)
+            command = re.sub("<SERVICE>", service_name, spec["command"])
+            if since is not None:
+                command += f" --since {shlex.quote(since)}"
+            runner.submit(command, get_service_path(file_name, service_name), spec.get("timeout"), writer)
         logging.debug("Collecting journalctl services logs finished.")
 
-def collect_command_artifacts(root_dir, os_distro, config):
+
+def collect_journal_demuxed(runner, file_name, spec, since=None, state=None):
+    """
+    Function collects journalctl services logs files reading the journal only once.
+
+    Parameters:
+    runner (CommandRunner): Runner of the commands.
+    file_name (string): Path pattern with <SERVICE> placeholder.
+    spec (dict): Configuration of the per-service journalctl command, its "timeout" applies to reading
+                 the journal.
+    since (string): Collect only entries not older than since, all if None.
+    state (IncrementalState): State of incremental collection, entries after the previously read ones are
+                              collected; None collects all entries.
+    """
+    cursor = state.get_journal_cursor(file_name) if state is not None else None
+    command = get_journal_command(spec["command"], since, cursor)
+    if command is None:
+        logging.warning("Command \"%s\" does not run journalctl, collecting services one by one", spec["command"])
+        if since is None and state is not None:
+            since = state.get_journal_since()
+        collect_journalctl_services_logs(runner, file_name, spec, since)
+        return
+
+    services = list_services()
+    if services is None:
+        return
+    paths = {service_name: get_service_path(file_name, service_name) for service_name in services}
+    on_cursor = functools.partial(state.set_journal_cursor, file_name) if state is not None else None
+    demux = functools.partial(demux_journal, runner.writer.for_spec(spec), command, paths, on_cursor=on_cursor)
+    runner.submit_task(" ".join(shlex.quote(arg) for arg in command), os.path.dirname(file_name), demux,
+                       spec.get("timeout"))
+
+
+def collect_command_artifacts(os_distro, config, runner, since=None, state=None): # pylint: disable=too-many-arguments
     """
     Function collects configured commands running log files.
 
     Parameters:
-    root_dir (string): Archive root directory path
     os_distro (string): Name of os distribution
     config (dict): JSON tool configuration.
+    runner (CommandRunner): Runner of the commands.
+    since (string): Collect only journal entries of <SERVICE> commands not older than since, all if None.
+    state (IncrementalState): State of incremental collection, only new journal entries and pod logs are
+                              collected; None collects everything.
     """
+    journal_since = since
+    since_time = None
+    if state is not None:
+        since_time = state.get_previous_time()
+        if since is None:
+            journal_since = state.get_journal_since()
 
     logging.info("Collecting command artifacts started.")
 
@@ -366,34 +727,106 @@ def collect_command_artifacts(root_dir, os_distro, config):
                 logging.debug("Skip command \"%s\" as %s not supported", com['command'], os_distro)
                 continue
 
-            prefix = os.path.join(root_dir, sub_dir)
-            file_name = os.path.join(prefix, com["file_name"])
+            file_name = os.path.join(sub_dir, com["file_name"])
             if "<POD>" in com["command"] or "<NAMESPACE>" in com["command"]:
                 # Need to handle PODS/NAMESPACE case
-                collect_pods_logs(file_name, com["command"])
+                collect_pods_logs(runner, file_name, com, since_time)
+            elif "<SERVICE>" in com["command"] and com.get("demux", False):
+                # journalctl SERVICEs logs demultiplexed from a single journal read
+                collect_journal_demuxed(runner, file_name, com, since, state)
             elif "<SERVICE>" in com["command"]:
                 # Need to handle journalctl SERVICEs logs
-                collect_journalctl_services_logs(file_name, com["command"])
+                collect_journalctl_services_logs(runner, file_name, com, journal_since)
             else:
-                run_command(com["command"], file_name)
+                runner.submit(com["command"], file_name, com.get("timeout"), runner.writer.for_spec(com))
+
+    runner.wait()
     logging.debug("Collecting command artifacts finished.")
 
 
-def _link_files(options):
-    """ Determine if symbolic links should be created in the output directory for source artifacts being regular files
+def get_directory_name(file_name):
+    """
+    Function returns report directory name of a collected directory, configured as an archive file name
+    in older configurations.
+
+    Parameters:
+    file_name (string): Configured file name.
+    """
+    for extension in DIRECTORY_ARCHIVE_EXTENSIONS:
+        if file_name.endswith(extension):
+            return file_name[:-len(extension)]
+    return file_name
+
+
+def collect_file(writer, manifest, src, name, state=None):
+    """
+    Function adds the file to the report.
+
+    Parameters:
+    writer (LimitedWriter): Writer of the report.
+    manifest (Manifest): Manifest of the report.
+    src (string): Path of the file.
+    name (string): Report path of the file.
+    state (IncrementalState): State of incremental collection, None collects the whole file.
+    """
+    try:
+        with open(src, "rb") as src_file:
+            src_stat = os.fstat(src_file.fileno())
+            if not stat.S_ISREG(src_stat.st_mode) or src_stat.st_size == 0:
+                writer.add_file(src_file, name)
+                manifest.add_file(src, name, status="full")
+                return
+
+            status, offset, previous = "full", 0, None
+            if state is not None:
+                status, offset, previous = state.select_file(src, src_file, src_stat)
+            result = {"status": status, "offset": offset}
+            if previous is not None and status != "full":
+                result["previous_file"] = previous["file"]
+
+            if status != "unchanged":
+                src_file.seek(offset)
+                writer.add_file(src_file, name, src_stat.st_size - offset)
+            if state is not None:
+                state.record_file(src, name, src_file, src_stat)
+            manifest.add_file(src, name, **result)
+    except OSError as e:
+        logging.error("Adding \"%s\" to the report failed with error: %s", src, e)
+
+
+def collect_path(writer, manifest, src, name, state=None):
+    """
+    Function adds a file or a directory tree to the report, symbolic links are followed.
+
+    Parameters:
+    writer (LimitedWriter): Writer of the report.
+    manifest (Manifest): Manifest of the report.
+    src (string): Path of the file or directory.
+    name (string): Report path of the file or directory.
+    state (IncrementalState): State of incremental collection, None collects whole files.
     """
+    if not os.path.isdir(src):
+        collect_file(writer, manifest, src, name, state)
+        return
 
-    return options.output_dir_path is None
+    for root, dirs, files in os.walk(src, followlinks=True):
+        dirs.sort()
+        dir_name = os.path.normpath(os.path.join(name, os.path.relpath(root, src)))
+        writer.add_directory(dir_name)
+        for file_name in sorted(files):
+            collect_file(writer, manifest, os.path.join(root, file_name), os.path.join(dir_name, file_name), state)
 
 
-def collect_path_artifacts(options, root_dir, os_distro, config):
+def collect_path_artifacts(writer, manifest, os_distro, config, state=None):
     """
     Function collects configured path logs and directories.
 
     Parameters:
-    root_dir (string): Archive root directory path
+    writer (LimitedWriter): Writer of the report, "max_bytes" of a spec applies to every file.
+    manifest (Manifest): Manifest of the report.
     os_distro (string): Name of os distribution
     config (dict): JSON tool configuration.
+    state (IncrementalState): State of incremental collection, None collects whole files.
     """
 
     logging.info("Collecting path artifacts started.")
@@ -401,50 +834,51 @@ def collect_path_artifacts(options, root_dir, os_distro, config):
     for sub_dir, specs in config.items():
         logging.debug("Collecting path artifacts for: %s", sub_dir)
 
-        prefix = os.path.join(root_dir, sub_dir)
-
         for item in specs.get("paths", []):
             if os_distro not in item.get("os_family", [os_distro]):
                 logging.debug("Skip path \"%s\" as %s not supported", item['path'], os_distro)
                 continue
 
+            item_writer = writer.for_spec(item)
             if os.path.isdir(item["path"]):
-                collect_directory(item, prefix)
+                logging.debug("Collecting directory %s.", item['path'])
+                collect_path(item_writer, manifest, item["path"],
+                             os.path.join(sub_dir, get_directory_name(item["file_name"])), state)
             elif "*" in item["path"]:
                 output = glob.glob(item["path"])
                 for i in output:
-                    if _link_files(options):
-                        os.symlink(i, os.path.join(prefix, os.path.basename(i)))
-                    else:
-                        shutil.copyfile(i, os.path.join(prefix, os.path.basename(i)))
+                    collect_path(item_writer, manifest, i, os.path.join(sub_dir, os.path.basename(i)), state)
             elif os.path.isfile(item["path"]):
-                if _link_files(options):
-                    os.symlink(item["path"], os.path.join(prefix, item["file_name"]))
-                else:
-                    shutil.copyfile(item["path"], os.path.join(prefix, item["file_name"]))
+                collect_path(item_writer, manifest, item["path"], os.path.join(sub_dir, item["file_name"]), state)
             else:
                 logging.error("Failed to find requested path \"%s\"", item['path'])
 
     logging.debug("Collecting path artifacts finished.")
 
 
-def collect_directory(src, path):
+def get_priorities(config):
     """
-    Function collects directories as packed archives.
+    Function returns priorities of the configured specs, the highest first.
 
     Parameters:
-    src (dict): Source directory info dictionary.
-    path (string): Archive directory path.
+    config (dict): JSON tool configuration.
     """
-    logging.debug("Collecting directory %s started.", src['path'])
-    with tarfile.open(os.path.join(path, src["file_name"]),
-                      "w:gz",
-                      dereference=True) as tar:
-        try:
-            tar.add(src["path"], arcname=src["path"])
-        except OSError as file_exception:
-            logging.debug("Adding file %s failed with error: %s", src['file_name'], file_exception)
-    logging.debug("Collecting directory finished.")
+    return sorted({spec.get("priority", 0) for specs in config.values()
+                   for spec in specs.get("commands", []) + specs.get("paths", [])}, reverse=True)
+
+
+def select_priority(config, priority):
+    """
+    Function returns configuration with specs of the priority only.
+
+    Parameters:
+    config (dict): JSON tool configuration.
+    priority (int): Priority of the selected specs.
+    """
+    return {sub_dir: {key: [spec for spec in specs.get(key, []) if spec.get("priority", 0) == priority]
+                      for key in ("commands", "paths")}
+            for sub_dir, specs in config.items()}
+
 
 def get_os_distro():
     """
@@ -479,7 +913,7 @@ def main(options):
     int: Operation performance exit code. 0 on success, -1 otherwise.
     """
     if options.log_level != "NONE":
-        stream_logger = logging.StreamHandler(sys.stdout)
+        stream_logger = logging.StreamHandler(sys.stderr if options.output_file == STDOUT_PATH else sys.stdout)
         stream_logger.setLevel(options.log_level)
         logging.getLogger().addHandler(stream_logger)
 
@@ -492,24 +926,38 @@ def main(options):
     if config is None:
         return -1
 
-    # This directory will be created and immediately removed if the options.output_dir_path is specified. It is an
-    #  imperfection with no significant consequences. Feel free to eliminate it.
-    with tempfile.TemporaryDirectory(dir=options.tmp_dir) as tmp_dir:
-        if options.output_dir_path is not None:
-            tmp_dir = options.output_dir_path
+    if not prepare_output(options):
+        return -1
 
-        if not prepare_directories_tree(options, tmp_dir, config.keys()):
-            return -1
+    state = IncrementalState(options.state_file) if options.incremental else None
 
-        collect_command_artifacts(tmp_dir, os_distro, config)
-        collect_path_artifacts(options, tmp_dir, os_distro, config)
+    writer = create_report_writer(options)
+    if writer is None:
+        return -1
 
-        if options.output_dir_path is None:
-            if options.output_file is not None:
-                archive_file = options.output_file
-            else:
-                archive_file = options.out
-            make_targz(archive_file, tmp_dir)
+    try:
+        for sub_dir in config:
+            writer.add_directory(sub_dir)
+
+        manifest = Manifest()
+        if state is not None:
+            manifest.incremental = state.get_manifest_info()
+        report = LimitedWriter(writer, ReportBudget(manifest, options.max_report_bytes, options.tmp_dir))
+        runner = CommandRunner(manifest, report, options.jobs, options.command_timeout, options.time_budget)
+        try:
+            # Higher priority artifacts are collected first, so they are the last to be truncated by the budget
+            for priority in get_priorities(config):
+                priority_config = select_priority(config, priority)
+                collect_command_artifacts(os_distro, priority_config, runner, options.since, state)
+                collect_path_artifacts(report, manifest, os_distro, priority_config, state)
+        finally:
+            runner.shutdown()
+        manifest.write(writer)
+    finally:
+        writer.close()
+
+    if state is not None and not state.save(os.path.abspath(get_report_path(options))):
+        return -1
 
     return 0
 
@@ -0,0 +1,273 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+"""
+Report writers and output compression of Log-Collector.
+"""
+
+import contextlib
+import gzip
+import io
+import os
+import shutil
+import subprocess # nosec - B404
+import tarfile
+import tempfile
+import threading
+import time
+
+try:
+    import lzma
+except ImportError: # Python built without liblzma
+    lzma = None
+
+try:
+    import zstandard
+except ImportError: # zstd binary is used if available
+    zstandard = None
+
+
+COMPRESSIONS = ("gzip", "xz", "zstd", "none")
+DEFAULT_COMPRESSION = "gzip"
+DEFAULT_COMPRESSION_LEVELS = {"gzip": 6, "xz": 6, "zstd": 3}
+
+
+class ProcessStream:
+    """
+    Writable stream piping data to a compression tool, e.g. zstd.
+    """
+
+    def __init__(self, command, stdout=None):
+        self._process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=stdout) # pylint: disable=consider-using-with # nosec - B603
+
+    def write(self, data):
+        """
+        Function writes data to the tool standard input.
+        """
+        return self._process.stdin.write(data)
+
+    def close(self):
+        """
+        Function closes the tool input and waits until it finishes.
+        """
+        self._process.stdin.close()
+        if self._process.wait() != 0:
+            raise OSError(f"Compression tool failed with exit code: {self._process.returncode}")
+
+
+class ChainedStream:
+    """
+    Writable stream closing the compressor and then the underlying file.
+    """
+
+    def __init__(self, compressor, output_file):
+        self._compressor = compressor
+        self._output_file = output_file
+
+    def write(self, data):
+        """
+        Function writes data to the compressor.
+        """
+        return self._compressor.write(data)
+
+    def close(self):
+        """
+        Function flushes the compressor and closes the file.
+        """
+        try:
+            self._compressor.close()
+        finally:
+            self._output_file.close()
+
+
+def open_compressed_stream(path, compression=DEFAULT_COMPRESSION, level=None):
+    """
+    Function opens stream writing compressed data to the file.
+
+    Parameters:
+    path (string or file): Output file path or binary file object.
+    compression (string): One of COMPRESSIONS.
+    level (int): Compression level, the default level of the compression is used if None.
+
+    Returns:
+    file: Writable binary stream, closing it finishes the compressed file.
+    """
+    if level is None:
+        level = DEFAULT_COMPRESSION_LEVELS.get(compression)
+
+    if compression == "gzip":
+        return gzip.open(path, "wb", compresslevel=level)
+    if compression == "xz":
+        if lzma is None:
+            raise ValueError("xz compression is not supported by this Python build")
+        return lzma.open(path, "wb", preset=level)
+    is_path = isinstance(path, str)
+    if compression == "zstd":
+        if zstandard is not None:
+            output_file = open(path, "wb") if is_path else path # pylint: disable=consider-using-with
+            return ChainedStream(zstandard.ZstdCompressor(level=level).stream_writer(output_file), output_file)
+        if shutil.which("zstd") is not None:
+            if is_path:
+                return ProcessStream(["zstd", "-q", "-f", f"-{level}", "-o", path])
+            path.flush()
+            return ProcessStream(["zstd", "-q", "-c", f"-{level}"], path)
+        raise ValueError("zstd compression requires the zstandard Python module or the zstd tool")
+    return open(path, "wb") if is_path else path # pylint: disable=consider-using-with
+
+
+class SizedReader:
+    """
+    Reads exactly size bytes of a file which may change while being archived. The content is cut if the file
+    grows and padded with zeros if it shrinks, so the archive stays consistent.
+    """
+
+    def __init__(self, src, size):
+        self._src = src
+        self._remaining = size
+
+    def read(self, size=-1):
+        """
+        Function reads up to size bytes, exactly as many as requested until the declared size is reached.
+        """
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._src.read(size)
+        if len(data) < size:
+            data += b"\0" * (size - len(data))
+        self._remaining -= size
+        return data
+
+
+class DirectoryReportWriter:
+    """
+    Writes report artifacts to a directory.
+    """
+
+    def __init__(self, root_dir):
+        self.root_dir = root_dir
+
+    def _path(self, name):
+        path = os.path.join(self.root_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def add_directory(self, name):
+        """
+        Function creates an empty report directory.
+        """
+        os.makedirs(os.path.join(self.root_dir, name), exist_ok=True)
+
+    @contextlib.contextmanager
+    def output_file(self, name):
+        """
+        Function opens binary file with a file descriptor the artifact is written to.
+        """
+        with open(self._path(name), "wb") as output:
+            yield output
+
+    def add_bytes(self, name, data):
+        """
+        Function adds artifact with given contents.
+        """
+        with open(self._path(name), "wb") as output:
+            output.write(data)
+
+    def add_file(self, src_file, name, size=None):
+        """
+        Function adds copy of the rest of an open file.
+
+        Parameters:
+        src_file (file): Binary file object positioned at the first byte to be copied.
+        name (string): Report path of the file.
+        size (int): Number of bytes to copy, all until the end of the file if None.
+        """
+        with open(self._path(name), "wb") as output:
+            if size is None:
+                shutil.copyfileobj(src_file, output)
+            else:
+                shutil.copyfileobj(SizedReader(src_file, size), output)
+
+    def close(self):
+        """
+        Function finishes the report.
+        """
+
+
+class ArchiveReportWriter:
+    """
+    Streams report artifacts into a single compressed tar archive as they are produced. Output of a command is
+    held in an unlinked temporary file only until the command finishes, files are read straight into the archive.
+    """
+
+    def __init__(self, path, prefix, compression=DEFAULT_COMPRESSION, level=None, tmp_dir=None): # pylint: disable=too-many-arguments
+        self._prefix = prefix
+        self._tmp_dir = tmp_dir
+        self._lock = threading.Lock()
+        self._stream = open_compressed_stream(path, compression, level)
+        self._tar = tarfile.open(fileobj=self._stream, mode="w|") # pylint: disable=consider-using-with
+
+    def _tarinfo(self, name, size=0, mode=0o644, mtime=None):
+        tar_info = tarfile.TarInfo(os.path.join(self._prefix, name))
+        tar_info.size = size
+        tar_info.mode = mode
+        tar_info.mtime = time.time() if mtime is None else mtime
+        return tar_info
+
+    def _add_fileobj(self, tar_info, fileobj):
+        with self._lock:
+            self._tar.addfile(tar_info, SizedReader(fileobj, tar_info.size))
+
+    def add_directory(self, name):
+        """
+        Function adds an empty report directory.
+        """
+        tar_info = self._tarinfo(name, mode=0o755)
+        tar_info.type = tarfile.DIRTYPE
+        with self._lock:
+            self._tar.addfile(tar_info)
+
+    @contextlib.contextmanager
+    def output_file(self, name):
+        """
+        Function opens binary file with a file descriptor the artifact is written to, the artifact is added to
+        the archive once the file is closed.
+        """
+        with tempfile.TemporaryFile(dir=self._tmp_dir) as output:
+            yield output
+            output.flush()
+            size = os.fstat(output.fileno()).st_size
+            output.seek(0)
+            self._add_fileobj(self._tarinfo(name, size), output)
+
+    def add_bytes(self, name, data):
+        """
+        Function adds artifact with given contents.
+        """
+        self._add_fileobj(self._tarinfo(name, len(data)), io.BytesIO(data))
+
+    def add_file(self, src_file, name, size=None):
+        """
+        Function adds the rest of an open file.
+
+        Parameters:
+        src_file (file): Binary file object positioned at the first byte to be added.
+        name (string): Report path of the file.
+        size (int): Number of bytes to add, all until the end of the file if None.
+        """
+        if size is None:
+            # Size of e.g. /proc files is not known until they are read
+            with self.output_file(name) as output:
+                shutil.copyfileobj(src_file, output)
+            return
+
+        src_stat = os.fstat(src_file.fileno())
+        self._add_fileobj(self._tarinfo(name, size, src_stat.st_mode & 0o777, src_stat.st_mtime), src_file)
+
+    def close(self):
+        """
+        Function finishes the archive.
+        """
+        with self._lock:
+            try:
+                self._tar.close()
+            finally:
+                self._stream.close()
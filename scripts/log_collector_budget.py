@@ -0,0 +1,335 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+"""
+Size limits of artifacts of Log-Collector reports and the report size budget.
+"""
+
+import contextlib
+import shutil
+import tempfile
+import threading
+
+TRUNCATE_STRATEGIES = ("head", "tail", "head+tail")
+DEFAULT_TRUNCATE_STRATEGY = "head+tail"
+
+
+class ReportBudget:
+    """
+    Budget of the size of all artifacts of the report, shared by all writers.
+    """
+
+    def __init__(self, manifest, max_bytes=0, tmp_dir=None):
+        """
+        manifest - Manifest the truncated artifacts are recorded in
+        max_bytes - size of the budget in bytes, 0 means no budget
+        tmp_dir - directory of temporary files holding the tail of streamed artifacts
+        """
+        self.manifest = manifest
+        self.max_bytes = max_bytes
+        self.tmp_dir = tmp_dir
+        self._remaining = max_bytes
+        self._lock = threading.Lock()
+
+    def is_limited(self):
+        """
+        Function checks if there is a budget.
+        """
+        return self.max_bytes > 0
+
+    def take(self, size):
+        """
+        Function takes bytes from the budget.
+
+        Parameters:
+        size (int): Number of bytes requested.
+
+        Returns:
+        int: Number of bytes granted, less than requested when the budget is used up.
+        """
+        if not self.is_limited():
+            return size
+        with self._lock:
+            granted = min(size, self._remaining)
+            self._remaining -= granted
+        return granted
+
+
+def split_limit(limit, strategy):
+    """
+    Function splits number of bytes kept of a truncated artifact to its head and tail.
+
+    Parameters:
+    limit (int): Number of bytes kept, None means no limit.
+    strategy (string): One of TRUNCATE_STRATEGIES.
+
+    Returns:
+    (int, int): Numbers of bytes kept from the start and from the end, None means no limit.
+    """
+    if strategy == "head":
+        return limit, 0
+    if strategy == "tail":
+        return 0, limit
+    if limit is None:
+        # Without a size limit only the report budget can truncate a stream, its head is kept then
+        return None, 0
+    return limit - limit // 2, limit // 2
+
+
+def get_truncation_marker(dropped):
+    """
+    Function returns line marking the place bytes were cut out of an artifact.
+    """
+    return f"\n[... {dropped} bytes truncated by log_collector ...]\n".encode("utf-8")
+
+
+class TailBuffer:
+    """
+    Temporary file holding the tail of a stream. Data is appended until the buffer is full, then it is used as
+    a ring buffer keeping the last bytes written.
+    """
+
+    def __init__(self, limit, tmp_dir=None):
+        """
+        limit - maximum size of the buffer in bytes, None means no limit
+        tmp_dir - directory of the temporary file
+        """
+        self.limit = limit
+        self.size = 0
+        self.full = limit == 0
+        self._pos = 0
+        self._file = None
+        self._tmp_dir = tmp_dir
+
+    def append(self, data):
+        """
+        Function appends data to the buffer which is not full yet.
+        """
+        if not data:
+            return
+        if self._file is None:
+            self._file = tempfile.TemporaryFile(dir=self._tmp_dir) # pylint: disable=consider-using-with
+        self._file.seek(self.size)
+        self._file.write(data)
+        self.size += len(data)
+
+    def overwrite(self, data):
+        """
+        Function writes data to the full buffer, the oldest data is overwritten.
+        """
+        data = data[-self.size:]
+        first = data[:self.size - self._pos]
+        self._file.seek(self._pos)
+        self._file.write(first)
+        self._file.seek(0)
+        self._file.write(data[len(first):])
+        self._pos = (self._pos + len(data)) % self.size
+
+    def copy_to(self, output):
+        """
+        Function writes contents of the buffer, oldest first, to the output and removes the buffer file.
+        """
+        if self._file is None:
+            return
+        with self._file:
+            for start, end in ((self._pos, self.size), (0, self._pos)):
+                self._file.seek(start)
+                output.write(self._file.read(end - start))
+
+
+class TruncatingOutput:
+    """
+    Writable stream keeping at most max_bytes of the data written, taken from the report budget as they are
+    written. The head is written to the output right away, the tail is held in a temporary ring buffer file
+    until the stream is finished, so neither memory nor disk usage exceeds the limit.
+    """
+
+    def __init__(self, output, max_bytes, strategy, budget):
+        self._output = output
+        self._budget = budget
+        self._head_room, tail_limit = split_limit(max_bytes, strategy)
+        self._tail = TailBuffer(tail_limit, budget.tmp_dir)
+        self.total_bytes = 0
+        self.collected_bytes = 0
+        self.budget_exceeded = False
+
+    def write(self, data):
+        """
+        Function writes data to the stream.
+        """
+        length = len(data)
+        self.total_bytes += length
+        if self._head_room is None or self._head_room > 0:
+            head = data if self._head_room is None else data[:self._head_room]
+            granted = self._budget.take(len(head))
+            self._output.write(head[:granted])
+            self.collected_bytes += granted
+            if granted < len(head):
+                self.budget_exceeded = True
+                self._head_room = 0
+            elif self._head_room is not None:
+                self._head_room -= granted
+            data = data[len(head):]
+        if data and (not self._tail.full or self._tail.size > 0):
+            self._write_tail(data)
+        return length
+
+    def _write_tail(self, data):
+        tail = self._tail
+        if not tail.full:
+            wanted = len(data) if tail.limit is None else min(len(data), tail.limit - tail.size)
+            granted = self._budget.take(wanted)
+            tail.append(data[:granted])
+            if granted < wanted:
+                self.budget_exceeded = True
+                tail.full = True
+            elif tail.limit is not None and tail.size == tail.limit:
+                tail.full = True
+            data = data[granted:]
+
+        if data and tail.full and tail.size > 0:
+            tail.overwrite(data)
+
+    def finish(self):
+        """
+        Function writes the tail to the output.
+
+        Returns:
+        int: Number of bytes dropped.
+        """
+        dropped = self.total_bytes - self.collected_bytes - self._tail.size
+        if dropped > 0:
+            self._output.write(get_truncation_marker(dropped))
+        self._tail.copy_to(self._output)
+        self.collected_bytes += self._tail.size
+        return dropped
+
+
+class TruncatedReader:
+    """
+    Reads head and tail of a file with a truncation marker in between.
+    """
+
+    def __init__(self, src_file, ranges, marker):
+        self._src_file = src_file
+        self._parts = [ranges[0], marker, ranges[1]]
+
+    def fileno(self):
+        """
+        Function returns file descriptor of the file.
+        """
+        return self._src_file.fileno()
+
+    def read(self, size=-1):
+        """
+        Function reads up to size bytes, less only at the end.
+        """
+        chunks = []
+        while self._parts and size != 0:
+            part = self._parts[0]
+            if isinstance(part, bytes):
+                length = len(part) if size < 0 else min(size, len(part))
+                data = part[:length]
+                self._parts[0] = part[length:]
+                done = not self._parts[0]
+            else:
+                start, end = part
+                length = end - start if size < 0 else min(size, end - start)
+                self._src_file.seek(start)
+                data = self._src_file.read(length)
+                self._parts[0] = (start + len(data), end)
+                # A file which shrank ends early, SizedReader pads it
+                done = not data or start + len(data) >= end
+            if done:
+                self._parts.pop(0)
+            chunks.append(data)
+            if size > 0:
+                size -= len(data)
+        return b"".join(chunks)
+
+
+class LimitedWriter:
+    """
+    Report writer enforcing the maximum size of artifacts of a spec and the report budget while the artifacts
+    are written. Truncated artifacts are recorded in the manifest.
+    """
+
+    def __init__(self, writer, budget, max_bytes=None, strategy=DEFAULT_TRUNCATE_STRATEGY):
+        self._writer = writer
+        self._budget = budget
+        self._max_bytes = max_bytes
+        self._strategy = strategy
+
+    def for_spec(self, spec):
+        """
+        Function returns writer of artifacts of the spec with optional "max_bytes" and "truncate" keys.
+        """
+        return LimitedWriter(self._writer, self._budget, spec.get("max_bytes"),
+                             spec.get("truncate", DEFAULT_TRUNCATE_STRATEGY))
+
+    def _is_limited(self):
+        return self._max_bytes is not None or self._budget.is_limited()
+
+    def _record(self, name, original_bytes, collected_bytes, budget_exceeded):
+        self._budget.manifest.add_truncation(
+            name, strategy=self._strategy, max_bytes=self._max_bytes, original_bytes=original_bytes,
+            collected_bytes=collected_bytes, reason="budget" if budget_exceeded else "max_bytes")
+
+    def add_directory(self, name):
+        """
+        Function adds an empty report directory.
+        """
+        self._writer.add_directory(name)
+
+    @contextlib.contextmanager
+    def output_file(self, name):
+        """
+        Function opens output the artifact is written to, see ArchiveReportWriter.output_file.
+        TruncatingOutput without a file descriptor is opened when the artifact size is limited.
+        """
+        with self._writer.output_file(name) as output:
+            if not self._is_limited():
+                yield output
+                return
+            truncating = TruncatingOutput(output, self._max_bytes, self._strategy, self._budget)
+            yield truncating
+            if truncating.finish() > 0:
+                self._record(name, truncating.total_bytes, truncating.collected_bytes, truncating.budget_exceeded)
+
+    def add_bytes(self, name, data):
+        """
+        Function adds artifact with given contents.
+        """
+        if not self._is_limited():
+            self._writer.add_bytes(name, data)
+            return
+        with self.output_file(name) as output:
+            output.write(data)
+
+    def add_file(self, src_file, name, size=None):
+        """
+        Function adds the rest of an open file, see ArchiveReportWriter.add_file. The head and tail of a file
+        exceeding the limit are read directly from the file.
+        """
+        if size is None:
+            with self.output_file(name) as output:
+                shutil.copyfileobj(src_file, output)
+            return
+
+        limit = size if self._max_bytes is None else min(size, self._max_bytes)
+        granted = self._budget.take(limit)
+        if granted >= size:
+            self._writer.add_file(src_file, name, size)
+            return
+
+        start = src_file.tell()
+        head, tail = split_limit(granted, self._strategy)
+        marker = get_truncation_marker(size - head - tail)
+        reader = TruncatedReader(src_file, [(start, start + head), (start + size - tail, start + size)], marker)
+        self._writer.add_file(reader, name, head + len(marker) + tail)
+        self._record(name, size, head + tail, granted < limit)
+
+    def close(self):
+        """
+        Function finishes the report.
+        """
+        self._writer.close()
@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+# pylint: disable=bad-option-value,useless-option-value # (no-self-use was removed in pylint 2.14)
+# pylint: disable=no-self-use # (pytest stylistic convention)
+
+""" Unittests for log_collector_budget.py file """
+
+import io
+import pytest
+import log_collector_budget
+
+DATA = b"0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _write_truncated(data, max_bytes, strategy, budget_bytes=0, chunk_size=3):
+    output = io.BytesIO()
+    truncating = log_collector_budget.TruncatingOutput(
+        output, max_bytes, strategy, log_collector_budget.ReportBudget(None, budget_bytes))
+    for start in range(0, len(data), chunk_size):
+        truncating.write(data[start:start + chunk_size])
+    dropped = truncating.finish()
+    return output.getvalue(), dropped, truncating
+
+
+def _marker(dropped):
+    return log_collector_budget.get_truncation_marker(dropped)
+
+
+class TestTruncatingOutput:
+    ''' Tests for TruncatingOutput class '''
+
+    def test_small_stream_is_kept(self):
+        ''' Test if stream within the limit is written as is '''
+
+        output, dropped, truncating = _write_truncated(DATA, len(DATA), "head+tail")
+
+        assert output == DATA
+        assert dropped == 0
+        assert truncating.collected_bytes == len(DATA)
+
+    @pytest.mark.parametrize("chunk_size", [1, 3, 7, 100])
+    def test_head_and_tail(self, chunk_size):
+        ''' Test if head+tail keeps both ends with the marker in between, whatever the write sizes are '''
+
+        output, dropped, truncating = _write_truncated(DATA, 11, "head+tail", chunk_size=chunk_size)
+
+        assert output == DATA[:6] + _marker(len(DATA) - 11) + DATA[-5:]
+        assert dropped == len(DATA) - 11
+        assert truncating.collected_bytes == 11
+        assert truncating.total_bytes == len(DATA)
+        assert not truncating.budget_exceeded
+
+    @pytest.mark.parametrize("strategy, expected", [
+        ("head", DATA[:10] + _marker(len(DATA) - 10)),
+        ("tail", _marker(len(DATA) - 10) + DATA[-10:]),
+    ])
+    def test_head_or_tail(self, strategy, expected):
+        ''' Test if head and tail strategies keep one end only '''
+
+        assert _write_truncated(DATA, 10, strategy, chunk_size=4)[0] == expected
+
+    def test_budget_runs_out_in_head(self):
+        ''' Test if the stream without size limit is cut with the marker when the budget runs out '''
+
+        output, dropped, truncating = _write_truncated(DATA, None, "head+tail", budget_bytes=8)
+
+        assert output == DATA[:8] + _marker(len(DATA) - 8)
+        assert dropped == len(DATA) - 8
+        assert truncating.budget_exceeded
+
+    def test_budget_runs_out_in_tail(self):
+        ''' Test if the tail gets only the budget left after the head, keeping the last bytes '''
+
+        output, dropped, truncating = _write_truncated(DATA, 10, "head+tail", budget_bytes=7)
+
+        assert output == DATA[:5] + _marker(len(DATA) - 7) + DATA[-2:]
+        assert dropped == len(DATA) - 7
+        assert truncating.budget_exceeded
+
+    def test_budget_is_shared(self):
+        ''' Test if streams take from one budget, the later one gets only what is left '''
+
+        budget = log_collector_budget.ReportBudget(None, 12)
+        outputs = []
+        for _ in range(2):
+            output = io.BytesIO()
+            truncating = log_collector_budget.TruncatingOutput(output, 10, "head", budget)
+            truncating.write(DATA)
+            truncating.finish()
+            outputs.append(output.getvalue())
+
+        assert outputs == [DATA[:10] + _marker(len(DATA) - 10), DATA[:2] + _marker(len(DATA) - 2)]
+
+    def test_used_up_budget(self):
+        ''' Test if nothing but the marker is written when the budget is used up '''
+
+        budget = log_collector_budget.ReportBudget(None, 1)
+        budget.take(1)
+        output = io.BytesIO()
+        truncating = log_collector_budget.TruncatingOutput(output, 10, "head+tail", budget)
+        truncating.write(DATA)
+
+        assert truncating.finish() == len(DATA)
+        assert output.getvalue() == _marker(len(DATA))
+
+
+class TestTruncatedReader:
+    ''' Tests for TruncatedReader class '''
+
+    @pytest.mark.parametrize("size", [-1, 1, 4, 100])
+    def test_read(self, size):
+        ''' Test if head, marker and tail are read in order whatever the read sizes are '''
+
+        reader = log_collector_budget.TruncatedReader(io.BytesIO(DATA), [(2, 6), (30, 36)], b"[...]")
+        chunks = []
+        chunk = reader.read(size)
+        while chunk:
+            chunks.append(chunk)
+            chunk = reader.read(size)
+
+        assert b"".join(chunks) == DATA[2:6] + b"[...]" + DATA[30:]
+
+
+class TestSplitLimit:
+    ''' Tests for split_limit function '''
+
+    @pytest.mark.parametrize("limit, strategy, expected", [
+        (11, "head+tail", (6, 5)),
+        (10, "head", (10, 0)),
+        (10, "tail", (0, 10)),
+        (None, "head+tail", (None, 0)),
+        (None, "tail", (0, None)),
+    ])
+    def test_split_limit(self, limit, strategy, expected):
+        ''' Test split of the limit to head and tail '''
+
+        assert log_collector_budget.split_limit(limit, strategy) == expected
@@ -0,0 +1,158 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+"""
+Reading of the systemd journal by Log-Collector, once for all collected units.
+"""
+
+import contextlib
+import json
+import logging
+import os
+import shlex
+import subprocess # nosec - B404
+import threading
+import time
+
+from log_collector_runner import kill_process_group
+
+# Journal fields of the unit an entry belongs to, matched the way "journalctl -u" does
+JOURNAL_UNIT_FIELDS = ("_SYSTEMD_UNIT", "UNIT", "OBJECT_SYSTEMD_UNIT", "COREDUMP_UNIT")
+
+
+def get_journal_command(com, since=None, cursor=None):
+    """
+    Function builds command reading the whole journal as JSON from the per-service journalctl command.
+
+    Parameters:
+    com (string): Configured command with <SERVICE> placeholder, e.g. "sudo journalctl -u <SERVICE>".
+    since (string): Read only entries not older than since, all if None.
+    cursor (string): Read only entries after the entry with the cursor, all if None.
+
+    Returns:
+    list: Command arguments, None if the command does not run journalctl.
+    """
+    args = shlex.split(com)
+    if not any(os.path.basename(arg) == "journalctl" for arg in args):
+        return None
+
+    command = []
+    skip_next = False
+    for arg in args:
+        if skip_next:
+            skip_next = False
+        elif arg in ("-u", "--unit"):
+            skip_next = True
+        elif "<SERVICE>" not in arg:
+            command.append(arg)
+    command += ["-o", "json", "--all", "--no-pager"]
+    if since is not None:
+        command += ["--since", since]
+    if cursor is not None:
+        command += [f"--after-cursor={cursor}"]
+    return command
+
+
+def format_journal_entry(entry):
+    """
+    Function formats journal JSON entry the way the default journalctl output does.
+
+    Parameters:
+    entry (dict): Journal entry.
+
+    Returns:
+    string: Log line.
+    """
+    timestamp = time.localtime(int(entry.get("__REALTIME_TIMESTAMP", 0)) / 1000000)
+    identifier = entry.get("SYSLOG_IDENTIFIER") or entry.get("_COMM") or "unknown"
+    pid = entry.get("SYSLOG_PID") or entry.get("_PID")
+    message = entry.get("MESSAGE")
+    if isinstance(message, list):
+        # Binary messages are exported as arrays of bytes
+        message = bytes(message).decode("utf-8", "replace")
+    elif message is None:
+        message = ""
+    pid_part = f"[{pid}]" if pid else ""
+    return f"{time.strftime('%b %d %H:%M:%S', timestamp)} {entry.get('_HOSTNAME', '')} {identifier}{pid_part}: " \
+           f"{message}\n"
+
+
+def get_entry_unit(entry, paths):
+    """
+    Function returns unit of the journal entry being collected, None if it is not collected.
+
+    Parameters:
+    entry (dict): Journal entry.
+    paths (dict): Collected units mapped to their logs file paths.
+    """
+    for field in JOURNAL_UNIT_FIELDS:
+        unit = entry.get(field)
+        if not isinstance(unit, str):
+            continue
+        if unit in paths:
+            return unit
+        if "@" in unit:
+            # Instances of template units, e.g. getty@tty1.service, go to the template logs file
+            name, _, suffix = unit.partition("@")
+            template = f"{name}@.{suffix.rpartition('.')[2]}"
+            if template in paths:
+                return template
+    return None
+
+
+def demux_journal(writer, command, paths, timeout=None, on_cursor=None):
+    """
+    Function reads the journal once and writes entries of every unit to its logs file.
+
+    Parameters:
+    writer (LimitedWriter): Writer of the report.
+    command (list): Command printing the journal as JSON, see get_journal_command.
+    paths (dict): Units mapped to report paths of their logs files.
+    timeout (float): Time in seconds after which the reading is stopped, None means no limit.
+    on_cursor (callable): Called with cursor of the last entry read when the whole journal was read.
+
+    Returns:
+    (int, bool): journalctl exit code (None if it was killed) and flag whether it timed out.
+    """
+    logging.debug("Demultiplexing journal of %d units: %s", len(paths), " ".join(command))
+    files = {}
+    cursor = None
+    timed_out = threading.Event()
+    with contextlib.ExitStack() as outputs:
+        with subprocess.Popen(command, # nosec - B603
+                              stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL,
+                              start_new_session=True) as process:
+            timer = None
+            if timeout is not None:
+                timer = threading.Timer(timeout, lambda: (timed_out.set(), kill_process_group(process)))
+                timer.start()
+            try:
+                for line in process.stdout:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    cursor = entry.get("__CURSOR", cursor)
+                    unit = get_entry_unit(entry, paths)
+                    if unit is None:
+                        continue
+                    if unit not in files:
+                        files[unit] = outputs.enter_context(writer.output_file(paths[unit]))
+                    files[unit].write(format_journal_entry(entry).encode("utf-8"))
+                exit_code = process.wait()
+            finally:
+                if timer is not None:
+                    timer.cancel()
+
+    for unit, path in paths.items():
+        if unit not in files:
+            writer.add_bytes(path, b"-- No entries --\n")
+
+    if timed_out.is_set():
+        logging.error("Reading journal timed out after %.1f seconds", timeout)
+        return None, True
+    if exit_code != 0:
+        logging.error("Reading journal failed with exit code: %d", exit_code)
+    elif cursor is not None and on_cursor is not None:
+        on_cursor(cursor)
+    return exit_code, False
@@ -0,0 +1,177 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+"""
+Concurrent command runner of Log-Collector with per-command timeouts and a time budget.
+"""
+
+import functools
+import logging
+import os
+import signal
+import subprocess # nosec - B404
+import threading
+import time
+from concurrent import futures
+
+from log_collector_budget import TruncatingOutput
+
+DEFAULT_JOBS = 8
+DEFAULT_COMMAND_TIMEOUT = 600
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+def kill_process_group(process):
+    """
+    Function kills process started in a new session together with its children.
+
+    Parameters:
+    process (Popen): Process to kill.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        process.kill()
+
+
+def run_command(command, output_file, timeout=None):
+    """
+    Function runs command and save its result to file.
+
+    Parameters:
+    command(string): Command to run.
+    output_file(file): File object with a file descriptor to save results to, or TruncatingOutput the output
+                       is piped to.
+    timeout(float): Time in seconds after which the command is killed, None means no limit.
+
+    Returns:
+    (int, bool): Command exit code (None if it was killed) and flag whether it timed out.
+    """
+    logging.debug("Running command: %s", command)
+    piped = isinstance(output_file, TruncatingOutput)
+    # New session, so the whole process group (e.g. sudo and the command it runs) is killed on timeout
+    with subprocess.Popen(command,
+                          shell=True, # nosec - B602
+                          stdout=subprocess.PIPE if piped else output_file,
+                          stderr=subprocess.STDOUT,
+                          start_new_session=True) as process:
+        if piped:
+            return _copy_command_output(command, process, output_file, timeout)
+        try:
+            exit_code = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logging.error("Command \"%s\" timed out after %.1f seconds", command, timeout)
+            kill_process_group(process)
+            process.wait()
+            return None, True
+
+    if exit_code != 0:
+        logging.error("Command \"%s\" failed with exit code: %d", command, exit_code)
+    logging.debug("Running command finished.")
+    return exit_code, False
+
+
+def _copy_command_output(command, process, output_file, timeout):
+    timed_out = threading.Event()
+    timer = None
+    if timeout is not None:
+        timer = threading.Timer(timeout, lambda: (timed_out.set(), kill_process_group(process)))
+        timer.start()
+    try:
+        for data in iter(functools.partial(process.stdout.read, COPY_BUFFER_SIZE), b""):
+            output_file.write(data)
+        exit_code = process.wait()
+    finally:
+        if timer is not None:
+            timer.cancel()
+
+    if timed_out.is_set():
+        logging.error("Command \"%s\" timed out after %.1f seconds", command, timeout)
+        return None, True
+    if exit_code != 0:
+        logging.error("Command \"%s\" failed with exit code: %d", command, exit_code)
+    logging.debug("Running command finished.")
+    return exit_code, False
+
+
+class CommandRunner:
+    """
+    Runs commands concurrently in a thread pool, each with its timeout, within a wall-clock budget
+    of the whole collection. Results are recorded in the manifest.
+    """
+
+    def __init__(self, manifest, writer, jobs=DEFAULT_JOBS, default_timeout=DEFAULT_COMMAND_TIMEOUT, # pylint: disable=too-many-arguments
+                 time_budget=0):
+        self.manifest = manifest
+        self.writer = writer
+        self.default_timeout = default_timeout
+        self.deadline = time.monotonic() + time_budget if time_budget > 0 else None
+        self._executor = futures.ThreadPoolExecutor(max_workers=max(jobs, 1))
+        self._pending = []
+
+    def submit(self, command, name, timeout=None, writer=None):
+        """
+        Function schedules command, its output is saved to the report file name.
+
+        Parameters:
+        command (string): Command to run.
+        name (string): Report path to save results.
+        timeout (float): Command timeout in seconds, the default timeout is used if None.
+        writer (LimitedWriter): Writer of the output, the runner writer is used if None.
+        """
+        self.submit_task(command, name, functools.partial(self._run_command, command, name, writer or self.writer),
+                         timeout)
+
+    def submit_task(self, description, name, task, timeout=None):
+        """
+        Function schedules a collection task which is not a single shell command.
+
+        Parameters:
+        description (string): Command or description of the task recorded in the manifest.
+        name (string): Report path of the task output file or directory.
+        task (callable): Callable taking timeout (None means no limit), returning (exit code, timed out flag).
+        timeout (float): Task timeout in seconds, the default timeout is used if None.
+        """
+        self._pending.append(self._executor.submit(self._run, description, name, task, timeout))
+
+    def wait(self):
+        """
+        Function waits until all submitted commands finish.
+        """
+        for pending in futures.as_completed(self._pending):
+            pending.result()
+        self._pending = []
+
+    def shutdown(self):
+        """
+        Function waits for submitted commands and releases the worker threads.
+        """
+        self.wait()
+        self._executor.shutdown()
+
+    @staticmethod
+    def _run_command(command, name, writer, timeout):
+        with writer.output_file(name) as output:
+            return run_command(command, output, timeout)
+
+    def _run(self, command, name, task, timeout):
+        timeout = self.default_timeout if timeout is None else timeout
+        if self.deadline is not None:
+            remaining = self.deadline - time.monotonic()
+            if remaining <= 0:
+                logging.error("Command \"%s\" skipped, collection time budget exceeded", command)
+                self.manifest.add_command(command, name, status="skipped", exit_code=None, duration=0)
+                return
+            timeout = min(timeout, remaining) if timeout else remaining
+
+        start = time.monotonic()
+        try:
+            exit_code, timed_out = task(timeout or None)
+        except OSError as e:
+            logging.error("Command \"%s\" could not be run: %s", command, e)
+            exit_code, timed_out = None, False
+        if timed_out:
+            status = "timeout"
+        else:
+            status = "ok" if exit_code == 0 else "failed"
+        self.manifest.add_command(command, name, status=status, exit_code=exit_code,
+                                  duration=round(time.monotonic() - start, 3))
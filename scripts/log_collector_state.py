@@ -0,0 +1,191 @@
+# SPDX-License-Identifier: Apache-2.0
+# Copyright (c) 2022 Intel Corporation
+"""
+Incremental collection state of Log-Collector persisted between runs.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_STATE_FILE = "log_collector_state.json"
+STATE_VERSION = 1
+# Files up to this size are hashed, so rewritten but unchanged files (e.g. configs) are not collected again
+HASH_MAX_SIZE = 1024 * 1024
+# Size of the end of a collected file checked to tell appending to the file from rewriting it
+TAIL_HASH_SIZE = 4096
+
+
+def hash_file_range(src_file, start, end):
+    """
+    Function returns SHA-256 hex digest of the part of the file.
+
+    Parameters:
+    src_file (file): Binary file object.
+    start (int): Offset of the first byte.
+    end (int): Offset after the last byte.
+    """
+    digest = hashlib.sha256()
+    src_file.seek(start)
+    remaining = end - start
+    while remaining > 0:
+        data = src_file.read(min(remaining, 1024 * 1024))
+        if not data:
+            break
+        digest.update(data)
+        remaining -= len(data)
+    return digest.hexdigest()
+
+
+class IncrementalState:
+    """
+    State of incremental collection persisted between runs: time of the collection, cursors of the journal
+    reads and device, inode, size and hashes of the collected files.
+
+    A file with the same inode that only grew since the previous collection, with unchanged end of the previously
+    collected part, is collected from the previous size on. Files which did not change, or whose contents hash
+    did not change, are not collected. Files are also matched by inode, so rotated logs are not collected again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.start_time = time.time()
+        self.previous = self._read()
+        self._files_by_inode = {(record["device"], record["inode"]): record
+                                for record in self.previous.get("files", {}).values()}
+        self._cursors = dict(self.previous.get("journal_cursors", {}))
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path) as state_file:
+                previous = json.load(state_file)
+        except FileNotFoundError:
+            logging.info("No incremental state file \"%s\", collecting everything", self.path)
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning("Failed to read incremental state file \"%s\", collecting everything: %s", self.path, e)
+            return {}
+        if not isinstance(previous, dict) or previous.get("version") != STATE_VERSION:
+            logging.warning("Unsupported incremental state file \"%s\", collecting everything", self.path)
+            return {}
+        return previous
+
+    def get_manifest_info(self):
+        """
+        Function returns manifest section referencing the previous report.
+        """
+        return {"previous_report": self.previous.get("report"), "previous_time": self.previous.get("time")}
+
+    def get_previous_time(self):
+        """
+        Function returns time of the previous collection in seconds since the epoch, None if there was none.
+        """
+        return self.previous.get("time")
+
+    def get_journal_since(self):
+        """
+        Function returns time of the previous collection in "journalctl --since" format, None if there was none.
+        """
+        if "time" not in self.previous:
+            return None
+        return f"@{int(self.previous['time'])}"
+
+    def get_journal_cursor(self, key):
+        """
+        Function returns cursor of the last journal entry read by the previous collection, None if there is none.
+        """
+        with self._lock:
+            return self._cursors.get(key)
+
+    def set_journal_cursor(self, key, cursor):
+        """
+        Function stores cursor of the last journal entry read.
+        """
+        with self._lock:
+            self._cursors[key] = cursor
+
+    def select_file(self, path, src_file, src_stat):
+        """
+        Function checks which part of the file has to be collected.
+
+        Parameters:
+        path (string): Path of the file.
+        src_file (file): Binary file object of the file.
+        src_stat (os.stat_result): Status of the file.
+
+        Returns:
+        (string, int, dict): Status ("full", "appended" or "unchanged"), offset the file is collected from and
+                             the previous collection record of the file (None if there is none).
+        """
+        previous = self.previous.get("files", {}).get(path)
+        if previous is None or (previous["device"], previous["inode"]) != (src_stat.st_dev, src_stat.st_ino):
+            previous = self._files_by_inode.get((src_stat.st_dev, src_stat.st_ino))
+
+        if previous is not None and (previous["device"], previous["inode"]) == (src_stat.st_dev, src_stat.st_ino):
+            if src_stat.st_size == previous["size"] and src_stat.st_mtime_ns == previous["mtime_ns"]:
+                return "unchanged", previous["size"], previous
+            if previous["size"] <= src_stat.st_size and previous.get("tail_sha256") == hash_file_range(
+                    src_file, max(0, previous["size"] - TAIL_HASH_SIZE), previous["size"]):
+                status = "appended" if src_stat.st_size > previous["size"] else "unchanged"
+                return status, previous["size"], previous
+
+        if previous is not None and previous.get("sha256") is not None and src_stat.st_size <= HASH_MAX_SIZE:
+            if hash_file_range(src_file, 0, src_stat.st_size) == previous["sha256"]:
+                return "unchanged", src_stat.st_size, previous
+        return "full", 0, previous
+
+    def record_file(self, path, name, src_file, src_stat):
+        """
+        Function stores state of the collected file.
+
+        Parameters:
+        path (string): Path of the file.
+        name (string): Report path of the file.
+        src_file (file): Binary file object of the file.
+        src_stat (os.stat_result): Status of the file when it was collected.
+        """
+        size = src_stat.st_size
+        record = {
+            "file": name,
+            "device": src_stat.st_dev,
+            "inode": src_stat.st_ino,
+            "size": size,
+            "mtime_ns": src_stat.st_mtime_ns,
+            "tail_sha256": hash_file_range(src_file, max(0, size - TAIL_HASH_SIZE), size),
+            "sha256": hash_file_range(src_file, 0, size) if size <= HASH_MAX_SIZE else None,
+        }
+        with self._lock:
+            self._files[path] = record
+
+    def save(self, report):
+        """
+        Function writes the state of this collection to the state file.
+
+        Parameters:
+        report (string): Path of the report of this collection.
+        """
+        with self._lock:
+            state = {
+                "version": STATE_VERSION,
+                "report": report,
+                "time": self.start_time,
+                "journal_cursors": self._cursors,
+                "files": self._files,
+            }
+        state_dir = os.path.dirname(os.path.abspath(self.path))
+        try:
+            os.makedirs(state_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=state_dir, prefix=".log_collector_state.",
+                                             delete=False) as state_file:
+                json.dump(state, state_file)
+            os.replace(state_file.name, self.path)
+        except OSError as e:
+            logging.error("Failed to write incremental state file \"%s\": %s", self.path, e)
+            return False
+        return True
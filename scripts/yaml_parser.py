@@ -5,11 +5,196 @@ This script automatizes generating list of components used in Smart Edge Experie
 """
 
 import argparse
+from concurrent import futures
 import csv
+import functools
+import hashlib
 import io
+import json
 import os
 from pathlib import Path
+import re
 import sys
+import tempfile
+
+# Modules shared with deploy.py live in the experience kit root directory
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from deployment_handlers import inventory_cache # pylint: disable=wrong-import-position
+from deployment_handlers import resolved_vars # pylint: disable=wrong-import-position
+
+# Kinds of lines recognized by the scanner of yaml files
+LINE_WHEN = "when"
+LINE_FIELD = "field"
+LINE_COMMENT = "comment"
+LINE_OTHER = "other"
+
+# Bumped whenever results of parse_file change for the same input
+CACHE_VERSION = 2
+
+
+class ComponentCatalog:
+    """ Components indexed by (role, name) in order of their first occurrence """
+    def __init__(self) -> None:
+        self.__components = {}
+
+    def add(self, component, merge=None):
+        """ Add component, the already added one with the same key is passed to merge(existing, component) """
+        key = (component["role"], component["name"])
+        existing = self.__components.get(key)
+        if existing is None:
+            self.__components[key] = component
+        elif merge is not None:
+            merge(existing, component)
+
+    def __iter__(self):
+        return iter(self.__components.values())
+
+    def __len__(self):
+        return len(self.__components)
+
+
+@functools.lru_cache(maxsize=None)
+def get_field_re(allowed_fields):
+    """ Returns pattern of a single line comment with an allowed field, e.g. "# Name: value" """
+    fields = "|".join(re.escape(field) for field in allowed_fields)
+    # trailing hashes are not part of the value
+    return re.compile(rf"#(?!#)\s*({fields}):(.*?)#*", re.IGNORECASE)
+
+
+def scan_line(line, field_re):
+    """ Returns (kind, field, value) of the stripped line, field and value are set for LINE_FIELD only """
+    if line.startswith("when:"):
+        return LINE_WHEN, None, None
+    if line.startswith("#") and not line.startswith("##"):
+        match = field_re.fullmatch(line)
+        if match:
+            return LINE_FIELD, match.group(1).lower(), match.group(2).strip()
+        return LINE_COMMENT, None, None
+    return LINE_OTHER, None, None
+
+
+def create_base_comment_dict(filename, prev_line, allowed_fields):
+    """ Returns component with the role taken from the line preceding its comment """
+    tmp_dict = dict.fromkeys(allowed_fields)
+    prev_line = prev_line.split(":")
+    if filename.name == "default_config.yml":
+        tmp_dict["role"] = prev_line[0]
+    elif len(prev_line) > 1:
+        tmp_dict["role"] = ":".join(prev_line[1:]).strip()
+
+    return tmp_dict
+
+
+def parse_playbook_lines(lines, filename, allowed_fields):
+    """ Returns {"components": [...], "statuses": [[role, "when:" line or None for enabled], ...]} of the file """
+    field_re = get_field_re(tuple(allowed_fields))
+    components = []
+    statuses = []
+    prev_line = None
+    tmp_dict = {}
+    prev_role = None
+
+    def add_comment(tmp_dict):
+        if tmp_dict["role"] is None:
+            tmp_dict["role"] = prev_role
+        components.append(tmp_dict)
+
+    for line in lines:
+        line = line.strip()
+        kind, field, value = scan_line(line, field_re)
+        if kind == LINE_WHEN and tmp_dict:
+            statuses.append([tmp_dict["role"], line])
+        elif kind == LINE_FIELD:
+            if not tmp_dict:
+                tmp_dict = create_base_comment_dict(filename, prev_line, allowed_fields)
+            tmp_dict[field] = value
+            if tmp_dict["role"]:
+                prev_role = tmp_dict["role"]
+                statuses.append([prev_role, None])
+        elif kind == LINE_OTHER and tmp_dict:
+            add_comment(tmp_dict)
+            tmp_dict = {}
+
+        prev_line = line
+
+    if tmp_dict:
+        add_comment(tmp_dict)
+        if prev_line.startswith("when:"):
+            statuses.append([tmp_dict["role"], prev_line])
+
+    return {"components": components, "statuses": statuses}
+
+
+def parse_file(filename, allowed_fields):
+    """ Returns (SHA-256 of contents, parse result) of the file, run in worker processes of the parse pool """
+    with open(filename, "rb") as file:
+        data = file.read()
+    lines = io.StringIO(data.decode("UTF-8"), newline=None)
+    return hashlib.sha256(data).hexdigest(), parse_playbook_lines(lines, Path(filename), allowed_fields)
+
+
+def hash_file(filename):
+    """ Returns SHA-256 of the file contents """
+    sha256 = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ParseCache:
+    """ JSON file with parse results of files keyed by path.
+
+    A result is reused without reading the file while its modification time and size do not change,
+    and without parsing it while the SHA-256 of its contents does not change.
+    """
+    def __init__(self, path, allowed_fields) -> None:
+        self.__path = path
+        self.__fingerprint = [CACHE_VERSION, list(allowed_fields)]
+        self.__entries = self.__read() if path else {}
+        self.__changed = False
+
+    def __read(self):
+        try:
+            with open(self.__path, encoding="UTF-8") as file:
+                cache = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict) or cache.get("fingerprint") != self.__fingerprint:
+            return {}
+        return cache.get("files", {})
+
+    def lookup(self, filename, stat):
+        """ Returns cached result of the file, None if the file may have changed since it was cached """
+        entry = self.__entries.get(filename)
+        if entry is None:
+            return None
+        if entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+            return entry["result"]
+        if entry["size"] == stat.st_size and entry["sha256"] == hash_file(filename):
+            self.update(filename, stat, entry["sha256"], entry["result"])
+            return entry["result"]
+        return None
+
+    def update(self, filename, stat, digest, result):
+        """ Stores parse result of the file """
+        if not self.__path:
+            return
+        self.__entries[filename] = {
+            "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha256": digest, "result": result}
+        self.__changed = True
+
+    def save(self):
+        """ Writes cache file if it has changed """
+        if not self.__path or not self.__changed:
+            return
+        cache_dir = os.path.dirname(os.path.abspath(self.__path))
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile("w", dir=cache_dir, prefix=".yaml_parser_cache.", encoding="UTF-8",
+                                         delete=False) as file:
+            json.dump({"fingerprint": self.__fingerprint, "files": self.__entries}, file)
+        os.replace(file.name, self.__path)
+        self.__changed = False
 
 
 class Comments:
@@ -31,29 +216,19 @@ class Comments:
             "single_node_network_edge.yml",
             "network_edge.yml",
              "default_config.yml"]
-        self.list_of_comments = []
+        self.list_of_comments = ComponentCatalog()
         self.ek_directory = Path()
-        self.__ek_settings = {}
+        self.__resolved_vars = resolved_vars.ResolvedVars({})
         self.__role_status_dict = {}
 
     def combine(self, files=None, input_dir=None, output=None):
         """ Combine fields from comments  """
-        self.list_of_comments = []
+        self.list_of_comments = ComponentCatalog()
         files = self.__get_csv_files(files, input_dir)
 
         for file in files:
             self.__read_csv(file)
 
-        seen = set()
-        out = {}
-        for comment in self.list_of_comments:
-            id_tuple = (comment["role"], comment["name"])
-            if (id_tuple) not in seen:
-                out[id_tuple] = comment
-                seen.add(id_tuple)
-            elif comment['ek'] not in out[id_tuple]["ek"]:
-                out[id_tuple]["ek"] = out[id_tuple]["ek"] + f", {comment['ek']}"
-        self.list_of_comments = out.values()
         fieldnames = self.allowed_fields + ["ek"]
         fieldnames.remove("status")
         if output is None:
@@ -65,20 +240,24 @@ class Comments:
             fieldnames=fieldnames
             )
 
-    def parse_ek(self, files=None, input_dir=None, restricted_files = False):
-        """ Loader for yaml files """
+    def parse_ek(self, files=None, input_dir=None, restricted_files = False, jobs=1, cache_path=None):
+        """ Loader for yaml files
+
+        jobs - number of processes parsing files not found in the cache
+        cache_path - path of the ParseCache file, None disables caching
+        """
         if input_dir:
             self.ek_directory = Path(input_dir).resolve()
         else:
             cwd = Path(os.getcwd())
             self.ek_directory = cwd
+        cache = ParseCache(cache_path, self.allowed_fields)
         self.__load_default_settings()
         yaml_files = self.__get_yaml_files(restricted_files)
         if files:
             yaml_files.extend(files)
-        for filename in yaml_files:
-            self.__load_yml_file(Path(filename))
-        self.list_of_comments = [dict(t) for t in {tuple(d.items()) for d in self.list_of_comments}]
+        self.__load_yml_files(yaml_files, cache, jobs)
+        cache.save()
 
     def parse_virgo(self,input_dir=None,):
         """ Loader for yaml files (virgo repository specific)"""
@@ -91,8 +270,7 @@ class Comments:
             "controller/helm/smart-edge-commercial/templates/deployments").resolve()
         yaml_files = self.__get_yaml_files(restricted_files=False, input_dir=controller_main_dir)
 
-        for filename in yaml_files:
-            self.__load_yml_file(Path(filename))
+        self.__load_yml_files(yaml_files)
 
     def to_csv(self, fieldnames=None):
         """ Generate csv """
@@ -133,16 +311,6 @@ class Comments:
         with open(name, "w", newline='', encoding='UTF-8') as file:
             file.write(data)
 
-    def __create_base_comment_dict(self, filename, prev_line):
-        tmp_dict = dict.fromkeys(self.allowed_fields)
-        prev_line = prev_line.split(":")
-        if filename.name == "default_config.yml":
-            tmp_dict["role"] = prev_line[0]
-        elif len(prev_line) > 1:
-            tmp_dict["role"] = ":".join(prev_line[1:]).strip()
-
-        return tmp_dict
-
     @staticmethod
     def __get_csv_files(files, input_dir):
         if files is None:
@@ -163,18 +331,13 @@ class Comments:
 
         return files
 
-    def __get_deployment_name(self):
+    def __get_inventory_doc(self):
         inventory_path = self.ek_directory.joinpath("inventory.yml")
-        with open(inventory_path, encoding='UTF-8') as file:
-            for line in file:
-                line = line.split("#")[0]
-                if "deployment:" in line and not "single_node_deployment:" in line:
-                    out = line.strip().split(":")[1].strip()
-                    break
-            else:
-                print("[ERROR] deployment name not found, exiting")
-                sys.exit(1)
-        return out
+        for doc in inventory_cache.load_inventory_docs(inventory_path):
+            if isinstance(doc, dict) and (doc.get("all") or {}).get("vars", {}).get("deployment"):
+                return doc
+        print("[ERROR] deployment name not found, exiting")
+        sys.exit(1)
 
     def __get_yaml_files(self, restricted_files, input_dir: Path=None) -> list:
         yaml_files = []
@@ -204,102 +367,94 @@ class Comments:
         return yaml_files
 
     @staticmethod
-    def __get_csv_file_content(filename):
-        out = []
-        if os.path.isfile(filename):
-            with open(filename, encoding='UTF-8') as file:
-                csv_reader = csv.reader(file, delimiter=",")
-                for row in csv_reader:
-                    out.append(row)
-        else:
+    def __iter_csv_rows(filename):
+        if not os.path.isfile(filename):
             print(f"file: {filename} cannot be found")
-        return out
+            return
+        with open(filename, encoding='UTF-8') as file:
+            yield from csv.reader(file, delimiter=",")
+
+    def __parse_files(self, filenames, cache, jobs):
+        """ Returns parse results of the existing files in their order, parsing only files missing in the cache
+
+        cache - ParseCache of the results
+        jobs - number of processes parsing files not found in the cache
+        """
+        results = {}
+        pending = []
+        for filename in filenames:
+            try:
+                stat = os.stat(filename)
+            except OSError:
+                continue
+            result = cache.lookup(str(filename), stat)
+            if result is None:
+                pending.append((filename, stat))
+            else:
+                results[filename] = result
+
+        parse = functools.partial(parse_file, allowed_fields=self.allowed_fields)
+        pending_files = [filename for filename, _ in pending]
+        if jobs > 1 and len(pending) > 1:
+            with futures.ProcessPoolExecutor(max_workers=min(jobs, len(pending))) as executor:
+                parsed = list(executor.map(parse, pending_files, chunksize=max(1, len(pending) // jobs)))
+        else:
+            parsed = map(parse, pending_files)
+
+        for (filename, stat), (digest, result) in zip(pending, parsed):
+            cache.update(str(filename), stat, digest, result)
+            results[filename] = result
+
+        return [results[filename] for filename in filenames if filename in results]
 
     def __load_default_settings(self):
-        deployment_name = self.__get_deployment_name()
+        inventory_doc = self.__get_inventory_doc()
+        inventory_vars = inventory_doc["all"]["vars"]
         self.__role_status_dict = {}
-        self.__ek_settings = {}
-        paths = [
-            self.ek_directory.joinpath("inventory/default"),
-            self.ek_directory.joinpath("deployments",deployment_name)]
-        settings_files = []
-        for path in paths:
-            files = []
-            settings_dir_path = path
-            for dname, _, filenames in os.walk(settings_dir_path):
-                for filename in filenames:
-                    files.append(settings_dir_path.joinpath(dname,filename))
-            settings_files.extend(files)
-        settings_files.sort(key = lambda x: x.name)
-
-        for settings_file in settings_files:
-            with open(settings_file, encoding='UTF-8') as file:
-                for line in file:
-                    line = line.strip().lower()
-                    if ("true" in line or "false" in line) and not line.startswith("#"):
-                        line = line.split(":")
-                        self.__ek_settings[line[0].lower()] = "".join(line[1:]).strip() in ["true"]
-
-    def __load_yml_file(self, filename):
-        filename = Path(filename).resolve()
-        if not os.path.isfile(filename):
-            print(f"File: {filename} cannot be found, skiping")
-            return
-
-        prev_line = None
-        tmp_dict = {}
-        prev_role = None
+        vars_files = resolved_vars.collect_vars_files(
+            self.ek_directory, inventory_vars["deployment"], inventory_vars.get("platform_profile"))
+        self.__resolved_vars = resolved_vars.ResolvedVars.from_inventory_doc(vars_files, inventory_doc)
 
-        with open(filename, encoding='UTF-8') as file:
-            for line in file:
-                line = line.strip()
-                if line.startswith("when:") and tmp_dict:
-                    self.__set_role_status(tmp_dict, line)
-                elif line.startswith("#") and not line.startswith("##"):
-                    split_comment = line.strip("#").strip().split(":")
-                    if (
-                        len(split_comment) > 1
-                        and split_comment[0].lower() in self.allowed_fields
-                    ):
-                        if not tmp_dict:
-                            tmp_dict = self.__create_base_comment_dict(filename, prev_line)
-                        tmp_dict[split_comment[0].lower()] = ":".join(split_comment[1:]).strip()
-                        if tmp_dict["role"]:
-                            prev_role = tmp_dict["role"]
-                            self.__role_status_dict[prev_role] = True
-                elif tmp_dict and tmp_dict not in self.list_of_comments:
-                    if tmp_dict["role"] is None:
-                        tmp_dict["role"] = prev_role
-                    self.list_of_comments.append(tmp_dict)
-                    tmp_dict = {}
-
-                prev_line = line
-
-            if tmp_dict and tmp_dict not in self.list_of_comments:
-                if tmp_dict["role"] is None:
-                    tmp_dict["role"] = prev_role
-                if prev_line.startswith("when:"):
-                    self.__set_role_status(tmp_dict, prev_line)
-
-                self.list_of_comments.append(tmp_dict)
+    def __load_yml_files(self, filenames, cache=None, jobs=1):
+        yaml_files = []
+        for filename in filenames:
+            filename = Path(filename).resolve()
+            if os.path.isfile(filename):
+                yaml_files.append(filename)
+            else:
+                print(f"File: {filename} cannot be found, skiping")
+
+        if cache is None:
+            cache = ParseCache(None, self.allowed_fields)
+        for result in self.__parse_files(yaml_files, cache, jobs):
+            for role, line in result["statuses"]:
+                if line is None:
+                    self.__role_status_dict[role] = True
+                else:
+                    self.__set_role_status(role, line)
+            for component in result["components"]:
+                self.list_of_comments.add(component)
 
     def __read_csv(self, filename):
-        data = self.__get_csv_file_content(filename)
-        if data and len(data) > 1:
-            for row in data[1:]:
+        rows = self.__iter_csv_rows(filename)
+        if next(rows, None) is not None:
+            for row in rows:
                 row_dict = dict(zip(self.allowed_fields, row))
                 row_dict["ek"] = filename.name.split("/")[-1].split(
                     "_")[0].replace("-", " ").strip(".csv")
                 if row_dict["status"].lower() == "enabled":
-                    self.list_of_comments.append(row_dict)
+                    self.list_of_comments.add(row_dict, merge=self.__merge_ek)
 
-    def __set_role_status(self, tmp_dict, line):
-        line = line.replace("'","").replace('"',"").replace(" ","")
-        conditional = "".join(line.split(":")[1:]).strip().lower().split("|")
-        if conditional[0] in self.__ek_settings:
-            self.__role_status_dict[tmp_dict["role"]] = self.__ek_settings[conditional[0]]
-        else:
-            self.__role_status_dict[tmp_dict["role"]] = "true" in conditional[1]
+    @staticmethod
+    def __merge_ek(existing, row_dict):
+        if row_dict["ek"] not in existing["ek"]:
+            existing["ek"] = existing["ek"] + f", {row_dict['ek']}"
+
+    def __set_role_status(self, role, line):
+        condition = line.split(":", 1)[1].strip().strip("'\"")
+        status = self.__resolved_vars.evaluate(condition)
+        if status is not None:
+            self.__role_status_dict[role] = status
 
 if __name__ == "__main__":
     c = Comments()
@@ -310,6 +465,9 @@ if __name__ == "__main__":
     |    Example: -in /experience/kit/directory"""
     FILES_HELP_MSG = """pass csv files, or directories
     |   Example: -f /experience/kits/file1.csv /experience/kits/file2.csv"""
+    JOBS_HELP_MSG = "number of processes parsing files, 1 parses them in this process"
+    CACHE_HELP_MSG = """set cache file of parsed files, only files changed since the previous run are parsed
+    |    Example: --Cache .yaml_parser_cache.json"""
     RESTRICT_HELP_MSG = f"""restricts parser to only specified files in root directory:
     {c.additional_files} except for allowed directories: {c.allowed_directories}"""
 
@@ -322,6 +480,8 @@ if __name__ == "__main__":
     parser.add_argument("-in", "--Input",   help=INPUT_HELP_MSG)
     parser.add_argument("-f",  "--Files",   help=FILES_HELP_MSG, nargs="+")
     parser.add_argument("-r",  "--Restrict",help=RESTRICT_HELP_MSG, action="store_true")
+    parser.add_argument("-j",  "--Jobs",    help=JOBS_HELP_MSG, type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--Cache",          help=CACHE_HELP_MSG)
     #parser.add_argument("-v",  "--Virgo", action="store_true")
     parser.parse_args()
 
@@ -345,7 +505,8 @@ if __name__ == "__main__":
 
     # else:
     c = Comments()
-    c.parse_ek(files=args.Files, input_dir=args.Input, restricted_files=args.Restrict)
+    c.parse_ek(files=args.Files, input_dir=args.Input, restricted_files=args.Restrict,
+               jobs=args.Jobs, cache_path=args.Cache)
     if args.Output:
         c.save_to_file(filename=args.Output)
     else: